@@ -0,0 +1,103 @@
+# 比较 PositionChecker(逐格字符比较) 与 ArrayPositionChecker(int8数组) 处理一段局面序列的耗时,
+# 并确认两者结果一致. 序列来自录制的标注(labels.jsonl)或随机走子生成的对局. 在项目根目录运行:
+#   PYTHONPATH=app python -m benchmarks.bench_checker --games 20 --moves 80
+#   PYTHONPATH=app python -m benchmarks.bench_checker --labels data/synth/labels.jsonl
+import argparse
+import json
+import random
+import time
+import numpy as np
+from chess.board import Board
+from chess.checker import PositionChecker, ArrayPositionChecker
+from tools.utils import convert_fen_to_array
+from tools.board_renderer import START_FEN
+
+def random_game(rng, moves, repeat_rate):
+    """
+    从开局随机走子(不检查合法性), 每步之间按 repeat_rate 插入局面不变的帧, 模拟连续截图
+    :return: 棋盘(二维字符数组)列表
+    """
+    board = convert_fen_to_array(START_FEN, rng.random() < 0.5)
+    frames = [board]
+    red_to_move = True
+    for _ in range(moves):
+        while rng.random() < repeat_rate:
+            frames.append([row[:] for row in board])
+        own = [(i, j) for i in range(10) for j in range(9)
+               if board[i][j] != '-' and board[i][j].isupper() == red_to_move and board[i][j] not in 'Kk']
+        targets = [(i, j) for i in range(10) for j in range(9) if board[i][j] == '-' or
+                   (board[i][j].isupper() != red_to_move and board[i][j] not in 'Kk')]
+        if not own:
+            break
+        (from_i, from_j), (to_i, to_j) = rng.choice(own), rng.choice(targets)
+        board = [row[:] for row in board]
+        board[to_i][to_j], board[from_i][from_j] = board[from_i][from_j], '-'
+        frames.append(board)
+        red_to_move = not red_to_move
+    return frames
+
+def load_labels(path):
+    """读取录制的标注序列(tools/board_renderer.py 或录制工具输出的 labels.jsonl)"""
+    with open(path, "r", encoding="utf-8") as f:
+        return [[list(row) for row in json.loads(line)['board']] for line in f if line.strip()]
+
+def run(checker, frames):
+    """依次送入所有帧, 返回(每帧耗时列表(微秒), 每帧结果)"""
+    timings = []
+    results = []
+    for frame in frames:
+        start = time.perf_counter()
+        result = checker.get_available_changes(frame)
+        timings.append((time.perf_counter() - start) * 1e6)
+        results.append(result)
+    return timings, results
+
+def main():
+    parser = argparse.ArgumentParser(description="局面检查器耗时对比")
+    parser.add_argument("--labels", help="录制的标注序列(labels.jsonl), 默认随机生成对局")
+    parser.add_argument("--games", type=int, default=20)
+    parser.add_argument("--moves", type=int, default=80)
+    parser.add_argument("--repeat-rate", type=float, default=0.5, help="局面不变的帧的比例")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--rounds", type=int, default=5, help="重复测量次数, 取最好的一次")
+    args = parser.parse_args()
+
+    if args.labels:
+        sequences = [load_labels(args.labels)]
+    else:
+        rng = random.Random(args.seed)
+        sequences = [random_game(rng, args.moves, args.repeat_rate) for _ in range(args.games)]
+    frame_count = sum(len(frames) for frames in sequences)
+    print(f"{len(sequences)} 段序列, 共 {frame_count} 帧")
+
+    # 识别结果为二维字符数组, main_process 中转换为 Board 后送入检查器, 两种输入都测
+    inputs = {
+        'list': sequences,
+        'board': [[Board.from_array(frame) for frame in frames] for frames in sequences]
+    }
+    checkers = {'PositionChecker': PositionChecker, 'ArrayPositionChecker': ArrayPositionChecker}
+
+    print(f"\n{'checker':22}{'input':8}{'mean us':>10}{'p50 us':>10}{'p95 us':>10}")
+    reference = None
+    for input_name, input_sequences in inputs.items():
+        for checker_name, checker_class in checkers.items():
+            best = None
+            for _ in range(args.rounds):
+                timings = []
+                results = []
+                for frames in input_sequences:
+                    sequence_timings, sequence_results = run(checker_class(), frames)
+                    timings.extend(sequence_timings)
+                    results.extend(sequence_results)
+                if best is None or np.mean(timings) < np.mean(best):
+                    best = timings
+            if reference is None:
+                reference = results
+            elif results != reference:
+                raise SystemExit(f"{checker_name} ({input_name}) 的结果与 PositionChecker 不一致")
+            print(f"{checker_name:22}{input_name:8}{np.mean(best):>10.1f}"
+                  f"{np.percentile(best, 50):>10.1f}{np.percentile(best, 95):>10.1f}")
+    print("\n所有检查器的结果一致")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+# 着法生成器(chess/movegen.py)的 perft 测试: 与已知的叶子节点数比较并报告速度, 不一致时退出码为1
+# 在项目根目录运行:
+#   PYTHONPATH=app python -m benchmarks.bench_movegen
+#   PYTHONPATH=app python -m benchmarks.bench_movegen --depth 4
+import argparse
+import sys
+import time
+from chess.movegen import Position
+
+# (名称, FEN, 各深度的节点数)
+PERFT_POSITIONS = [
+    ("start", "rnbakabnr/9/1c5c1/p1p1p1p1p/9/9/P1P1P1P1P/1C5C1/9/RNBAKABNR w", [44, 1920, 79666, 3290240]),
+    ("middlegame", "r1ba1a3/4kn3/2n1b4/pNp1p1p1p/4c4/6P2/P1P2R2P/1CcC5/9/2BAKAB2 w", [38, 1128, 43929]),
+]
+
+def main():
+    parser = argparse.ArgumentParser(description="着法生成器 perft 测试")
+    parser.add_argument("--depth", type=int, default=3, help="最大深度(start局面深度4约需十几秒)")
+    args = parser.parse_args()
+
+    failed = False
+    print(f"{'position':12}{'depth':>6}{'nodes':>12}{'expected':>12}{'ms':>10}{'knodes/s':>10}")
+    for name, fen, expected_counts in PERFT_POSITIONS:
+        position = Position.from_fen(fen)
+        for depth, expected in enumerate(expected_counts[:args.depth], start=1):
+            start = time.perf_counter()
+            nodes = position.perft(depth)
+            elapsed = time.perf_counter() - start
+            mark = "" if nodes == expected else "  不一致"
+            failed |= nodes != expected
+            print(f"{name:12}{depth:>6}{nodes:>12}{expected:>12}{elapsed * 1000:>10.1f}"
+                  f"{nodes / elapsed / 1000 if elapsed else 0:>10.1f}{mark}")
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
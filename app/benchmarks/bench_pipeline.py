@@ -0,0 +1,299 @@
+# 识别流程各阶段的延迟: 截图解码、preprocess_image、格点切割、模板匹配(分级识别的第一级)、棋子推理、局面检查、
+# 转FEN、引擎往返和着法转中文. 输入为合成棋盘(tools/board_renderer.py)或录制的帧.
+# 在项目根目录运行:
+#   PYTHONPATH=app python -m benchmarks.bench_pipeline --render 200 --save-baseline benchmarks/baseline.json
+#   PYTHONPATH=app python -m benchmarks.bench_pipeline --render 200 --compare benchmarks/baseline.json
+#   PYTHONPATH=app python -m benchmarks.bench_pipeline --frames data/synth --no-engine
+# --compare 时任一阶段的p50或p95超出基线的容差即以退出码1结束, 可用于回归检查
+import argparse
+import json
+import os
+import platform as host_platform
+import sys
+import time
+from collections import defaultdict
+from contextlib import contextmanager, redirect_stdout
+import cv2
+import numpy as np
+from chess import engine, recognizer
+from chess.board import Board
+from chess.context import context
+from chess.template_matcher import TemplateMatcher
+from tools.log import setup_logging
+from tools.utils import convert_array_to_fen, convert_fen_to_array, convert_move_to_chinese
+
+# 阶段顺序, 报告和基线都按这个顺序
+STAGES = ('decode', 'preprocess', 'crop', 'template', 'inference', 'checker', 'fen', 'engine', 'move_text', 'total')
+
+class RawScreenshot:
+    """与mss截图相同的属性(bgra, width, height), 用于测量截图解码"""
+    def __init__(self, frame):
+        if frame.shape[2] == 3:
+            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2BGRA)
+        self.bgra = frame.tobytes()
+        self.height, self.width = frame.shape[:2]
+
+class StageTimer:
+    """按阶段收集耗时(毫秒)"""
+    def __init__(self):
+        self.samples = defaultdict(list)
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        yield
+        self.samples[name].append((time.perf_counter() - start) * 1000)
+
+    def summary(self):
+        """每个阶段的次数和 p50/p95/p99/mean"""
+        return {
+            name: {
+                'count': len(self.samples[name]),
+                'p50': float(np.percentile(self.samples[name], 50)),
+                'p95': float(np.percentile(self.samples[name], 95)),
+                'p99': float(np.percentile(self.samples[name], 99)),
+                'mean': float(np.mean(self.samples[name]))
+            }
+            for name in STAGES if self.samples.get(name)
+        }
+
+def sample_move(board_array, is_red):
+    """
+    没有引擎时用于着法转中文的着法: 本方第一个能横竖走一步的棋子
+    :param board_array: convert_array_to_fen 返回的数组(红方在下)
+    """
+    for row in range(10):
+        for col in range(9):
+            piece = board_array[row][col]
+            if piece == '-' or piece.isupper() != is_red:
+                continue
+            for d_row, d_col in ((-1, 0), (1, 0), (0, -1), (0, 1)):
+                r, c = row + d_row, col + d_col
+                if 0 <= r < 10 and 0 <= c < 9 and board_array[r][c] == '-':
+                    return f"{chr(ord('a') + col)}{9 - row}{chr(ord('a') + c)}{9 - r}"
+    return None
+
+def load_frames(args):
+    """
+    读取或渲染输入帧
+    :return: [(帧, 标注的棋子数组或None, 本方是否红方)]
+    """
+    if args.frames:
+        from chess.frame_source import open_frame_source
+        frames = []
+        with open_frame_source(args.frames) as source:
+            for frame in source:
+                label = source.info.get('label')
+                board = [list(row) for row in label['board']] if label else None
+                frames.append((frame, board, label['is_red'] if label else True))
+                if len(frames) >= args.limit:
+                    break
+        return frames
+
+    from tools.board_renderer import random_jobs, render_many, renderer_args_for_platform
+    jobs = random_jobs(args.render, args.seed, noise=args.noise, jpeg_quality=args.jpeg)
+    images = render_many(jobs, renderer_args_for_platform(args.platform))
+    return [(image, convert_fen_to_array(job['fen'], job['is_red']), job['is_red'])
+            for image, job in zip(images, jobs)]
+
+def load_piece_recognizer():
+    """加载当前平台的棋子识别模型, 不可用时返回None"""
+    try:
+        return context.piece_recognizer
+    except Exception as e:
+        print(f"无法加载棋子识别模型, 跳过推理阶段, 后续阶段使用标注的局面: {e}")
+        return None
+
+def run(frames, piece_recognizer=None, use_engine=True, engine_param="depth", engine_value="8"):
+    """
+    按阶段测量每一帧
+    Args:
+        frames: load_frames 的返回值
+        piece_recognizer: 棋子识别模型, None时不测推理, 直接使用标注的局面
+        use_engine: 是否测引擎往返
+        engine_param: 引擎搜索参数(depth/movetime)
+        engine_value: 引擎搜索参数的值
+    Returns:
+        StageTimer
+    """
+    timer = StageTimer()
+    # 与 main_process 使用同一种局面检查器(context.init_position_checker 创建的类)
+    context.init_position_checker()
+    checker = type(context.position_checker)()
+    context.clear_position_checker()
+    # 单独测量模板匹配, 与 inference 阶段(整盘90个格点的CNN推理)对比, template_tier 只有更快时才值得启用
+    matcher = TemplateMatcher()
+    x_array, y_array, error = recognizer.get_board_data()
+    if error:
+        raise SystemExit(f"当前平台没有棋盘坐标: {error}")
+
+    for frame, label, is_red in frames:
+        raw = RawScreenshot(frame)
+        frame_start = time.perf_counter()
+
+        with timer.stage('decode'):
+            img_np = recognizer.screenshot_to_array(raw)
+        with timer.stage('preprocess'):
+            recognizer.preprocess_image(raw)
+        with timer.stage('crop'):
+            native_x, native_y = recognizer.scale_board_coords(x_array, y_array, img_np.shape[1])
+            plan = recognizer.build_crop_plan(native_x, native_y, img_np.shape[1], img_np.shape[0])
+            crops = recognizer.extract_crops(img_np[:, :, :3], plan)
+        with timer.stage('template'):
+            matcher.match_batch(crops)
+
+        pieces = label
+        if piece_recognizer is not None:
+            # 不经过格点缓存, 测量整盘90个格点的推理
+            with timer.stage('inference'):
+                result = piece_recognizer.recognize_batch(crops)
+            if result is not None:
+                recognized, recognized_is_red = recognizer.assemble_piece_array(
+                    result['class_names'], result['confidences'], len(x_array), len(y_array))
+                if recognized is not None:
+                    pieces, is_red = recognized, recognized_is_red
+        if pieces is None:
+            continue
+
+        # main_process 先把识别结果转为 Board 再送入检查器
+        pieces = Board.from_array(pieces)
+        with timer.stage('checker'):
+            checker.get_available_changes(pieces)
+        with timer.stage('fen'):
+            fen_str, board_array = convert_array_to_fen(pieces, is_red)
+
+        move = None
+        if use_engine:
+            with timer.stage('engine'):
+                _, best_move = engine.go(fen_str + (' w' if is_red else ' b'), engine_param, engine_value)
+            if best_move and 'bestmove' in best_move:
+                start = best_move.find('bestmove') + len('bestmove') + 1
+                move = best_move[start:start + 4]
+        move = move or sample_move(board_array, is_red)
+        if move:
+            with timer.stage('move_text'):
+                try:
+                    convert_move_to_chinese(move, board_array, is_red)
+                except Exception:
+                    pass
+        timer.samples['total'].append((time.perf_counter() - frame_start) * 1000)
+    return timer
+
+def compare(summary, baseline, tolerance, min_delta_ms):
+    """
+    和基线比较, p50或p95超过 基线 * (1 + tolerance) 且差值超过 min_delta_ms 即为退化
+    :return: 退化描述列表
+    """
+    regressions = []
+    for name, stats in summary.items():
+        base = baseline['stages'].get(name)
+        if base is None:
+            continue
+        for key in ('p50', 'p95'):
+            if stats[key] > base[key] * (1 + tolerance) and stats[key] - base[key] > min_delta_ms:
+                # 基线为0(如亚微秒级的decode阶段)时没有比例可言, 只报告差值
+                change = f"+{(stats[key] / base[key] - 1):.0%}" if base[key] > 0 else f"+{stats[key] - base[key]:.3f}ms"
+                regressions.append(f"{name} {key}: {base[key]:.3f}ms -> {stats[key]:.3f}ms ({change})")
+    return regressions
+
+def print_summary(summary, baseline=None):
+    """打印各阶段延迟, 有基线时附上基线的p50"""
+    header = f"{'stage':12}{'count':>7}{'p50':>10}{'p95':>10}{'p99':>10}{'mean':>10}"
+    print("\n" + header + (f"{'base p50':>10}" if baseline else ""))
+    for name, stats in summary.items():
+        line = (f"{name:12}{stats['count']:>7}{stats['p50']:>10.3f}{stats['p95']:>10.3f}"
+                f"{stats['p99']:>10.3f}{stats['mean']:>10.3f}")
+        if baseline and name in baseline['stages']:
+            line += f"{baseline['stages'][name]['p50']:>10.3f}"
+        print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description="识别流程分阶段延迟")
+    parser.add_argument("--frames", help="录制的帧(图片目录或视频), 默认渲染合成棋盘")
+    parser.add_argument("--render", type=int, default=100, help="渲染的合成棋盘数量")
+    parser.add_argument("--limit", type=int, default=1000, help="最多读取的录制帧数")
+    parser.add_argument("--noise", type=float, default=2.0)
+    parser.add_argument("--jpeg", type=int, default=90)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--platform", default="TT", choices=["TT", "JJ"])
+    parser.add_argument("--no-engine", action="store_true", help="不测引擎往返")
+    parser.add_argument("--engine-param", default="depth", choices=["depth", "movetime"])
+    parser.add_argument("--engine-value", default="8", help="引擎搜索深度或时间(毫秒)")
+    parser.add_argument("--warmup", type=int, default=3, help="不计入统计的预热帧数")
+    parser.add_argument("--save-baseline", help="把结果保存为基线(json)")
+    parser.add_argument("--compare", help="与基线比较, 有退化时退出码为1")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="允许超出基线的比例")
+    parser.add_argument("--min-delta-ms", type=float, default=0.05, help="小于该差值的变化不算退化")
+    parser.add_argument("--verbose", action="store_true", help="输出识别流程的调试信息")
+    args = parser.parse_args()
+
+    # 不加 --verbose 时只输出警告和错误, 避免逐帧日志干扰结果
+    setup_logging(**dict(context.logging_config, level='DEBUG' if args.verbose else 'WARNING', categories={}))
+
+    # 只在本进程内切换平台, 不写配置文件
+    context.platform = args.platform
+    frames = load_frames(args)
+    if not frames:
+        raise SystemExit("没有输入帧")
+
+    use_engine = not args.no_engine
+    if use_engine:
+        try:
+            engine.init_engine()
+        except Exception as e:
+            print(f"无法启动引擎, 跳过引擎阶段: {e}")
+            use_engine = False
+
+    piece_recognizer = load_piece_recognizer()
+    output = sys.stdout if args.verbose else open(os.devnull, "w")
+    try:
+        with redirect_stdout(output):
+            run(frames[:args.warmup], piece_recognizer, use_engine, args.engine_param, args.engine_value)
+            timer = run(frames, piece_recognizer, use_engine, args.engine_param, args.engine_value)
+    finally:
+        if use_engine:
+            engine.terminate_engine()
+        if output is not sys.stdout:
+            output.close()
+
+    summary = timer.summary()
+    result = {
+        'stages': summary,
+        'config': {
+            'frames': args.frames or f"render:{args.render}:seed{args.seed}:noise{args.noise}:jpeg{args.jpeg}",
+            'platform': args.platform,
+            'inference_backend': context.inference_backend,
+            'engine': f"{args.engine_param}={args.engine_value}" if use_engine else None
+        },
+        'host': {
+            'python': host_platform.python_version(),
+            'machine': host_platform.machine(),
+            'system': host_platform.system(),
+            'cpus': os.cpu_count()
+        }
+    }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_summary(summary, baseline)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=4, ensure_ascii=False)
+        print(f"已保存基线: {args.save_baseline}")
+
+    if baseline:
+        if baseline.get('host') != result['host']:
+            print("注意: 基线来自不同的机器或Python版本, 比较结果仅供参考")
+        regressions = compare(summary, baseline, args.tolerance, args.min_delta_ms)
+        if regressions:
+            print("\n性能退化:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("\n与基线相比没有退化")
+
+if __name__ == "__main__":
+    main()
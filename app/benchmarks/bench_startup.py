@@ -0,0 +1,74 @@
+# 测量识别器从冷启动到第一次预测的耗时(导入、构建模型、首次推理)
+# 每个后端在独立的子进程中测量, 导入耗时不受前一次测量影响. 在项目根目录运行:
+#   PYTHONPATH=app python -m benchmarks.bench_startup --platform TT --backends torch opencv
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+def measure(kind, platform, backend, precision):
+    """在当前进程中测量一次冷启动, 返回各阶段耗时(毫秒)"""
+    import numpy as np
+
+    start = time.perf_counter()
+    if kind == "piece":
+        from chess.piece_recognizer import ChessPieceRecognizer as Recognizer
+    else:
+        from chess.timer_recognizer import CountdownPredictor as Recognizer
+    imported = time.perf_counter()
+
+    recognizer = Recognizer(platform=platform, backend=backend, precision=precision)
+    built = time.perf_counter()
+
+    image = np.zeros((124, 94, 3), dtype=np.uint8)
+    if kind == "piece":
+        recognizer.recognize_array(image)
+    else:
+        recognizer.predict_array(image)
+    predicted = time.perf_counter()
+
+    return {
+        'import_ms': (imported - start) * 1000,
+        'build_ms': (built - imported) * 1000,
+        'first_predict_ms': (predicted - built) * 1000,
+        'time_to_first_prediction_ms': (predicted - start) * 1000,
+        'backend': type(recognizer.backend).__name__
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="识别器冷启动耗时")
+    parser.add_argument("--platform", default="TT", choices=["TT", "JJ"])
+    parser.add_argument("--kind", nargs="+", default=["piece", "countdown"], choices=["piece", "countdown"])
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnxruntime", "opencv"])
+    parser.add_argument("--precision", default="fp32")
+    parser.add_argument("--repeat", type=int, default=3, help="每个组合的测量次数, 取中位数")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.kind[0], args.platform, args.backends[0], args.precision)))
+        return
+
+    print(f"{'kind':10}{'backend':13}{'actual':20}{'import':>10}{'build':>10}{'predict':>10}{'total':>10}")
+    for kind in args.kind:
+        for backend in args.backends:
+            runs = []
+            for _ in range(args.repeat):
+                output = subprocess.run(
+                    [sys.executable, "-m", "benchmarks.bench_startup", "--child", "--platform", args.platform,
+                     "--kind", kind, "--backends", backend, "--precision", args.precision],
+                    capture_output=True, text=True, env=os.environ.copy())
+                if output.returncode != 0:
+                    print(f"{kind:10}{backend:13}失败: {output.stderr.strip().splitlines()[-1:]}")
+                    break
+                runs.append(json.loads(output.stdout.strip().splitlines()[-1]))
+            if not runs:
+                continue
+            median = lambda key: sorted(run[key] for run in runs)[len(runs) // 2]
+            print(f"{kind:10}{backend:13}{runs[0]['backend']:20}{median('import_ms'):>10.0f}{median('build_ms'):>10.0f}"
+                  f"{median('first_predict_ms'):>10.0f}{median('time_to_first_prediction_ms'):>10.0f}")
+
+if __name__ == "__main__":
+    main()
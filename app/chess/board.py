@@ -0,0 +1,140 @@
+import re
+import numpy as np
+
+# 棋盘行列数
+ROWS = 10
+COLS = 9
+
+# 棋子编码: 红方为正, 黑方为负, 空位为0
+EMPTY = 0
+KING, ADVISOR, BISHOP, KNIGHT, ROOK, CANNON, PAWN = range(1, 8)
+
+# 编码 + 7 -> 字符
+_CHARS = "pcrnbak-KABNRCP"
+_CHAR_LUT = np.array(list(_CHARS))
+_BYTE_LUT = np.frombuffer(_CHARS.encode("ascii"), dtype=np.uint8)
+
+# FEN中连续的空位
+_EMPTY_RUN = re.compile("-+")
+
+# 字符(ASCII) -> 编码, 未知字符为空位
+_CODE_LUT = np.zeros(256, dtype=np.int8)
+for _code, _char in enumerate(_CHARS, start=-7):
+    _CODE_LUT[ord(_char)] = _code
+
+def piece_code(char):
+    """棋子字符('R', 'k', '-'...)的编码"""
+    return int(_CODE_LUT[ord(char)])
+
+def piece_char(code):
+    """编码对应的棋子字符"""
+    return _CHARS[code + 7]
+
+class Board:
+    """
+    10x9 棋盘, 按屏幕方向(与识别结果相同)存放在 int8 数组中, 红方棋子为正, 黑方为负, 空位为0
+    可以像原来的二维字符数组一样使用: board[i][j]、for row in board、len(board) 都返回字符;
+    board[i, j] 直接取字符, board.cells 为底层数组
+    """
+    __slots__ = ('cells',)
+
+    def __init__(self, cells=None):
+        """
+        :param cells: (10, 9) 的 int8 数组, None 表示空棋盘
+        """
+        self.cells = np.zeros((ROWS, COLS), dtype=np.int8) if cells is None else cells
+
+    @classmethod
+    def from_array(cls, array):
+        """由二维字符数组(或 Board)创建"""
+        if isinstance(array, Board):
+            return array
+        text = "".join("".join(row) for row in array).encode("ascii")
+        return cls(_CODE_LUT[np.frombuffer(text, dtype=np.uint8)].reshape(ROWS, COLS))
+
+    @classmethod
+    def from_fen(cls, fen, is_red=True):
+        """
+        由FEN创建(convert_fen_to_array 的数组版本)
+        :param fen: FEN字符串, 只使用第一段棋子位置(红方在下)
+        :param is_red: 本方是红方(红方在屏幕下方), 否则按屏幕方向翻转
+        """
+        cells = []
+        for char in fen.split()[0]:
+            if char.isdigit():
+                cells.append("-" * int(char))
+            elif char != "/":
+                cells.append(char)
+        board = cls(_CODE_LUT[np.frombuffer("".join(cells).encode("ascii"), dtype=np.uint8)].reshape(ROWS, COLS))
+        return board if is_red else board.flipped()
+
+    def to_array(self):
+        """转为二维字符数组"""
+        return _CHAR_LUT[self.cells + 7].tolist()
+
+    def to_fen(self, is_red=True):
+        """
+        转为FEN棋子位置(不含轮哪方走棋信息)
+        :param is_red: 本方是红方, 否则先翻转为红方在下
+        """
+        cells = self.cells if is_red else self.cells[::-1, ::-1]
+        text = _BYTE_LUT[cells + 7].tobytes().decode("ascii")
+        rows = "/".join(text[row * COLS:(row + 1) * COLS] for row in range(ROWS))
+        return _EMPTY_RUN.sub(lambda run: str(len(run.group())), rows)
+
+    def flipped(self):
+        """旋转180度(红黑方交换屏幕上下位置)"""
+        return Board(self.cells[::-1, ::-1].copy())
+
+    def copy(self):
+        return Board(self.cells.copy())
+
+    def key(self):
+        """90字节的局面键, 可用作字典键"""
+        return self.cells.tobytes()
+
+    def pieces(self):
+        """所有棋子 [(字符, 列, 行), ...], 按行优先顺序"""
+        rows, cols = np.nonzero(self.cells)
+        return [(_CHARS[code + 7], int(col), int(row))
+                for code, row, col in zip(self.cells[rows, cols].tolist(), rows.tolist(), cols.tolist())]
+
+    def count(self, red):
+        """一方的棋子数"""
+        return int(np.count_nonzero(self.cells > 0 if red else self.cells < 0))
+
+    def code(self, row, col):
+        """格点上棋子的编码"""
+        return int(self.cells[row, col])
+
+    def text(self):
+        """90个字符, 按行优先顺序"""
+        return _BYTE_LUT[self.cells + 7].tobytes().decode("ascii")
+
+    def __getitem__(self, index):
+        if isinstance(index, tuple):
+            return _CHARS[self.cells[index] + 7]
+        return _BYTE_LUT[self.cells[index] + 7].tobytes().decode("ascii")
+
+    def __setitem__(self, index, piece):
+        row, col = index
+        self.cells[row, col] = piece_code(piece) if isinstance(piece, str) else piece
+
+    def __iter__(self):
+        text = self.text()
+        for row in range(ROWS):
+            yield text[row * COLS:(row + 1) * COLS]
+
+    def __len__(self):
+        return ROWS
+
+    def __eq__(self, other):
+        if isinstance(other, Board):
+            return self.cells.tobytes() == other.cells.tobytes()
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.cells.tobytes())
+
+    def __repr__(self):
+        return "Board(\n  " + "\n  ".join(self) + "\n)"
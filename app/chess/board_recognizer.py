@@ -0,0 +1,130 @@
+import os
+import cv2
+import json
+import numpy as np
+from tools.utils import resource_path
+from chess.inference import create_backend, build_board_fcn, onnx_model_path, softmax
+from tools.log import get_logger
+
+logger = get_logger("recognition")
+
+# 棋盘行列数
+BOARD_ROWS = 10
+BOARD_COLS = 9
+
+# 校正后棋盘图像中每个格点的边长, 为模型特征图步长(32)的整数倍
+CELL_SIZE = 64
+FEATURE_STRIDE = 32
+
+def board_bounds(x_array, y_array):
+    """
+    棋盘图像的范围: 四周各向外扩半个格点
+    Returns:
+        (left, top, right, bottom) 整数像素坐标
+    """
+    dx = (x_array[-1] - x_array[0]) / (len(x_array) - 1)
+    dy = (y_array[-1] - y_array[0]) / (len(y_array) - 1)
+    return (int(round(x_array[0] - dx / 2)), int(round(y_array[0] - dy / 2)),
+            int(round(x_array[-1] + dx / 2)), int(round(y_array[-1] + dy / 2)))
+
+def rectify_board(img, x_array, y_array, cell_size=CELL_SIZE):
+    """
+    把截图中的棋盘区域缩放为格点对齐的图像, 第(i, j)个格点的中心在
+    (j * cell_size + cell_size / 2, i * cell_size + cell_size / 2)
+    Args:
+        img: BGR/BGRA格式的图像(原始分辨率)
+        x_array: 图像坐标下的棋盘竖线x坐标
+        y_array: 图像坐标下的棋盘横线y坐标
+        cell_size: 每个格点的边长
+    Returns:
+        (行数 * cell_size, 列数 * cell_size, 通道数) 的uint8数组
+    """
+    left, top, right, bottom = board_bounds(x_array, y_array)
+    # 外扩半格后可能超出截图, 用边缘像素补齐
+    pad = max(0, -left, -top, right - img.shape[1], bottom - img.shape[0])
+    if pad:
+        img = cv2.copyMakeBorder(img, pad, pad, pad, pad, cv2.BORDER_REPLICATE)
+        left, top, right, bottom = left + pad, top + pad, right + pad, bottom + pad
+    size = (len(x_array) * cell_size, len(y_array) * cell_size)
+    interpolation = cv2.INTER_AREA if right - left > size[0] else cv2.INTER_LINEAR
+    return cv2.resize(img[top:bottom, left:right], size, interpolation=interpolation)
+
+def boards_to_batch(boards):
+    """
+    把校正后的棋盘图像转换为归一化的模型输入
+    :param boards: rectify_board 返回的BGR/BGRA图像列表, 尺寸一致
+    :return: (N, 3, H, W) 的float32数组, RGB通道, 取值0-1
+    """
+    batch = np.empty((len(boards), 3) + boards[0].shape[:2], dtype=np.float32)
+    for k, board in enumerate(boards):
+        np.multiply(board[:, :, 2::-1].transpose(2, 0, 1), 1 / 255, out=batch[k], casting='unsafe')
+    return batch
+
+class BoardRecognizer:
+    """
+    整盘识别器: 一次前向推理得到所有格点的类别
+    输入为 rectify_board 校正后的整幅棋盘, 输出 (类别数, 10, 9) 的logits,
+    类别与 *_piece_map.json 一致
+    """
+    def __init__(self, platform="TT", backend="torch", precision="fp32"):
+        """
+        初始化整盘识别器
+        :param platform: 游戏平台，"TT"表示天天象棋，"JJ"表示JJ象棋
+        :param backend: 推理后端, "torch"、"onnxruntime" 或 "opencv"
+        :param precision: 模型精度, "fp32" 或 "int8"
+        """
+        self.model_path = self.model_path_for(platform)
+        model_type = "tt" if platform == "TT" else "jj"
+        with open(resource_path(f"models/{model_type}_piece_map.json"), "r", encoding="utf-8") as f:
+            self.class_map = json.load(f)
+        self.backend = create_backend(backend, self.model_path, self._load_model, precision)
+
+    @staticmethod
+    def model_path_for(platform):
+        """平台的整盘模型路径(.pth, ONNX模型同名)"""
+        model_type = "tt" if platform == "TT" else "jj"
+        return resource_path(f"models/{model_type}_board_model.pth")
+
+    @classmethod
+    def is_available(cls, platform):
+        """是否已训练(或导出)了该平台的整盘模型"""
+        model_path = cls.model_path_for(platform)
+        base = os.path.splitext(model_path)[0]
+        return any(os.path.exists(path) for path in (model_path, base + ".safetensors", onnx_model_path(model_path)))
+
+    def _load_model(self):
+        """构建torch模型并加载权重(仅torch后端和导出ONNX时使用)"""
+        return build_board_fcn(self.model_path, len(self.class_map), CELL_SIZE // FEATURE_STRIDE)
+
+    def recognize_board(self, board_img):
+        """
+        识别校正后的棋盘图像
+        :param board_img: rectify_board 返回的BGR/BGRA图像
+        :return: 字典, 按行优先顺序包含每个格点的识别结果, 失败时返回None
+            - class_names: 识别结果列表
+            - confidences: 置信度数组
+            - class_indices: 预测的类别索引数组
+        """
+        try:
+            logits = self.backend.run(boards_to_batch([board_img]))[0]
+            # (类别数, 行, 列) -> (格点数, 类别数)
+            probabilities = softmax(logits.reshape(logits.shape[0], -1).T)
+            class_indices = probabilities.argmax(axis=1)
+            return {
+                'class_names': [self.class_map[str(idx)] for idx in class_indices],
+                'confidences': probabilities[np.arange(len(class_indices)), class_indices],
+                'class_indices': class_indices
+            }
+        except Exception as e:
+            logger.error("整盘识别出错: %s", e)
+            return None
+
+    def recognize(self, img, x_array, y_array):
+        """
+        校正并识别截图中的棋盘
+        :param img: BGR/BGRA格式的图像(原始分辨率)
+        :param x_array: 图像坐标下的棋盘竖线x坐标
+        :param y_array: 图像坐标下的棋盘横线y坐标
+        :return: 与 recognize_board 相同
+        """
+        return self.recognize_board(rectify_board(img, x_array, y_array))
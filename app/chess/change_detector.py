@@ -0,0 +1,53 @@
+import cv2
+import numpy as np
+
+class FrameChangeDetector:
+    """
+    整帧变化检测
+    把截图缩小成灰度小图, 与上一次送去识别的画面做absdiff,
+    画面静止时跳过整个识别流程, 一旦有变化立即放行
+    """
+    def __init__(self, scale=0.25, pixel_threshold=12, min_changed_pixels=4):
+        """
+        :param scale: 缩小比例
+        :param pixel_threshold: 单个像素灰度差超过该值才算变化
+        :param min_changed_pixels: 变化像素数达到该值才认为画面变化
+        """
+        self.scale = scale
+        self.pixel_threshold = pixel_threshold
+        self.min_changed_pixels = min_changed_pixels
+        self.skipped = 0  # 被跳过的帧数
+        self.passed = 0   # 放行的帧数
+        self.reset()
+
+    def reset(self):
+        """清空参考画面, 下一帧一定放行"""
+        self.reference = None
+
+    # 识别失败时调用, 保证静止画面也会再识别一次
+    invalidate = reset
+
+    def thumbnail(self, frame):
+        """
+        计算缩小的灰度图
+        :param frame: BGR/BGRA格式的截图数组
+        """
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGRA2GRAY if frame.shape[2] == 4 else cv2.COLOR_BGR2GRAY)
+        return cv2.resize(gray, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+
+    def has_changed(self, frame):
+        """
+        判断画面相对上一次放行的画面是否有变化, 有变化时更新参考画面
+        :param frame: BGR/BGRA格式的截图数组
+        :return: 是否需要识别
+        """
+        thumb = self.thumbnail(frame)
+        if self.reference is not None and self.reference.shape == thumb.shape:
+            diff = cv2.absdiff(thumb, self.reference)
+            if np.count_nonzero(diff > self.pixel_threshold) < self.min_changed_pixels:
+                self.skipped += 1
+                return False
+
+        self.reference = thumb
+        self.passed += 1
+        return True
@@ -1,6 +1,14 @@
+import numpy as np
+from chess.board import Board, COLS, piece_char
+from chess.zobrist import PositionHistory, board_hash, update_hash, toggle_side
+
 class PositionChecker:
     def __init__(self):
-        self.last_pieces_array = None  # 上一次的棋盘数组
+        self.last_pieces_array = None  # 上一次的棋盘(Board)
+        self.history = PositionHistory()  # 本次会话出现过的局面
+        self.position_hash = None  # 当前局面的Zobrist哈希
+        self.black_to_move = False  # 当前局面是否轮到黑方走(由最近一次变化推断)
+        self.repetition_count = 0  # 当前局面在本次会话中出现的次数
 
     def check_position_changes(self, array1, array2):
         """
@@ -9,6 +17,10 @@ class PositionChecker:
         """
         if not array2:
             return False, 0, [], []
+        if isinstance(array1, Board):
+            array1 = array1.to_array()
+        if isinstance(array2, Board):
+            array2 = array2.to_array()
         
         has_changes = False
         red_changes = []    # 红方变化位置 [(row, col, old_piece, new_piece), ...]
@@ -67,12 +79,19 @@ class PositionChecker:
     def get_available_changes(self, current_pieces_array):
         """
         检查当前局面是否有可用的改变
+        :param current_pieces_array: 当前棋盘(Board 或二维字符数组)
         返回: (是否变化, 红方变化位置列表, 黑方变化位置列表)
         """
+        current_pieces_array = Board.from_array(current_pieces_array)
         # 第一次调用
         if self.last_pieces_array is None:
             self.last_pieces_array = current_pieces_array
+            self.record_position(current_pieces_array, None)
             return True, [], []
+        
+        # 局面相同时不逐格比较
+        if current_pieces_array == self.last_pieces_array:
+            return False, [], []
             
         # 检查具体的变化位置
         has_changes, _, red_changes, black_changes = self.check_position_changes(
@@ -81,5 +100,65 @@ class PositionChecker:
         # 只有在检测到变化时才更新last_board_array
         if has_changes:
             self.last_pieces_array = current_pieces_array
+            self.record_position(current_pieces_array, red_changes + black_changes)
             
-        return has_changes, red_changes, black_changes 
\ No newline at end of file
+        return has_changes, red_changes, black_changes
+
+    def record_position(self, board, changes):
+        """
+        更新当前局面的哈希并记入历史
+        :param board: 当前棋盘
+        :param changes: 与上一局面相比的格点变化, None表示重新整盘计算
+        """
+        if changes is None or self.position_hash is None:
+            value = board_hash(board, self.black_to_move)
+        else:
+            value = update_hash(self.position_hash, changes)
+            # 走子方: 变化后出现在格点上的棋子所属的一方, 无法判断时按轮流走棋
+            movers = {new_piece.isupper() for _, _, _, new_piece in changes if new_piece != '-'}
+            black_to_move = movers == {True} if len(movers) == 1 else not self.black_to_move
+            if black_to_move != self.black_to_move:
+                value = toggle_side(value)
+                self.black_to_move = black_to_move
+        self.position_hash = value
+        self.repetition_count = self.history.push(value)
+
+
+class ArrayPositionChecker(PositionChecker):
+    """
+    与 PositionChecker 接口和结果相同, 用 Board 的 int8 数组(红正黑负)一次算出所有变化,
+    不再逐格调用 isupper/islower
+    """
+    def __init__(self):
+        super().__init__()
+        self.material_delta = (0, 0)  # 最近一次比较的子力变化 (红方, 黑方)
+
+    def check_position_changes(self, array1, array2):
+        """
+        检查两个棋盘之间的变化
+        返回: (是否变化, 棋子总量变化, 红方变化位置列表, 黑方变化位置列表)
+        """
+        if not array2:
+            return False, 0, [], []
+        old = Board.from_array(array1).cells.ravel()
+        new = Board.from_array(array2).cells.ravel()
+
+        # 90个格点只做一次比较, 之后只处理变化的格点(每步棋通常2个)
+        changed = np.flatnonzero(old != new)
+        if not len(changed):
+            self.material_delta = (0, 0)
+            return False, 0, [], []
+
+        red_changes = []
+        black_changes = []
+        red_delta = black_delta = 0
+        for index, old_code, new_code in zip(changed.tolist(), old[changed].tolist(), new[changed].tolist()):
+            # 子力变化只来自变化的格点
+            red_delta += (new_code > 0) - (old_code > 0)
+            black_delta += (new_code < 0) - (old_code < 0)
+            # 变化归属: 原来有棋子按原棋子的一方, 否则按新棋子的一方
+            row, col = divmod(index, COLS)
+            change = (row, col, piece_char(old_code), piece_char(new_code))
+            (red_changes if (old_code or new_code) > 0 else black_changes).append(change)
+        self.material_delta = (red_delta, black_delta)
+        return True, red_delta + black_delta, red_changes, black_changes
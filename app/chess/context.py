@@ -1,9 +1,30 @@
 from dataclasses import dataclass, field
 from typing import Dict, Optional, List
 from tools.utils import resource_path
+from tools.log import get_logger
 import json
 from threading import Lock
 
+logger = get_logger("config")
+
+# 可选的棋子识别方式: grid(逐格点) / board(整盘)
+RECOGNITION_MODES = ("grid", "board")
+# 可选的分析模式: continuous(连续截图) / timer(按倒计时触发)
+ANALYSIS_MODES = ("continuous", "timer")
+
+def config_choice(config, key, choices, default):
+    """
+    读取取值有限的配置项, 不在可选值中时(如拼写错误)提示并使用默认值
+    :param config: 配置字典
+    :param choices: 可选值
+    :param default: 缺省或无效时使用的值
+    """
+    value = config.get(key, default)
+    if value not in choices:
+        logger.warning("配置项 %s 的值无效: %r, 可选值为 %s, 使用 %r", key, value, ", ".join(choices), default)
+        return default
+    return value
+
 @dataclass
 class Platform:
     """平台配置类，包含平台相关的所有信息"""
@@ -12,28 +33,83 @@ class Platform:
     regions: Dict  # 区域配置
     _piece_recognizer: Optional[object] = None  # 棋子识别器
     _timer_recognizer: Optional[object] = None  # 倒计时识别器
+    _board_recognizer: Optional[object] = None  # 整盘识别器
     animation_delay: float = 0.3  # 动画等待时长（秒）
+    inference_backend: str = "torch"  # 推理后端: torch / onnxruntime / opencv
+    model_precision: str = "fp32"  # 模型精度: fp32 / int8
+    template_tier: Dict = field(default_factory=dict)  # 模板匹配分级识别配置
+    occupancy_filter: Dict = field(default_factory=dict)  # 空位预判配置
     
     def __post_init__(self):
         """初始化时设置动画等待时长"""
         # 根据平台设置不同的动画等待时长
         self.animation_delay = 1.2 if self.name == 'TT' else 0.3
     
+    def _model_key(self, kind: str, options: tuple) -> tuple:
+        """模型注册表的缓存键: 种类、平台、推理配置和模型文件签名"""
+        from chess.model_registry import file_signature
+        model_type = "tt" if self.name == "TT" else "jj"
+        base = resource_path(f"models/{model_type}_{kind}_model")
+        paths = [f"{base}.pth", f"{base}.safetensors", f"{base}.onnx", f"{base}.{self.model_precision}.onnx"]
+        return (kind, self.name, self.inference_backend, self.model_precision) + options + (file_signature(paths),)
+    
+    def _build_piece_recognizer(self) -> object:
+        """构建棋子识别器"""
+        from chess.piece_recognizer import ChessPieceRecognizer
+        recognizer = ChessPieceRecognizer(
+            platform=self.name, backend=self.inference_backend, precision=self.model_precision)
+        # 启用模板匹配时, CNN只识别模板无法确定的格点
+        if self.template_tier.get('enabled'):
+            from chess.template_matcher import TieredPieceRecognizer
+            recognizer = TieredPieceRecognizer(
+                recognizer,
+                min_score=self.template_tier.get('min_score', 0.8),
+                min_margin=self.template_tier.get('min_margin', 0.2))
+        # 启用空位预判时, 判为空位的格点不再送入识别器
+        if self.occupancy_filter.get('enabled'):
+            from chess.occupancy import OccupancyDetector, OccupancyFilter
+            recognizer = OccupancyFilter(
+                recognizer,
+                OccupancyDetector(edge_threshold=self.occupancy_filter.get('edge_threshold', 0.02)),
+                platform=self.name)
+        return recognizer
+    
     @property
     def piece_recognizer(self) -> object:
-        """获取棋子识别器"""
+        """获取棋子识别器(经模型注册表缓存, 配置重新加载后仍可复用)"""
         if self._piece_recognizer is None:
-            from chess.piece_recognizer import ChessPieceRecognizer
-            self._piece_recognizer = ChessPieceRecognizer(platform=self.name)
+            from chess.model_registry import model_registry
+            options = (json.dumps(self.template_tier, sort_keys=True),
+                       json.dumps(self.occupancy_filter, sort_keys=True))
+            self._piece_recognizer = model_registry.get(
+                self._model_key("piece", options), self._build_piece_recognizer)
         return self._piece_recognizer
     
     @property
     def timer_recognizer(self) -> object:
-        """获取倒计时识别器"""
+        """获取倒计时识别器(经模型注册表缓存)"""
         if self._timer_recognizer is None:
+            from chess.model_registry import model_registry
             from chess.timer_recognizer import CountdownPredictor
-            self._timer_recognizer = CountdownPredictor(platform=self.name)
+            self._timer_recognizer = model_registry.get(
+                self._model_key("countdown", ()),
+                lambda: CountdownPredictor(
+                    platform=self.name, backend=self.inference_backend, precision=self.model_precision))
         return self._timer_recognizer
+    
+    @property
+    def board_recognizer(self) -> Optional[object]:
+        """获取整盘识别器(经模型注册表缓存), 没有整盘模型时返回None"""
+        if self._board_recognizer is None:
+            from chess.board_recognizer import BoardRecognizer
+            if not BoardRecognizer.is_available(self.name):
+                return None
+            from chess.model_registry import model_registry
+            self._board_recognizer = model_registry.get(
+                self._model_key("board", ()),
+                lambda: BoardRecognizer(
+                    platform=self.name, backend=self.inference_backend, precision=self.model_precision))
+        return self._board_recognizer
 
 @dataclass
 class ChessContext:
@@ -43,7 +119,13 @@ class ChessContext:
     _engine_params_lock: Lock = field(default_factory=Lock)
     _platforms: Dict[str, Platform] = field(default_factory=dict)
     _analysis_mode: str = field(default="timer")  # 使用 field 确保默认值在实例化时设置
+    _inference_backend: str = field(default="torch")  # 模型推理后端
+    _recognition_mode: str = field(default="grid")  # 棋子识别方式: grid(逐格点) / board(整盘)
+    _legal_move_recognition: bool = field(default=False)  # 是否用上一局面的合法着法校验识别结果
+    _timing: Dict = field(default_factory=dict)  # 阶段计时配置, 见 chess/timing.py
+    _logging: Dict = field(default_factory=dict)  # 日志配置, 见 tools/log.py
     position_checker: Optional[object] = None  # 局面检查器
+    game_tracker: Optional[object] = None  # 对局跟踪(起点局面和之后的着法)
 
     def __post_init__(self):
         """初始化时加载配置"""
@@ -68,6 +150,23 @@ class ChessContext:
             with open(resource_path("json/platform_config.json"), "r") as f:
                 config = json.load(f)
                 
+            from .inference import BACKENDS, PRECISIONS
+            
+            # 设置推理后端
+            self._inference_backend = config_choice(config, 'inference_backend', BACKENDS, 'torch')
+            
+            # 设置棋子识别方式
+            self._recognition_mode = config_choice(config, 'recognition_mode', RECOGNITION_MODES, 'grid')
+            
+            # 合法着法约束识别
+            self._legal_move_recognition = config.get('legal_move_recognition', False)
+            
+            # 阶段计时配置
+            self._timing = config.get('timing', {})
+            
+            # 日志配置
+            self._logging = config.get('logging', {})
+            
             # 初始化平台
             self._platforms = {}
             for platform_name, platform_config in config.items():
@@ -75,7 +174,11 @@ class ChessContext:
                     self._platforms[platform_name] = Platform(
                         name=platform_name,
                         board_coords=platform_config['board_coords'],
-                        regions=platform_config['regions']
+                        regions=platform_config['regions'],
+                        inference_backend=self._inference_backend,
+                        model_precision=config_choice(platform_config, 'model_precision', PRECISIONS, 'fp32'),
+                        template_tier=platform_config.get('template_tier', {}),
+                        occupancy_filter=platform_config.get('occupancy_filter', {})
                     )
             
             # 加载引擎参数
@@ -90,12 +193,10 @@ class ChessContext:
             self.platform = config.get('platform', 'TT')
             
             # 设置分析模式
-            self._analysis_mode = config.get('analysis_mode', 'timer')
+            self._analysis_mode = config_choice(config, 'analysis_mode', ANALYSIS_MODES, 'timer')
             
-            # 预加载当前平台的模型
-            _ = self.piece_recognizer
-            _ = self.timer_recognizer
-            print("模型初始化完成")
+            # 模型不在这里加载: 启动时由 chess.startup.warm_up 在后台预热,
+            # 之后首次使用时从模型注册表取得
             
         except (FileNotFoundError, json.JSONDecodeError) as e:
             print(f"Error loading config: {e}")
@@ -112,11 +213,6 @@ class ChessContext:
                 }.copy()
             self.platform = "TT"
             self._analysis_mode = "timer"
-            
-            # 预加载默认平台的模型
-            _ = self.piece_recognizer
-            _ = self.timer_recognizer
-            print("模型初始化完成")
     
     def save_config(self):
         """保存所有配置到文件"""
@@ -125,13 +221,21 @@ class ChessContext:
             config = {
                 platform_name: {
                     'board_coords': platform.board_coords,
-                    'regions': platform.regions
+                    'regions': platform.regions,
+                    'model_precision': platform.model_precision,
+                    'template_tier': platform.template_tier,
+                    'occupancy_filter': platform.occupancy_filter
                 }
                 for platform_name, platform in self._platforms.items()
             }
             # 添加其他配置
             config['platform'] = self.platform
             config['analysis_mode'] = self._analysis_mode
+            config['inference_backend'] = self._inference_backend
+            config['recognition_mode'] = self._recognition_mode
+            config['legal_move_recognition'] = self._legal_move_recognition
+            config['timing'] = self._timing
+            config['logging'] = self._logging
             
             # 获取引擎参数的副本
             with self._engine_params_lock:
@@ -156,6 +260,10 @@ class ChessContext:
         # 保存配置
         self.save_config()
     
+    def get_platforms(self) -> List[Platform]:
+        """获取所有平台, 当前平台在最前"""
+        return sorted(self._platforms.values(), key=lambda p: p.name != self.platform)
+    
     def get_platform(self, platform_name: str) -> Platform:
         """获取指定平台"""
         if platform_name not in self._platforms:
@@ -195,11 +303,53 @@ class ChessContext:
         """获取当前平台的倒计时识别器"""
         return self._platforms[self.platform].timer_recognizer
 
+    @property
+    def board_recognizer(self) -> Optional[object]:
+        """获取当前平台的整盘识别器, 没有整盘模型时返回None"""
+        return self._platforms[self.platform].board_recognizer
+
     @property
     def animation_delay(self) -> float:
         """获取当前平台的动画等待时长"""
         return self._platforms[self.platform].animation_delay
 
+    @property
+    def inference_backend(self) -> str:
+        """获取模型推理后端"""
+        return self._inference_backend
+
+    @property
+    def recognition_mode(self) -> str:
+        """获取棋子识别方式"""
+        return self._recognition_mode
+
+    @recognition_mode.setter
+    def recognition_mode(self, mode: str):
+        if mode not in RECOGNITION_MODES:
+            raise ValueError(f"未知的识别方式: {mode}")
+        self._recognition_mode = mode
+        self.save_config()  # 保存配置
+
+    @property
+    def legal_move_recognition(self) -> bool:
+        """是否用上一局面的合法着法校验识别结果(只对格点识别方式有效), 统计见 recognizer.legal_move_stats"""
+        return self._legal_move_recognition
+
+    @legal_move_recognition.setter
+    def legal_move_recognition(self, enabled: bool):
+        self._legal_move_recognition = enabled
+        self.save_config()  # 保存配置
+
+    @property
+    def timing(self) -> Dict:
+        """获取阶段计时配置"""
+        return self._timing
+
+    @property
+    def logging_config(self) -> Dict:
+        """获取日志配置"""
+        return self._logging
+
     @property
     def analysis_mode(self) -> str:
         return self._analysis_mode
@@ -211,12 +361,15 @@ class ChessContext:
 
     def init_position_checker(self):
         """初始化局面检查器"""
-        from .checker import PositionChecker
-        self.position_checker = PositionChecker()
+        from .checker import ArrayPositionChecker
+        from .game import GameTracker
+        self.position_checker = ArrayPositionChecker()
+        self.game_tracker = GameTracker()
 
     def clear_position_checker(self):
         """清理局面检查器"""
         self.position_checker = None
+        self.game_tracker = None
 
 # 创建全局上下文实例
 context = ChessContext(platform="TT")  # 默认使用TT平台 
\ No newline at end of file
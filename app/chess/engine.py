@@ -5,11 +5,16 @@ import subprocess
 import threading
 from chess.message import Message, MessageType
 from chess.context import context
+from tools.log import get_logger
+
+logger = get_logger("engine")
 
 #使用线程锁,可以确保任何时刻只有一个线程可以访问pikafish变量
 #在这里用处可能不大,但感觉日后如果要面对大量用户同时使用,可能用得上
 pikafish_lock = threading.Lock()
 pikafish = None
+# 最近一次以 position fen ... moves 发送的起点局面, 起点不变时引擎保留对局历史
+last_root = None
 
 def init_engine():
     global pikafish # 全局变量
@@ -17,7 +22,7 @@ def init_engine():
     with pikafish_lock:
         # 检查 pikafish 是否已经存在且正在运行  
         if pikafish is not None and pikafish.poll() is None:  
-            print("Pikafish 引擎已经在运行")  
+            logger.debug("Pikafish 引擎已经在运行")
             return 
         # 如果 pikafish 不存在或者已经停止，则重新启动
         elif pikafish is None or pikafish.poll() is not None:
@@ -26,9 +31,9 @@ def init_engine():
             pikafish_command = resource_path("Pikafish/src/pikafish")
             try:  
                 pikafish = subprocess.Popen(pikafish_command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True) 
-                print("Pikafish 引擎已启动。")  
+                logger.info("Pikafish 引擎已启动。")
             except Exception as e:  
-                print(f"启动 Pikafish 引擎时出错：{e}")  
+                logger.error("启动 Pikafish 引擎时出错：%s", e)
                 pikafish = None  # 如果启动失败，将 pikafish 设置为 None
 
     # 准备
@@ -50,7 +55,7 @@ def terminate_engine():
                 pikafish.kill()  # 如果超时，则强制杀死进程  
             finally:  
                 pikafish = None
-                print("Pikafish 引擎已关闭。")
+                logger.info("Pikafish 引擎已关闭。")
 
 def resource_path(relative_path):  
     """ 获取资源文件的绝对路径 """  
@@ -59,7 +64,18 @@ def resource_path(relative_path):
         return os.path.join(sys._MEIPASS, relative_path)  
     return os.path.join(os.path.abspath("./app/"), relative_path)
     
-def get_best_move(fen, side, display_callback=None):
+def get_best_move(fen, side, display_callback=None, root=None, moves=None):
+    """
+    请求引擎计算着法
+    Args:
+        fen: 当前局面的FEN棋子位置
+        side: 是否红方走棋
+        display_callback: 状态消息回调
+        root: 对局跟踪的起点局面(完整FEN), 有起点时发送 position fen <root> moves <moves>
+        moves: 起点之后的着法列表
+    Returns:
+        (着法, 当前局面的完整FEN)
+    """
     fen_string = fen + ' ' + ('w' if side else 'b')
 
     # 从上下文获取引擎参数
@@ -74,7 +90,10 @@ def get_best_move(fen, side, display_callback=None):
     if display_callback:
         display_callback(Message(MessageType.STATUS, "引擎正在计算..."))
 
-    lines, best_move = go(fen_string, param, value)
+    if root:
+        lines, best_move = go(root, param, value, moves or [])
+    else:
+        lines, best_move = go(fen_string, param, value)
 
     if not lines:  
         best_move = "No output received within 40 seconds. code:408"  # 使用408 Request Timeout作为HTTP状态码  
@@ -156,15 +175,29 @@ def ucinewgame():
                 break  
     return output
 
-def go(fen_string, param, value):
+def go(fen_string, param, value, moves=None):
+    """
+    :param fen_string: 局面的完整FEN; 有 moves 时为起点局面
+    :param moves: 起点之后的着法列表, None表示只发送单独的局面
+    """
+    global last_root
     start_position1 = 'rnbakabnr/9/1c5c1/p1p1p1p1p'
     start_position2 = 'P1P1P1P1P/1C5C1/9/RNBAKABNR'
-    if start_position1 in fen_string or start_position2 in fen_string:
-        ucinewgame()
-        pos_command1 = "position startpos\n"
-        pikafish.stdin.write(pos_command1)
-
-    pos_command2 = "position fen " + fen_string + "\n"  
+    is_start = start_position1 in fen_string or start_position2 in fen_string
+    if moves is None:
+        last_root = None
+        if is_start:
+            ucinewgame()
+            pos_command1 = "position startpos\n"
+            pikafish.stdin.write(pos_command1)
+        pos_command2 = "position fen " + fen_string + "\n"
+    else:
+        # 同一起点的后续请求不再重置引擎, 新对局才发送 ucinewgame
+        if fen_string != last_root:
+            if is_start:
+                ucinewgame()
+            last_root = fen_string
+        pos_command2 = "position fen " + fen_string + (" moves " + " ".join(moves) if moves else "") + "\n"
     go_command = "go " + param + " " + value + "\n" 
     # 发送命令  
     pikafish.stdin.write(pos_command2)  
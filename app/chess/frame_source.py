@@ -0,0 +1,194 @@
+import glob
+import json
+import os
+import cv2
+from tools.log import get_logger
+
+logger = get_logger("capture")
+
+# 图片目录中会读取的文件类型
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+
+class FrameSource:
+    """
+    帧来源, capture_region 和离线回放(tools/replay.py)从这里取帧
+    grab() 返回mss截图或BGR/BGRA数组(都可以交给 recognizer.screenshot_to_array),
+    没有更多帧时返回None; info 为最近一帧的附加信息(文件名、标注等)
+    """
+    live = False  # 实时来源没有终点, 取帧失败时应稍后重试
+
+    def __init__(self):
+        self.info = {}
+
+    def grab(self):
+        raise NotImplementedError
+
+    def close(self):
+        """释放资源"""
+
+    def __iter__(self):
+        while True:
+            frame = self.grab()
+            if frame is None:
+                return
+            yield frame
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def crop_region(frame, region):
+    """
+    按截图区域裁剪整屏录制的帧
+    :param region: 与 platform_config.json 中 regions 相同的 {left, top, width, height}, None表示不裁剪
+    """
+    if region is None:
+        return frame
+    left, top = int(region['left']), int(region['top'])
+    return frame[top:top + int(region['height']), left:left + int(region['width'])]
+
+class MssFrameSource(FrameSource):
+    """屏幕截图, mss实例在第一次取帧的线程中创建并一直复用"""
+    live = True
+
+    def __init__(self, region):
+        """
+        :param region: 截图区域 {left, top, width, height}
+        """
+        super().__init__()
+        self.region = region
+        self._sct = None
+
+    def grab(self):
+        if self._sct is None:
+            import mss
+            self._sct = mss.mss()
+        return self._sct.grab(self.region)
+
+    def close(self):
+        if self._sct is not None:
+            self._sct.close()
+            self._sct = None
+
+class ImageDirFrameSource(FrameSource):
+    """
+    按文件名顺序读取目录中的图片
+    目录中有 labels.jsonl (tools/board_renderer.py 的输出格式)时, 每帧的标注放在 info['label']
+    """
+    def __init__(self, directory, region=None, loop=False):
+        """
+        :param directory: 图片目录
+        :param region: 整屏录制时的棋盘区域, None表示图片已是棋盘区域
+        :param loop: 读完后从头开始
+        """
+        super().__init__()
+        self.paths = sorted(path for path in glob.glob(os.path.join(directory, "*"))
+                            if path.lower().endswith(IMAGE_EXTENSIONS))
+        self.region = region
+        self.loop = loop
+        self.index = 0
+        self.labels = {}
+        labels_path = os.path.join(directory, "labels.jsonl")
+        if os.path.exists(labels_path):
+            with open(labels_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    label = json.loads(line)
+                    self.labels[label['file']] = label
+
+    def __len__(self):
+        return len(self.paths)
+
+    def grab(self):
+        # 跳过无法读取的图片; 连续一整轮都读不到(如 loop 时所有图片都已损坏)时结束
+        for _ in range(len(self.paths)):
+            if self.index >= len(self.paths):
+                if not self.loop:
+                    return None
+                self.index = 0
+            path = self.paths[self.index]
+            self.index += 1
+            frame = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+            if frame is not None:
+                break
+            logger.warning("无法读取图片: %s", path)
+        else:
+            return None
+        if frame.ndim == 2:
+            frame = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+        self.info = {'index': self.index - 1, 'path': path, 'label': self.labels.get(os.path.basename(path))}
+        return crop_region(frame, self.region)
+
+class VideoFrameSource(FrameSource):
+    """读取录屏视频"""
+    def __init__(self, path, region=None, step=1):
+        """
+        :param path: 视频文件
+        :param region: 整屏录制时的棋盘区域, None表示视频已是棋盘区域
+        :param step: 每隔几帧取一帧, 模拟截图间隔
+        """
+        super().__init__()
+        self.capture = cv2.VideoCapture(path)
+        if not self.capture.isOpened():
+            raise ValueError(f"无法打开视频: {path}")
+        self.path = path
+        self.region = region
+        self.step = max(1, step)
+        self.index = 0
+
+    def grab(self):
+        for _ in range(self.step - 1):
+            if not self.capture.grab():
+                return None
+            self.index += 1
+        ok, frame = self.capture.read()
+        if not ok:
+            return None
+        self.info = {'index': self.index, 'path': self.path,
+                     'time_ms': self.capture.get(cv2.CAP_PROP_POS_MSEC)}
+        self.index += 1
+        return crop_region(frame, self.region)
+
+    def close(self):
+        self.capture.release()
+
+class MemoryFrameSource(FrameSource):
+    """内存中的帧列表(如 tools/board_renderer.py 渲染的图像)"""
+    def __init__(self, frames, labels=None, loop=False):
+        """
+        :param frames: BGR/BGRA数组列表
+        :param labels: 与帧对应的标注列表, 放在 info['label']
+        :param loop: 读完后从头开始
+        """
+        super().__init__()
+        self.frames = list(frames)
+        self.labels = labels
+        self.loop = loop
+        self.index = 0
+
+    def __len__(self):
+        return len(self.frames)
+
+    def grab(self):
+        if self.index >= len(self.frames):
+            if not self.loop or not self.frames:
+                return None
+            self.index = 0
+        index = self.index
+        self.index += 1
+        self.info = {'index': index, 'label': self.labels[index] if self.labels else None}
+        return self.frames[index]
+
+def open_frame_source(source, region=None, **options):
+    """
+    按来源字符串创建帧来源
+    :param source: 图片目录或视频文件路径
+    :param region: 整屏录制时的棋盘区域
+    :param options: 传给对应来源的其他参数
+    """
+    if os.path.isdir(source):
+        return ImageDirFrameSource(source, region=region, **options)
+    if os.path.isfile(source):
+        return VideoFrameSource(source, region=region, **options)
+    raise ValueError(f"找不到帧来源: {source}")
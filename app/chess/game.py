@@ -0,0 +1,128 @@
+from chess.board import Board
+from chess.movegen import Position, uci_to_move, detect_perpetual_check
+
+# 开局局面(红方在下)
+START_POSITION = "rnbakabnr/9/1c5c1/p1p1p1p1p/9/9/P1P1P1P1P/1C5C1/9/RNBAKABNR"
+
+# 着法列表超过该长度时以当前局面为新的起点, 避免命令过长
+MAX_MOVES = 300
+
+def screen_square_to_uci(row, col, is_red):
+    """
+    屏幕上的格点(行, 列)转为引擎坐标(如 'h2')
+    :param is_red: 本方是红方(红方在屏幕下方)
+    """
+    if not is_red:
+        row, col = 9 - row, 8 - col
+    return f"{chr(ord('a') + col)}{9 - row}"
+
+def infer_move(previous, board, changes):
+    """
+    由两个局面之间的格点变化推断走了哪一步
+    Args:
+        previous: 变化前的棋盘(Board)
+        board: 变化后的棋盘(Board)
+        changes: 格点变化 [(row, col, 原棋子, 新棋子), ...], 即 red_changes + black_changes
+    Returns:
+        ((起点行, 起点列), (终点行, 终点列), 棋子), 变化不是一步棋时为None
+    """
+    if len(changes) != 2:
+        return None
+    vacated = [(row, col, old) for row, col, old, new in changes if old != '-' and new == '-']
+    occupied = [(row, col, old, new) for row, col, old, new in changes if new != '-']
+    if len(vacated) != 1 or len(occupied) != 1:
+        return None
+    from_row, from_col, piece = vacated[0]
+    to_row, to_col, captured, arrived = occupied[0]
+    # 到达终点的必须是离开起点的棋子, 吃子只能吃对方的棋子, 不能吃将帅
+    if arrived != piece:
+        return None
+    if captured != '-' and (captured.isupper() == piece.isupper() or captured in 'Kk'):
+        return None
+    return (from_row, from_col), (to_row, to_col), piece
+
+def is_valid_move(board, move, red_to_move, is_red):
+    """
+    检查推断出的着法在该局面上是否合法(走子方正确, 符合走法规则, 走后不被将军)
+    :param board: 走子前的棋盘(屏幕方向)
+    :param move: infer_move 的返回值
+    :param red_to_move: 该局面是否轮到红方走
+    :param is_red: 本方是否红方
+    """
+    (from_row, from_col), (to_row, to_col), piece = move
+    if piece.isupper() != red_to_move:
+        return False
+    uci = screen_square_to_uci(from_row, from_col, is_red) + screen_square_to_uci(to_row, to_col, is_red)
+    return Position.from_board(board, is_red, red_to_move).is_legal(uci_to_move(uci))
+
+class GameTracker:
+    """
+    跟踪一局棋: 以某个局面为起点, 记录之后由局面变化推断出的着法,
+    向引擎发送 position fen <起点> moves <着法...>, 使引擎了解对局历史(重复局面、长将等规则)
+    推断失败时以当前局面为新的起点
+    """
+    def __init__(self):
+        self.root_fen = None   # 起点局面的完整FEN(含走棋方)
+        self.moves = []        # 起点之后的着法(引擎坐标)
+        self.board = None      # 当前棋盘(屏幕方向)
+        self.is_red = True     # 本方是否红方
+        self.red_to_move = True  # 当前局面是否轮到红方走
+        self.new_game = False  # 起点是否为新对局的开局局面
+
+    def reset(self, board, is_red, red_to_move):
+        """
+        以当前局面为起点
+        :param board: 当前棋盘(Board)
+        :param is_red: 本方是否红方
+        :param red_to_move: 是否轮到红方走
+        """
+        placement = board.to_fen(is_red)
+        self.root_fen = f"{placement} {'w' if red_to_move else 'b'}"
+        self.moves = []
+        self.board = board
+        self.is_red = is_red
+        self.red_to_move = red_to_move
+        self.new_game = placement == START_POSITION and red_to_move
+
+    def update(self, board, is_red, changes, red_to_move):
+        """
+        局面变化后调用
+        Args:
+            board: 变化后的棋盘(Board)
+            is_red: 本方是否红方
+            changes: 格点变化(red_changes + black_changes), 第一个局面为空列表
+            red_to_move: 变化后是否轮到红方走, 推断失败时用于新的起点
+        Returns:
+            推断出的着法(引擎坐标), 以当前局面为新起点时为None
+        """
+        board = Board.from_array(board)
+        move = None
+        if self.board is not None and is_red == self.is_red and changes and len(self.moves) < MAX_MOVES:
+            move = infer_move(self.board, board, changes)
+            if move is not None and not is_valid_move(self.board, move, self.red_to_move, is_red):
+                move = None
+        if move is None:
+            self.reset(board, is_red, red_to_move)
+            return None
+
+        (from_row, from_col), (to_row, to_col), _ = move
+        uci = screen_square_to_uci(from_row, from_col, is_red) + screen_square_to_uci(to_row, to_col, is_red)
+        self.moves.append(uci)
+        self.board = board
+        self.red_to_move = not self.red_to_move
+        return uci
+
+    def perpetual_check(self):
+        """起点之后是否出现长将, 返回长将的一方('red'/'black')或None"""
+        if self.root_fen is None or not self.moves:
+            return None
+        return detect_perpetual_check(self.root_fen, self.moves)
+
+    def position(self, red_to_move):
+        """
+        发送给引擎的起点和着法
+        :param red_to_move: 请求引擎计算的一方, 与跟踪的走棋方不一致时返回 (None, None)
+        """
+        if self.root_fen is None or red_to_move != self.red_to_move:
+            return None, None
+        return self.root_fen, list(self.moves)
@@ -0,0 +1,218 @@
+import os
+import cv2
+import numpy as np
+from tools.log import get_logger
+
+logger = get_logger("recognition")
+
+# 可选的推理后端, 在 platform_config.json 的 inference_backend 中配置
+BACKENDS = ('torch', 'onnxruntime', 'opencv')
+
+# 可选的模型精度, 在 platform_config.json 各平台的 model_precision 中配置
+PRECISIONS = ('fp32', 'int8')
+
+def softmax(logits):
+    """按第1维(类别)计算softmax, 支持 (N, 类别数) 和 (N, 类别数, H, W)"""
+    exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+    return exp / exp.sum(axis=1, keepdims=True)
+
+def crops_to_batch(crops, size):
+    """
+    在内存中把BGR(或BGRA)图片转换为归一化的模型输入, 不经过临时文件
+    :param crops: BGR/BGRA格式的图片列表(numpy数组, 可以是原始截图缓冲区上的视图)
+    :param size: 模型输入边长
+    :return: (N, 3, size, size) 的float32数组, RGB通道, 取值0-1
+    """
+    batch = np.empty((len(crops), 3, size, size), dtype=np.float32)
+    for k, crop in enumerate(crops):
+        if crop.shape[0] != size or crop.shape[1] != size:
+            # 缩小用INTER_AREA, 放大用双线性
+            interpolation = cv2.INTER_AREA if crop.shape[0] > size else cv2.INTER_LINEAR
+            crop = cv2.resize(crop, (size, size), interpolation=interpolation)
+        # BGR(A) -> RGB 和 HWC -> CHW 都是视图, 只在写入batch时拷贝一次
+        np.multiply(crop[:, :, 2::-1].transpose(2, 0, 1), 1 / 255, out=batch[k], casting='unsafe')
+    return batch
+
+def onnx_model_path(model_path, precision="fp32"):
+    """.pth模型对应的ONNX模型路径, int8模型为 xxx.int8.onnx"""
+    suffix = ".onnx" if precision == "fp32" else f".{precision}.onnx"
+    return os.path.splitext(model_path)[0] + suffix
+
+def load_state_dict(model_path):
+    """
+    读取torch权重, 不需要ImageNet预训练权重
+    优先使用同名的 .safetensors 文件(内存映射); 否则用 torch.load(mmap=True),
+    旧格式的 .pth 不支持内存映射时退回普通读取
+    """
+    import torch
+
+    safetensors_path = os.path.splitext(model_path)[0] + ".safetensors"
+    if os.path.exists(safetensors_path):
+        try:
+            from safetensors.torch import load_file
+            return load_file(safetensors_path, device="cpu")
+        except ImportError:
+            logger.info("未安装safetensors, 读取 .pth 模型")
+    try:
+        return torch.load(model_path, map_location="cpu", mmap=True, weights_only=True)
+    except (TypeError, RuntimeError):
+        return torch.load(model_path, map_location="cpu")
+
+def _build_with_weights(create_model, model_path):
+    """
+    构建模型并加载本地权重
+    在meta设备上构建, 跳过随机初始化, 权重直接使用读取到的张量
+    """
+    import torch
+
+    state_dict = load_state_dict(model_path)
+    try:
+        with torch.device("meta"):
+            model = create_model()
+        model.load_state_dict(state_dict, assign=True)
+    except (TypeError, RuntimeError):
+        # 旧版本torch不支持meta设备构建或assign参数
+        model = create_model()
+        model.load_state_dict(state_dict)
+    model.eval()
+    return model
+
+def mobilenet_v2_classifier(num_classes):
+    """MobileNetV2分类模型(随机初始化)"""
+    import torch.nn as nn
+    from torchvision import models
+
+    model = models.mobilenet_v2(weights=None)
+    model.classifier[1] = nn.Linear(model.last_channel, num_classes)
+    return model
+
+def board_fcn(num_classes, cell_stride=2):
+    """
+    整盘识别的全卷积模型(随机初始化)
+    MobileNetV2特征层(步长32)后接1x1卷积分类头, 再按格点做平均池化,
+    每个输出位置对应一个格点; 参数名与 mobilenet_v2_classifier 的 features 一致,
+    可以直接用单格点模型的权重初始化
+    :param num_classes: 类别数
+    :param cell_stride: 每个格点在特征图上占的边长(格点边长 / 32)
+    """
+    from collections import OrderedDict
+    import torch.nn as nn
+    from torchvision import models
+
+    mobilenet = models.mobilenet_v2(weights=None)
+    return nn.Sequential(OrderedDict([
+        ('features', mobilenet.features),
+        ('dropout', nn.Dropout(0.2)),
+        ('classifier', nn.Conv2d(mobilenet.last_channel, num_classes, kernel_size=1)),
+        ('pool', nn.AvgPool2d(cell_stride))
+    ]))
+
+def build_mobilenet_v2(model_path, num_classes):
+    """构建MobileNetV2分类模型并加载本地权重"""
+    return _build_with_weights(lambda: mobilenet_v2_classifier(num_classes), model_path)
+
+def build_board_fcn(model_path, num_classes, cell_stride=2):
+    """构建整盘识别模型并加载本地权重"""
+    return _build_with_weights(lambda: board_fcn(num_classes, cell_stride), model_path)
+
+class TorchBackend:
+    """PyTorch推理后端(仅在没有导出ONNX模型时使用)"""
+    name = 'torch'
+
+    def __init__(self, load_model):
+        """
+        :param load_model: 构建并加载torch模型的函数
+        """
+        import torch
+        self.torch = torch
+        # 检测设备
+        self.device = (
+            torch.device("mps") if torch.backends.mps.is_available()
+            else torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        )
+        logger.info("使用设备: %s", self.device)
+        self.model = load_model().to(self.device)
+        self.model.eval()  # 设置为评估模式
+
+    def run(self, batch):
+        """
+        :param batch: (N, 3, H, W) 的float32数组
+        :return: (N, 类别数) 的logits数组, 整盘模型为 (N, 类别数, 行数, 列数)
+        """
+        with self.torch.no_grad():
+            outputs = self.model(self.torch.from_numpy(batch).to(self.device))
+        return outputs.cpu().numpy()
+
+class OnnxRuntimeBackend:
+    """onnxruntime CPU推理后端"""
+    name = 'onnxruntime'
+
+    def __init__(self, onnx_path):
+        import onnxruntime
+        self.session = onnxruntime.InferenceSession(onnx_path, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def run(self, batch):
+        return self.session.run(None, {self.input_name: batch})[0]
+
+class OpenCVBackend:
+    """OpenCV DNN推理后端, 不需要额外依赖"""
+    name = 'opencv'
+
+    def __init__(self, onnx_path):
+        self.net = cv2.dnn.readNetFromONNX(onnx_path)
+        self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+
+    def run(self, batch):
+        self.net.setInput(batch)
+        return self.net.forward()
+
+def torch_available():
+    """是否安装了torch(只检查, 不导入)"""
+    import importlib.util
+    return importlib.util.find_spec("torch") is not None
+
+def create_backend(name, model_path, load_model, precision="fp32"):
+    """
+    创建推理后端
+    :param name: 后端名称, 见 BACKENDS
+    :param model_path: .pth模型路径, ONNX后端使用同名的.onnx文件
+    :param load_model: 构建torch模型的函数, 仅torch后端使用
+    :param precision: 模型精度, 见 PRECISIONS, int8模型只能由ONNX后端加载
+    :return: 带有 run(batch) 方法的后端对象
+    :raises FileNotFoundError: 找不到ONNX模型且未安装torch
+    :raises ImportError: 指定了torch后端但未安装torch
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"未知的推理后端: {name}")
+    if precision not in PRECISIONS:
+        raise ValueError(f"未知的模型精度: {precision}")
+
+    if name != 'torch':
+        onnx_path = onnx_model_path(model_path, precision)
+        if precision != "fp32" and not os.path.exists(onnx_path):
+            logger.warning("找不到%s模型: %s, 改用fp32模型", precision, onnx_path)
+            onnx_path = onnx_model_path(model_path)
+        if not os.path.exists(onnx_path):
+            if not torch_available():
+                raise FileNotFoundError(
+                    f"找不到ONNX模型: {onnx_path}, 请先安装 requirements-train.txt 中的依赖, "
+                    f"再运行 tools/export_onnx.py 导出模型")
+            logger.warning("找不到ONNX模型: %s, 改用torch后端", onnx_path)
+        elif name == 'onnxruntime':
+            try:
+                return OnnxRuntimeBackend(onnx_path)
+            except ImportError:
+                logger.warning("未安装onnxruntime, 改用opencv后端")
+                return OpenCVBackend(onnx_path)
+        else:
+            return OpenCVBackend(onnx_path)
+    else:
+        if not torch_available():
+            raise ImportError("未安装torch, 请安装 requirements-train.txt 中的依赖, "
+                              "或运行 tools/export_onnx.py 导出模型后改用 opencv / onnxruntime 后端")
+        if precision != "fp32":
+            logger.warning("torch后端不支持%s模型, 使用fp32模型", precision)
+
+    return TorchBackend(load_model)
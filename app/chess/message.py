@@ -24,6 +24,9 @@ class MessageContent:
     ANIMATION_COVERED = "检测到动画遮挡，等待1秒..."
     POSITIONING = "将光标移到棋盘左上角，<br>点击鼠标左键或按S键确认"
     POSITION_COMPLETE = "定位完成!"
+    WARMING_UP = "正在加载识别模型..."
+    STARTING_ENGINE = "正在启动引擎..."
+    WARM_UP_COMPLETE = "加载完成，等待获取棋局..."
     
     # 错误消息
     RECOGNITION_FAILED = "识别失败，请重试"
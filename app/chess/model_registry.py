@@ -0,0 +1,114 @@
+import os
+import threading
+from collections import OrderedDict
+from tools.log import get_logger
+
+logger = get_logger("recognition")
+
+def file_signature(paths):
+    """
+    模型文件的签名: 存在的文件及其修改时间和大小
+    文件被重新导出或量化后签名变化, 缓存自动失效
+    """
+    signature = []
+    for path in paths:
+        if os.path.exists(path):
+            stat = os.stat(path)
+            signature.append((path, stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+class ModelRegistry:
+    """
+    进程级模型注册表
+    按 (模型种类, 平台, 推理配置, 模型文件签名) 缓存已加载的识别器,
+    ChessContext.load_config 重建平台后可以直接复用, 不再重新读盘;
+    超出内存预算时按最久未使用的顺序淘汰
+    """
+    def __init__(self, memory_budget_mb=512):
+        """
+        :param memory_budget_mb: 缓存模型的内存预算(按模型文件大小估算)
+        """
+        self.memory_budget = memory_budget_mb * 1024 * 1024
+        self._models = OrderedDict()  # key -> (模型, 估算大小)
+        self._lock = threading.Lock()
+        self._key_locks = {}          # 同一个模型只加载一次
+        self.hits = 0
+        self.loads = 0
+
+    def get(self, key, factory):
+        """
+        获取模型, 不存在时调用factory加载
+        :param key: 缓存键, 最后一项须为 file_signature 的结果
+        :param factory: 无参数的加载函数
+        """
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                self.hits += 1
+                return self._models[key][0]
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            # 等待期间可能已被其他线程加载
+            with self._lock:
+                if key in self._models:
+                    self._models.move_to_end(key)
+                    self.hits += 1
+                    return self._models[key][0]
+
+            model = factory()
+            size = sum(item[2] for item in key[-1])
+            with self._lock:
+                self._models[key] = (model, size)
+                self.loads += 1
+                self._key_locks.pop(key, None)
+                self._evict(keep=key)
+            return model
+
+    def _evict(self, keep):
+        """超出预算时淘汰最久未使用的模型(调用方持有锁)"""
+        total = sum(size for _, size in self._models.values())
+        for key in list(self._models):
+            if total <= self.memory_budget:
+                break
+            if key == keep:
+                continue
+            total -= self._models.pop(key)[1]
+            logger.info("模型缓存超出预算, 淘汰: %s", key[:2])
+
+    def preload(self, platforms):
+        """
+        在后台线程中预加载平台的模型
+        :param platforms: Platform 列表
+        :return: 预加载线程
+        """
+        def run():
+            for platform in platforms:
+                try:
+                    _ = platform.piece_recognizer
+                    _ = platform.timer_recognizer
+                    logger.info("后台预加载 %s 模型完成", platform.name)
+                except Exception as e:
+                    logger.error("后台预加载 %s 模型出错: %s", platform.name, e)
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        return thread
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._models.clear()
+
+    def stats(self):
+        """返回缓存统计"""
+        with self._lock:
+            return {
+                'models': len(self._models),
+                'bytes': sum(size for _, size in self._models.values()),
+                'hits': self.hits,
+                'loads': self.loads
+            }
+
+# 全局模型注册表
+model_registry = ModelRegistry()
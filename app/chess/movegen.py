@@ -0,0 +1,368 @@
+from chess.board import Board, ROWS, COLS, EMPTY, KING, ADVISOR, BISHOP, KNIGHT, ROOK, CANNON, PAWN, piece_code, piece_char
+from chess.zobrist import PIECE_KEY_TABLE, BLACK_TO_MOVE_KEY
+
+# 局面按FEN方向保存: 第0行为黑方底线, 第9行为红方底线; 格点编号 = 行 * 9 + 列
+SQUARES = ROWS * COLS
+
+def _square(row, col):
+    return row * COLS + col
+
+def _on_board(row, col):
+    return 0 <= row < ROWS and 0 <= col < COLS
+
+def _in_palace(row, col, red):
+    return 3 <= col <= 5 and (7 <= row <= 9 if red else 0 <= row <= 2)
+
+def _own_half(row, red):
+    return row >= 5 if red else row <= 4
+
+# ---------- 预先计算的走法表 ----------
+# 车、炮的四个方向上依次经过的格点
+RAYS = [[[_square(r, c) for r, c in _ray] for _ray in (
+            [(row - i, col) for i in range(1, row + 1)],
+            [(row + i, col) for i in range(1, ROWS - row)],
+            [(row, col - i) for i in range(1, col + 1)],
+            [(row, col + i) for i in range(1, COLS - col)])]
+        for row in range(ROWS) for col in range(COLS)]
+
+# 马: [(终点, 马腿), ...]
+KNIGHT_MOVES = [[(_square(row + dr, col + dc), _square(row + lr, col + lc))
+                 for dr, dc, lr, lc in ((-2, -1, -1, 0), (-2, 1, -1, 0), (2, -1, 1, 0), (2, 1, 1, 0),
+                                        (-1, -2, 0, -1), (1, -2, 0, -1), (-1, 2, 0, 1), (1, 2, 0, 1))
+                 if _on_board(row + dr, col + dc)]
+                for row in range(ROWS) for col in range(COLS)]
+
+# 能攻击某格点的马的位置: [(马的位置, 马腿), ...]
+KNIGHT_ATTACKERS = [[] for _ in range(SQUARES)]
+for _from in range(SQUARES):
+    for _to, _leg in KNIGHT_MOVES[_from]:
+        KNIGHT_ATTACKERS[_to].append((_from, _leg))
+
+def _side_tables(red):
+    """一方的将帅、士、象、兵的走法表"""
+    king, advisor, bishop, pawn = [], [], [], []
+    forward = -1 if red else 1
+    for row in range(ROWS):
+        for col in range(COLS):
+            king.append([_square(row + dr, col + dc) for dr, dc in ((-1, 0), (1, 0), (0, -1), (0, 1))
+                         if _in_palace(row + dr, col + dc, red)])
+            advisor.append([_square(row + dr, col + dc) for dr, dc in ((-1, -1), (-1, 1), (1, -1), (1, 1))
+                            if _in_palace(row + dr, col + dc, red)])
+            # 象: [(终点, 象眼), ...], 不能过河
+            bishop.append([(_square(row + dr, col + dc), _square(row + dr // 2, col + dc // 2))
+                           for dr, dc in ((-2, -2), (-2, 2), (2, -2), (2, 2))
+                           if _on_board(row + dr, col + dc) and _own_half(row + dr, red)])
+            # 兵: 向前一步, 过河后可以左右走
+            moves = [(row + forward, col)] if _on_board(row + forward, col) else []
+            if not _own_half(row, red):
+                moves += [(row, col + dc) for dc in (-1, 1) if _on_board(row, col + dc)]
+            pawn.append([_square(r, c) for r, c in moves])
+    return king, advisor, bishop, pawn
+
+RED_TABLES = _side_tables(True)
+BLACK_TABLES = _side_tables(False)
+
+# 能攻击某格点的兵的位置, 按兵所属的一方: PAWN_ATTACKERS[red][格点]
+PAWN_ATTACKERS = {True: [[] for _ in range(SQUARES)], False: [[] for _ in range(SQUARES)]}
+for _red, _tables in ((True, RED_TABLES), (False, BLACK_TABLES)):
+    for _from in range(SQUARES):
+        for _to in _tables[3][_from]:
+            PAWN_ATTACKERS[_red][_to].append(_from)
+
+def square_to_uci(square):
+    """格点编号转为引擎坐标, 如 'h2'"""
+    row, col = divmod(square, COLS)
+    return f"{chr(ord('a') + col)}{9 - row}"
+
+def uci_to_square(text):
+    """引擎坐标转为格点编号"""
+    return _square(9 - int(text[1]), ord(text[0]) - ord('a'))
+
+def move_to_uci(move):
+    return square_to_uci(move[0]) + square_to_uci(move[1])
+
+def uci_to_move(text):
+    return uci_to_square(text[:2]), uci_to_square(text[2:4])
+
+class Position:
+    """
+    可走子的局面: 90个格点的棋子编码(红正黑负), 走棋方和Zobrist哈希(随走子增量更新)
+    着法为 (起点, 终点) 格点编号
+    """
+    def __init__(self, squares, red_to_move=True):
+        """
+        :param squares: 长度90的棋子编码列表, FEN方向
+        :param red_to_move: 是否轮到红方走
+        """
+        self.squares = list(squares)
+        self.red_to_move = red_to_move
+        self.kings = {True: None, False: None}
+        self.hash = BLACK_TO_MOVE_KEY if not red_to_move else 0
+        for square, code in enumerate(self.squares):
+            if code:
+                self.hash ^= PIECE_KEY_TABLE[square][code + 7]
+                if code == KING:
+                    self.kings[True] = square
+                elif code == -KING:
+                    self.kings[False] = square
+
+    @classmethod
+    def from_fen(cls, fen):
+        """由FEN创建, 第二段为走棋方('w'/'r' 红方, 'b' 黑方), 缺省为红方"""
+        parts = fen.split()
+        board = Board.from_fen(parts[0])
+        return cls(board.cells.ravel().tolist(), len(parts) < 2 or parts[1] != 'b')
+
+    @classmethod
+    def from_board(cls, board, is_red, red_to_move):
+        """
+        由识别结果的棋盘创建
+        :param board: 屏幕方向的 Board 或二维字符数组
+        :param is_red: 本方是否红方(红方在屏幕下方)
+        :param red_to_move: 是否轮到红方走
+        """
+        board = Board.from_array(board)
+        if not is_red:
+            board = board.flipped()
+        return cls(board.cells.ravel().tolist(), red_to_move)
+
+    def to_fen(self):
+        board = Board()
+        board.cells.ravel()[:] = self.squares
+        return f"{board.to_fen()} {'w' if self.red_to_move else 'b'}"
+
+    def copy(self):
+        position = Position.__new__(Position)
+        position.squares = self.squares[:]
+        position.red_to_move = self.red_to_move
+        position.kings = dict(self.kings)
+        position.hash = self.hash
+        return position
+
+    # ---------- 走子 ----------
+    def make_move(self, move):
+        """走一步, 返回被吃的棋子编码(供 unmake_move 使用)"""
+        from_square, to_square = move
+        squares = self.squares
+        piece = squares[from_square]
+        captured = squares[to_square]
+        keys_from, keys_to = PIECE_KEY_TABLE[from_square], PIECE_KEY_TABLE[to_square]
+        self.hash ^= keys_from[piece + 7] ^ keys_to[piece + 7] ^ keys_to[captured + 7] ^ BLACK_TO_MOVE_KEY
+        squares[to_square] = piece
+        squares[from_square] = EMPTY
+        if piece == KING or piece == -KING:
+            self.kings[piece > 0] = to_square
+        if captured == KING or captured == -KING:
+            self.kings[captured > 0] = None
+        self.red_to_move = not self.red_to_move
+        return captured
+
+    def unmake_move(self, move, captured):
+        """撤销 make_move"""
+        from_square, to_square = move
+        squares = self.squares
+        piece = squares[to_square]
+        keys_from, keys_to = PIECE_KEY_TABLE[from_square], PIECE_KEY_TABLE[to_square]
+        self.hash ^= keys_from[piece + 7] ^ keys_to[piece + 7] ^ keys_to[captured + 7] ^ BLACK_TO_MOVE_KEY
+        squares[from_square] = piece
+        squares[to_square] = captured
+        if piece == KING or piece == -KING:
+            self.kings[piece > 0] = from_square
+        if captured == KING or captured == -KING:
+            self.kings[captured > 0] = to_square
+        self.red_to_move = not self.red_to_move
+
+    # ---------- 着法生成 ----------
+    def pseudo_legal_moves(self):
+        """不考虑走后被将军的所有着法"""
+        sign = 1 if self.red_to_move else -1
+        moves = []
+        for from_square, code in enumerate(self.squares):
+            if code * sign > 0:
+                self._piece_moves(from_square, code * sign, sign, moves.append)
+        return moves
+
+    def _piece_moves(self, from_square, kind, sign, append):
+        """
+        生成一个棋子不考虑走后被将军的着法
+        :param kind: 棋子种类(不带正负号)
+        :param sign: 走棋方为红方时为1, 黑方为-1
+        :param append: 接收 (from, to) 着法的函数
+        """
+        squares = self.squares
+        king_table, advisor_table, bishop_table, pawn_table = RED_TABLES if sign > 0 else BLACK_TABLES
+        if kind == ROOK:
+            for ray in RAYS[from_square]:
+                for to_square in ray:
+                    target = squares[to_square]
+                    if target == EMPTY:
+                        append((from_square, to_square))
+                    else:
+                        if target * sign < 0:
+                            append((from_square, to_square))
+                        break
+        elif kind == CANNON:
+            for ray in RAYS[from_square]:
+                screen = False
+                for to_square in ray:
+                    target = squares[to_square]
+                    if not screen:
+                        if target == EMPTY:
+                            append((from_square, to_square))
+                        else:
+                            screen = True
+                    elif target != EMPTY:
+                        if target * sign < 0:
+                            append((from_square, to_square))
+                        break
+        elif kind == KNIGHT:
+            for to_square, leg in KNIGHT_MOVES[from_square]:
+                if squares[leg] == EMPTY and squares[to_square] * sign <= 0:
+                    append((from_square, to_square))
+        elif kind == PAWN:
+            for to_square in pawn_table[from_square]:
+                if squares[to_square] * sign <= 0:
+                    append((from_square, to_square))
+        elif kind == BISHOP:
+            for to_square, eye in bishop_table[from_square]:
+                if squares[eye] == EMPTY and squares[to_square] * sign <= 0:
+                    append((from_square, to_square))
+        elif kind == ADVISOR:
+            for to_square in advisor_table[from_square]:
+                if squares[to_square] * sign <= 0:
+                    append((from_square, to_square))
+        else:  # KING
+            for to_square in king_table[from_square]:
+                if squares[to_square] * sign <= 0:
+                    append((from_square, to_square))
+
+    def is_attacked(self, square, by_red):
+        """
+        格点是否被一方攻击(车、炮、马、兵, 以及将帅照面)
+        :param by_red: 攻击方是否红方
+        """
+        squares = self.squares
+        sign = 1 if by_red else -1
+        rook, cannon, knight, king = ROOK * sign, CANNON * sign, KNIGHT * sign, KING * sign
+        for direction, ray in enumerate(RAYS[square]):
+            screen = False
+            for to_square in ray:
+                target = squares[to_square]
+                if target == EMPTY:
+                    continue
+                if not screen:
+                    # 将帅在同一列上直接照面
+                    if target == rook or (target == king and direction < 2):
+                        return True
+                    screen = True
+                else:
+                    if target == cannon:
+                        return True
+                    break
+        for from_square, leg in KNIGHT_ATTACKERS[square]:
+            if squares[from_square] == knight and squares[leg] == EMPTY:
+                return True
+        pawn = PAWN * sign
+        for from_square in PAWN_ATTACKERS[by_red][square]:
+            if squares[from_square] == pawn:
+                return True
+        return False
+
+    def in_check(self, red=None):
+        """
+        一方是否被将军(含将帅照面)
+        :param red: 被将军的一方, 默认为走棋方
+        """
+        if red is None:
+            red = self.red_to_move
+        king_square = self.kings[red]
+        return king_square is None or self.is_attacked(king_square, not red)
+
+    def legal_moves(self):
+        """走后己方不被将军的着法"""
+        red = self.red_to_move
+        moves = []
+        for move in self.pseudo_legal_moves():
+            captured = self.make_move(move)
+            if not self.in_check(red):
+                moves.append(move)
+            self.unmake_move(move, captured)
+        return moves
+
+    def is_legal(self, move):
+        """着法是否合法, 只生成起点上棋子的着法"""
+        from_square = move[0]
+        sign = 1 if self.red_to_move else -1
+        kind = self.squares[from_square] * sign
+        if kind <= 0:
+            return False
+        targets = []
+        self._piece_moves(from_square, kind, sign, targets.append)
+        if move not in targets:
+            return False
+        red = self.red_to_move
+        captured = self.make_move(move)
+        legal = not self.in_check(red)
+        self.unmake_move(move, captured)
+        return legal
+
+    def gives_check(self, move):
+        """走这步棋后是否将军对方"""
+        red = self.red_to_move
+        captured = self.make_move(move)
+        check = self.in_check(not red)
+        self.unmake_move(move, captured)
+        return check
+
+    def is_checkmate(self):
+        """走棋方无合法着法(象棋中困毙也算负)"""
+        return not self.legal_moves()
+
+    def perft(self, depth):
+        """合法着法树的叶子节点数"""
+        if depth == 0:
+            return 1
+        red = self.red_to_move
+        nodes = 0
+        for move in self.pseudo_legal_moves():
+            captured = self.make_move(move)
+            if not self.in_check(red):
+                nodes += 1 if depth == 1 else self.perft(depth - 1)
+            self.unmake_move(move, captured)
+        return nodes
+
+    def piece_at(self, square):
+        """格点上的棋子字符"""
+        return piece_char(self.squares[square])
+
+def detect_perpetual_check(root_fen, moves, min_repeats=3):
+    """
+    长将判断: 当前局面已重复 min_repeats 次, 且在最近一次重复循环中一方的每步棋都在将军
+    Args:
+        root_fen: 起点局面的完整FEN
+        moves: 起点之后的着法(引擎坐标)
+        min_repeats: 认定为循环所需的重复次数
+    Returns:
+        长将的一方 'red' / 'black', 没有长将时为None
+    """
+    position = Position.from_fen(root_fen)
+    hashes = [position.hash]
+    checks = []  # 每步棋走后是否将军对方, 以及走子方
+    for text in moves:
+        move = uci_to_move(text)
+        red = position.red_to_move
+        position.make_move(move)
+        checks.append((red, position.in_check(not red)))
+        hashes.append(position.hash)
+
+    current = hashes[-1]
+    occurrences = [index for index, value in enumerate(hashes) if value == current]
+    if len(occurrences) < min_repeats:
+        return None
+    # 最近一次循环中的着法: checks[i] 为从 hashes[i] 走到 hashes[i + 1] 的着法
+    cycle = checks[occurrences[-2]:]
+    for side in (True, False):
+        side_moves = [check for red, check in cycle if red == side]
+        if side_moves and all(side_moves):
+            return 'red' if side else 'black'
+    return None
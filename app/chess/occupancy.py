@@ -0,0 +1,117 @@
+import numpy as np
+
+class OccupancyDetector:
+    """
+    空位预判
+    空格点上只有穿过中心的横竖两条棋盘线, 去掉这两条线所在的条带后几乎没有边缘;
+    棋子的圆边和文字会在条带外产生大量边缘
+    """
+    def __init__(self, edge_threshold=0.02, gradient_threshold=40, line_band=0.12):
+        """
+        :param edge_threshold: 条带外边缘像素比例低于该值才判为空位
+        :param gradient_threshold: 灰度梯度超过该值的像素算作边缘
+        :param line_band: 中心横竖条带的半宽(占格点边长的比例)
+        """
+        self.edge_threshold = edge_threshold
+        self.gradient_threshold = gradient_threshold
+        self.line_band = line_band
+        self._mask = None
+
+    def _outside_band_mask(self, height, width):
+        """中心十字条带以外区域的掩码, 按尺寸缓存"""
+        if self._mask is None or self._mask.shape != (height, width):
+            rows = np.abs(np.arange(height) - (height - 1) / 2) > height * self.line_band
+            cols = np.abs(np.arange(width) - (width - 1) / 2) > width * self.line_band
+            self._mask = rows[:, None] & cols[None, :]
+        return self._mask
+
+    def edge_density(self, crops):
+        """
+        计算每个格点条带外的边缘像素比例
+        :param crops: 尺寸一致的 (N, H, W, C) BGR/BGRA数组
+        :return: (N,) 的float数组
+        """
+        gray = crops[..., :3] @ np.array([0.114, 0.587, 0.299], dtype=np.float32)
+        edges = np.zeros(gray.shape, dtype=bool)
+        edges[:, :, 1:] |= np.abs(np.diff(gray, axis=2)) > self.gradient_threshold
+        edges[:, 1:, :] |= np.abs(np.diff(gray, axis=1)) > self.gradient_threshold
+        mask = self._outside_band_mask(*gray.shape[1:])
+        return edges[:, mask].mean(axis=1)
+
+    def predict_empty(self, crops):
+        """
+        :param crops: 尺寸一致的 (N, H, W, C) BGR/BGRA数组
+        :return: (N,) 的bool数组, True表示空位
+        """
+        if len(crops) == 0:
+            return np.zeros(0, dtype=bool)
+        return self.edge_density(crops) < self.edge_threshold
+
+class OccupancyFilter:
+    """
+    空位过滤识别器, 接口与 ChessPieceRecognizer 相同
+    判为空位的格点直接返回'-', 只有有子的格点才交给内部识别器
+    """
+    def __init__(self, recognizer, detector=None, platform=None):
+        """
+        :param recognizer: 识别有子格点的识别器
+        :param detector: OccupancyDetector, 默认使用默认阈值
+        :param platform: 平台名称, 只用于错误信息
+        :raises ValueError: 识别器的类别映射中没有空位类别'-'
+        """
+        self.recognizer = recognizer
+        self.detector = detector or OccupancyDetector()
+        self.class_map = recognizer.class_map
+        self.empty_index = next((int(index) for index, name in self.class_map.items() if name == '-'), None)
+        if self.empty_index is None:
+            raise ValueError(f"{platform or '当前平台'}的类别映射中没有空位类别'-', 不能启用空位预判")
+        self.filtered = 0   # 判为空位而跳过识别的格点数
+        self.forwarded = 0  # 交给内部识别器的格点数
+
+    def recognize(self, image_path):
+        """单张图片不做空位预判"""
+        return self.recognizer.recognize(image_path)
+
+    def recognize_array(self, image):
+        """单张图片不做空位预判"""
+        return self.recognizer.recognize_array(image)
+
+    def recognize_batch(self, crops):
+        """
+        批量识别, 返回值与 ChessPieceRecognizer.recognize_batch 相同
+        :param crops: 尺寸一致的 (N, H, W, C) 数组; 其他输入直接交给内部识别器
+        """
+        if not isinstance(crops, np.ndarray):
+            return self.recognizer.recognize_batch(crops)
+
+        empty = self.detector.predict_empty(crops)
+        occupied = np.flatnonzero(~empty)
+        self.filtered += len(crops) - len(occupied)
+        self.forwarded += len(occupied)
+
+        class_names = ['-'] * len(crops)
+        confidences = np.ones(len(crops), dtype=np.float32)
+        class_indices = np.full(len(crops), self.empty_index, dtype=np.int64)
+        if len(occupied) == 0:
+            return {'class_names': class_names, 'confidences': confidences, 'class_indices': class_indices}
+
+        result = self.recognizer.recognize_batch(crops[occupied])
+        if result is None:
+            return None
+        for k, class_name in zip(occupied, result['class_names']):
+            class_names[k] = class_name
+        confidences[occupied] = result['confidences']
+        class_indices[occupied] = result['class_indices']
+        return {'class_names': class_names, 'confidences': confidences, 'class_indices': class_indices}
+
+    def stats(self):
+        """返回空位过滤统计, 内部识别器有统计时一并返回"""
+        total = self.filtered + self.forwarded
+        stats = {
+            'filtered': self.filtered,
+            'forwarded': self.forwarded,
+            'filtered_rate': self.filtered / total if total else 0.0
+        }
+        if hasattr(self.recognizer, 'stats'):
+            stats.update(self.recognizer.stats())
+        return stats
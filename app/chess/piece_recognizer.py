@@ -1,44 +1,39 @@
-import torch
-import torch.nn as nn
-from torchvision import models, transforms
-from PIL import Image
+import cv2
+import numpy as np
 import json
 import glob
 from tools.utils import resource_path
+from chess.inference import create_backend, build_mobilenet_v2, softmax, crops_to_batch
+from tools.log import get_logger
+
+logger = get_logger("recognition")
+
+# 模型输入尺寸
+INPUT_SIZE = 80
 
 class ChessPieceRecognizer:
-    def __init__(self, platform="TT"):
+    def __init__(self, platform="TT", backend="torch", precision="fp32"):
         """
         初始化棋子识别器
         :param platform: 游戏平台，"TT"表示天天象棋，"JJ"表示JJ象棋
+        :param backend: 推理后端, "torch"、"onnxruntime" 或 "opencv"
+        :param precision: 模型精度, "fp32" 或 "int8"(需先运行 tools/quantize_models.py)
         """
-        # 检测设备
-        self.device = (
-            torch.device("mps") if torch.backends.mps.is_available()
-            else torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        )
-        
         # 根据平台选择模型类型
         model_type = "tt" if platform == "TT" else "jj"
         self.model_path = resource_path(f"models/{model_type}_piece_model.pth")
         self.class_map_path = resource_path(f"models/{model_type}_piece_map.json")
         
-        # 图像预处理
-        self.transform = transforms.Compose([
-            transforms.Resize((80, 80)),
-            transforms.ToTensor(),
-        ])
-        
         # 加载类别映射
         with open(self.class_map_path, "r", encoding="utf-8") as f:
             self.class_map = json.load(f)
         
         # 加载模型
-        self.model = models.mobilenet_v2(weights=None)  # 使用新的 weights 参数
-        self.model.classifier[1] = nn.Linear(self.model.last_channel, len(self.class_map))
-        self.model.load_state_dict(torch.load(self.model_path))
-        self.model = self.model.to(self.device)
-        self.model.eval()  # 设置为评估模式
+        self.backend = create_backend(backend, self.model_path, self._load_model, precision)
+    
+    def _load_model(self):
+        """构建torch模型并加载权重(仅torch后端和导出ONNX时使用)"""
+        return build_mobilenet_v2(self.model_path, len(self.class_map))
     
     def recognize(self, image_path):
         """
@@ -49,30 +44,56 @@ class ChessPieceRecognizer:
             - confidence: 置信度（0-1之间的浮点数）
             - class_index: 预测的类别索引
         """
+        image = cv2.imread(image_path)
+        if image is None:
+            logger.error("无法读取图片: %s", image_path)
+            return None
+        return self.recognize_array(image)
+    
+    def recognize_array(self, image):
+        """
+        识别单个棋子图片(内存中的numpy数组)
+        :param image: BGR或BGRA格式的棋子图片
+        :return: 与recognize相同的字典, 失败时返回None
+        """
+        result = self.recognize_batch([image])
+        if result is None:
+            return None
+        return {
+            'class_name': result['class_names'][0],
+            'confidence': float(result['confidences'][0]),
+            'class_index': int(result['class_indices'][0])
+        }
+
+    def recognize_batch(self, crops):
+        """
+        批量识别棋子图片, 所有图片拼成一个批次, 只做一次前向推理
+        :param crops: BGR/BGRA格式的棋子图片列表(numpy数组, 尺寸可以不同)
+        :return: 字典，包含每张图片的识别结果, 顺序与输入一致
+            - class_names: 识别结果列表
+            - confidences: 置信度数组
+            - class_indices: 预测的类别索引数组
+        """
+        if len(crops) == 0:
+            return {
+                'class_names': [],
+                'confidences': np.empty(0, dtype=np.float32),
+                'class_indices': np.empty(0, dtype=np.int64)
+            }
         try:
-            # 加载并预处理图像
-            image = Image.open(image_path)
-            image = self.transform(image).unsqueeze(0)  # 添加批次维度
-            image = image.to(self.device)
-            
-            # 模型预测
-            with torch.no_grad():
-                outputs = self.model(image)
-                probabilities = torch.nn.functional.softmax(outputs, dim=1)
-                _, predicted = torch.max(outputs, 1)
-                predicted_idx = predicted.item()
-                confidence = probabilities[0][predicted_idx].item()
+            # 在内存中预处理, 一次前向推理
+            outputs = self.backend.run(crops_to_batch(crops, INPUT_SIZE))
+            probabilities = softmax(outputs)
+            class_indices = probabilities.argmax(axis=1)
             
-            # 将数字转换为类别名称
-            predicted_class = self.class_map[str(predicted_idx)]
             return {
-                'class_name': predicted_class,
-                'confidence': confidence,
-                'class_index': predicted_idx
+                'class_names': [self.class_map[str(idx)] for idx in class_indices],
+                'confidences': probabilities[np.arange(len(class_indices)), class_indices],
+                'class_indices': class_indices
             }
             
         except Exception as e:
-            print(f"识别图片时出错: {str(e)}")
+            logger.error("批量识别图片时出错: %s", e)
             return None
 
 # 使用示例
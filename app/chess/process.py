@@ -3,32 +3,66 @@ from tools.utils import convert_array_to_fen, convert_move_to_chinese
 from chess.engine import get_best_move
 from chess.message import Message, MessageType
 from chess.context import context
+from chess.board import Board
+from chess.timing import tracer
+from tools.log import get_logger
+import logging
 import time
 
-def main_process(img_origin, callback=None):  
-    # 棋局图像  
+recognition_log = get_logger("recognition")
+checker_log = get_logger("checker")
+engine_log = get_logger("engine")
+
+def main_process(img_origin, callback=None, use_engine=True, retry_delay=0.5):  
+    # 棋局图像: mss截图, 或BGR/BGRA格式的numpy数组(如合成棋盘)
+    # use_engine=False 时只识别和检查局面变化, 不请求引擎(离线回放)
+    # retry_delay: 识别失败后等待的秒数, 离线回放时为0
     # img_path = './app/uploads/图像.jpeg' 
 
     # 识别棋盘
-    x_array, y_array = recognizer.recognize_board(img_origin)
+    with tracer.span("board_coords"):
+        x_array, y_array = recognizer.recognize_board(img_origin)
 
-    # 识别棋子类型和坐标
-    piecesArray, is_red = recognizer.recognize_piece_from_grid(img_origin, x_array, y_array, callback)
+    # 识别棋子类型和坐标, 其中格点切割计入 preprocess, 模型推理计入 inference
+    with tracer.span("recognize", mode=context.recognition_mode):
+        piecesArray, is_red = recognizer.recognize_pieces(img_origin, x_array, y_array, callback)
+    if recognition_log.isEnabledFor(logging.DEBUG):
+        recognition_log.debug("格点缓存: %s", recognizer.square_cache.stats())
+        if context.legal_move_recognition:
+            recognition_log.debug("合法着法校验: %s", recognizer.legal_move_stats)
+        if hasattr(context.piece_recognizer, 'stats'):
+            recognition_log.debug("识别统计: %s", context.piece_recognizer.stats())
     
     # 如果识别失败，返回空消息
     if piecesArray is None:
-        time.sleep(0.5)
-        print("Debug - 识别棋子失败，等待0.5秒后返回重试")
+        time.sleep(retry_delay)
+        recognition_log.info("识别棋子失败，等待%s秒后返回重试", retry_delay)
         return None, Message(MessageType.MOVE_CODE, "")
     
 
-    print("Debug - 棋子数组:")
-    for row in piecesArray:
-        print(row)
+    # 之后的局面检查、转FEN和界面显示都使用数组形式的棋盘
+    piecesArray = Board.from_array(piecesArray)
+    if recognition_log.isEnabledFor(logging.DEBUG):
+        recognition_log.debug("棋子数组:\n%s", "\n".join(piecesArray))
     
     # 检查局面是否有变化
-    has_changes, red_changes, black_changes = context.position_checker.get_available_changes(piecesArray)
-    print(f"Debug - 局面检查: has_changes={has_changes}, red_changes={red_changes}, black_changes={black_changes}")
+    with tracer.span("diff"):
+        has_changes, red_changes, black_changes = context.position_checker.get_available_changes(piecesArray)
+    checker_log.debug("局面检查: has_changes=%s, red_changes=%s, black_changes=%s",
+                      has_changes, red_changes, black_changes)
+    # 由局面变化推断着法, 推断失败时对局跟踪以当前局面为新起点
+    tracker = context.game_tracker
+    if has_changes and tracker is not None:
+        tracked_move = tracker.update(piecesArray, is_red, red_changes + black_changes,
+                                      not context.position_checker.black_to_move)
+        engine_log.debug("推断着法: %s, 起点: %s, 着法数: %d", tracked_move, tracker.root_fen, len(tracker.moves))
+        if tracked_move and context.position_checker.repetition_count > 2:
+            perpetual = tracker.perpetual_check()
+            if perpetual:
+                engine_log.warning("%s方长将", "红" if perpetual == "red" else "黑")
+    if has_changes and context.position_checker.repetition_count > 1:
+        checker_log.info("局面重复出现 %d 次 (hash=%016x)", context.position_checker.repetition_count,
+                         context.position_checker.position_hash)
     
     # 如果有变化，更新局面显示
     if has_changes:
@@ -39,28 +73,35 @@ def main_process(img_origin, callback=None):
                 position=piecesArray, 
                 is_red=is_red,
                 red_changes=red_changes,
-                black_changes=black_changes
+                black_changes=black_changes,
+                position_hash=context.position_checker.position_hash,
+                repetitions=context.position_checker.repetition_count
             ))
         
         # 判断是否是对方走棋（我方是红棋，黑方有变化；我方是黑棋，红方有变化）
         # 或者是初始局面（没有变化列表）
         is_opponent_move = (is_red and black_changes) or (not is_red and red_changes) or (is_red and not red_changes and not black_changes)
-        print(f"Debug - 引擎分析判断: is_red={is_red}, is_opponent_move={is_opponent_move}")
+        engine_log.debug("引擎分析判断: is_red=%s, is_opponent_move=%s", is_red, is_opponent_move)
         
         if is_opponent_move:
-            print("Debug - 开始引擎分析...")
+            engine_log.debug("开始引擎分析...")
             # 转成 FEN字符串
-            fen_str, board_array = convert_array_to_fen(piecesArray, is_red)
+            with tracer.span("fen"):
+                fen_str, board_array = convert_array_to_fen(piecesArray, is_red)
+            if not use_engine:
+                return Message(MessageType.MOVE_TEXT, ""), Message(MessageType.MOVE_CODE, "", fen_str=fen_str)
             # 对方已走棋，轮到我方，发送给引擎计算
-            move, fen = get_best_move(fen_str, is_red, callback)
-            print(f"Debug - 引擎分析结果: move={move}, FEN={fen}")
+            root, moves = tracker.position(is_red) if tracker is not None else (None, None)
+            with tracer.span("engine"):
+                move, fen = get_best_move(fen_str, is_red, callback, root=root, moves=moves)
+            engine_log.info("引擎分析结果: move=%s, FEN=%s", move, fen)
 
             try:
                 # 发送通知
                 chinese_move = convert_move_to_chinese(move, board_array, is_red)
                 return Message(MessageType.MOVE_TEXT, chinese_move), Message(MessageType.MOVE_CODE, move, is_red=is_red)
             except Exception as e:
-                print(f"Error in convert_move_to_chinese: move={move}, error={str(e)}")  # 添加错误信息
+                engine_log.error("着法转换出错: move=%s, error=%s", move, e)
                 return Message(MessageType.STATUS, "识别错误，请重试"), Message(MessageType.CHANGE, "", fen_str=fen_str, is_red=is_red)
     
     # 局面未变化或不是对方走棋，返回空着法
@@ -1,9 +1,31 @@
 import cv2
 import numpy as np
 import os
+from functools import lru_cache
 from tools.utils import filter_vertical_lines, filter_horizontal_lines, resource_path
 from chess.context import context
 from chess.message import Message, MessageType, MessageContent
+from chess.square_cache import SquareCache
+from chess.piece_recognizer import INPUT_SIZE
+from chess.timing import tracer
+from tools.log import get_logger
+
+logger = get_logger("recognition")
+
+# 格点识别缓存, 跨帧复用未变化格点的识别结果
+square_cache = SquareCache()
+
+# 预分配的格点图片缓冲区, 每帧复用
+_crop_buffer = None
+
+# board_coords 保存的坐标以截图缩放到该宽度后的图像为准
+BOARD_REFERENCE_WIDTH = 800
+
+# 合法着法校验: 变化格点超过该数量时(动画、换局等)不校验
+MAX_LEGAL_MOVE_DIRTY = 8
+
+# 合法着法校验的统计: 识别结果为一步合法着法的帧数, 不是合法着法的帧数
+legal_move_stats = {'legal': 0, 'rejected': 0}
 
 
 def show_image(name, image):
@@ -12,22 +34,36 @@ def show_image(name, image):
     cv2.waitKey(0)  
     cv2.destroyAllWindows()
 
+def screenshot_to_array(img_origin):
+    """
+    把mss截图包装为numpy数组, 直接引用截图的BGRA缓冲区, 不拷贝
+    Args:
+        img_origin: mss截图对象, 或BGR/BGRA格式的numpy数组(如 tools/board_renderer.py 渲染的图像)
+    Returns:
+        (height, width, 4) 的BGRA数组, mss截图为只读
+    """
+    if isinstance(img_origin, np.ndarray):
+        if img_origin.shape[2] == 3:
+            return cv2.cvtColor(img_origin, cv2.COLOR_BGR2BGRA)
+        return img_origin
+    return np.frombuffer(img_origin.bgra, np.uint8).reshape(img_origin.height, img_origin.width, 4)
+
 def preprocess_image(img_origin):
     # img = cv2.imread(img_path)  
-    img_np = np.frombuffer(img_origin.bgra, np.uint8).reshape(img_origin.height, img_origin.width, 4)
-    img_np = img_np[:, :, :3]  # 去掉 alpha 通道
+    img_np = screenshot_to_array(img_origin)  # 保留 alpha 通道, 避免整幅图拷贝
     if img_np is None:  
-        print("Error: npImage is None.")  
+        logger.error("截图为空")
         return  None, None 
-    new_width = 800  
+    new_width = BOARD_REFERENCE_WIDTH  
     scale_factor = new_width / img_np.shape[1]  # 注意使用宽度来计算缩放因子  
     new_height = int(img_np.shape[0] * scale_factor)  
-    resized_img = cv2.resize(img_np, (new_width, new_height), interpolation=cv2.INTER_LANCZOS4)
+    resized_bgra = cv2.resize(img_np, (new_width, new_height), interpolation=cv2.INTER_LANCZOS4)
+    resized_img = resized_bgra[:, :, :3]  # 去掉 alpha 通道(视图)
     
     # cv2.imwrite('./chess_assistant/app/uploads/图像.png', resized_img)
     # print(f"图片宽高是:{img.shape[1]} x {img.shape[0]}")
     # 灰度化  
-    gray = cv2.cvtColor(resized_img, cv2.COLOR_BGR2GRAY) 
+    gray = cv2.cvtColor(resized_bgra, cv2.COLOR_BGRA2GRAY) 
 
     return resized_img, gray
 
@@ -183,7 +219,7 @@ def recognize_piece_from_circle(img, x_array, y_array, callback=None):
         
         # 识别黑将并获取计算好坐标的棋盘数组
         pieceArray, is_red = recognize_black_king(circles, resized_img, x_array, y_array, callback)
-        print(f"\n当前方为{'红方' if is_red else '黑方'}")
+        logger.debug("当前方为%s", '红方' if is_red else '黑方')
         
         # 识别所有棋子
         for i in range(len(pieceArray)):
@@ -217,54 +253,132 @@ def recognize_piece_from_grid(img, x_array, y_array, callback=None):
         pieceArray: 9x10的二维数组，表示棋盘状态，每个位置存储棋子类型代号或"-"
         is_red: 是否为红方
     """
-    # 预处理
-    resized_img, _ = preprocess_image(img)
-    pieceArray = [["-"] * len(x_array) for _ in range(len(y_array))]
-    is_red = False  # 默认值设为False
+    with tracer.span("preprocess"):
+        # 直接使用截图原始分辨率, 不再整幅缩放, 只缩放90个格点图片
+        img_np = screenshot_to_array(img)
+        
+        # 按切割方案一次取出所有格点图片
+        native_x, native_y = scale_board_coords(x_array, y_array, img_np.shape[1])
+        plan = build_crop_plan(native_x, native_y, img_np.shape[1], img_np.shape[0])
+        crops = extract_crops(img_np[:, :, :3], plan)
+        
+        # 只有像素发生变化的格点才送入模型, 一次批量识别
+        cache_key = (context.platform, tuple(x_array), tuple(y_array))
+        thumbs, dirty = square_cache.lookup(cache_key, crops)
+    
+    with tracer.span("inference", squares=len(dirty)):
+        result = context.piece_recognizer.recognize_batch(crops[dirty])
+    if result is None:
+        return None, False
+    
+    # 用上一局面的合法着法校验本批识别结果(只校验, 不减少识别的格点)
+    if context.legal_move_recognition and len(dirty):
+        legal = check_legal_move(dirty, result['class_names'], result['confidences'])
+        if legal is not None:
+            legal_move_stats['legal' if legal else 'rejected'] += 1
     
-    # 遍历棋盘格点，切割并识别棋子
+    class_names, confidences = square_cache.update(thumbs, dirty, result['class_names'], result['confidences'])
+    
+    return assemble_piece_array(class_names, confidences, len(x_array), len(y_array))
+
+def check_legal_move(dirty, class_names, confidences):
+    """
+    检查变化格点的识别结果是否恰好是上一局面的一步合法着法: 起点变空, 终点为走动的棋子,
+    其余变化格点(走子高亮等)与上一局面相同. 须在 square_cache.update 之前调用
+    Args:
+        dirty: square_cache.lookup 返回的变化格点索引
+        class_names: 变化格点的识别结果, 顺序与dirty一致
+        confidences: 变化格点的置信度, 顺序与dirty一致
+    Returns:
+        是否为一步合法着法; 没有可比较的上一局面、变化格点过多或棋子没有变化时为None
+    """
+    tracker = context.game_tracker
+    if tracker is None or tracker.board is None or len(dirty) > MAX_LEGAL_MOVE_DIRTY:
+        return None
+    # 缓存中的上一帧结果必须就是跟踪的局面
+    previous = tracker.board.text()
+    if len(square_cache.class_names) != len(previous) or \
+            any(name != piece for name, piece in zip(square_cache.class_names, previous)):
+        return None
+    observed = dict(zip(dirty.tolist(), class_names))
+    changed = [square for square, name in observed.items() if name != previous[square]]
+    if not changed:
+        return None
+    
+    legal = False
+    if len(changed) == 2 and min(confidences) > 0.9:
+        from chess.movegen import Position
+        position = Position.from_board(tracker.board, tracker.is_red, tracker.red_to_move)
+        # 着法生成器按FEN方向编号, 黑方在下时屏幕上的格点编号为 89 - 编号
+        last_square = len(previous) - 1
+        for from_square, to_square in (changed, changed[::-1]):
+            if observed[from_square] == '-' and observed[to_square] == previous[from_square]:
+                move = (from_square, to_square) if tracker.is_red else \
+                    (last_square - from_square, last_square - to_square)
+                legal = position.is_legal(move)
+                break
+    if not legal:
+        logger.debug("识别结果不是一步合法着法: %s",
+                     [(square, previous[square], observed[square]) for square in changed])
+    return legal
+
+def recognize_piece_from_board(img, x_array, y_array, callback=None):
+    """
+    用整盘识别模型一次识别所有格点, 返回值与 recognize_piece_from_grid 相同
+    当前平台没有整盘模型时改用格点识别
+    """
+    board_recognizer = context.board_recognizer
+    if board_recognizer is None:
+        return recognize_piece_from_grid(img, x_array, y_array, callback)
+    
+    from chess.board_recognizer import rectify_board
+    with tracer.span("preprocess"):
+        img_np = screenshot_to_array(img)
+        native_x, native_y = scale_board_coords(x_array, y_array, img_np.shape[1])
+        board = rectify_board(img_np[:, :, :3], native_x, native_y)
+    with tracer.span("inference", squares=len(x_array) * len(y_array)):
+        result = board_recognizer.recognize_board(board)
+    if result is None:
+        return None, False
+    return assemble_piece_array(result['class_names'], result['confidences'], len(x_array), len(y_array))
+
+def recognize_pieces(img, x_array, y_array, callback=None):
+    """按配置的识别方式(recognition_mode)识别棋子"""
+    if context.recognition_mode == "board":
+        return recognize_piece_from_board(img, x_array, y_array, callback)
+    return recognize_piece_from_grid(img, x_array, y_array, callback)
+
+def assemble_piece_array(class_names, confidences, cols, rows):
+    """
+    把按行优先顺序排列的格点识别结果组装为棋盘数组, 并根据黑将位置判断红黑方
+    Args:
+        class_names: 每个格点的类别
+        confidences: 每个格点的置信度
+        cols: 列数
+        rows: 行数
+    Returns:
+        pieceArray: 棋盘数组, 有格点置信度不足或被遮挡时为None
+        is_red: 是否为红方
+    """
+    pieceArray = [["-"] * cols for _ in range(rows)]
+    is_red = False  # 默认值设为False
     covered_count = 0  # 添加被遮挡棋子计数
-    for i in range(len(y_array)):
-        for j in range(len(x_array)):
-            center_x = x_array[j]
-            center_y = y_array[i]
-            # 计算当前位置的切割半径
-            if j == 0:
-                x_radius = (x_array[j+1] - x_array[j]) // 2
-            elif j == len(x_array)-1:
-                x_radius = (x_array[j] - x_array[j-1]) // 2
-            else:
-                x_radius = min((x_array[j] - x_array[j-1]) // 2, (x_array[j+1] - x_array[j]) // 2)
-            if i == 0:
-                y_radius = (y_array[i+1] - y_array[i]) // 2
-            elif i == len(y_array)-1:
-                y_radius = (y_array[i] - y_array[i-1]) // 2
-            else:
-                y_radius = min((y_array[i] - y_array[i-1]) // 2, (y_array[i+1] - y_array[i]) // 2)
-            cut_radius = int(min(x_radius, y_radius) * 0.9)
-            vertical_offset = int(cut_radius * 0.06)
-            x1 = max(0, center_x - cut_radius)
-            y1 = max(0, center_y - cut_radius - vertical_offset)
-            x2 = min(resized_img.shape[1]-1, center_x + cut_radius)
-            y2 = min(resized_img.shape[0]-1, center_y + cut_radius - vertical_offset)
-            piece_img = resized_img[y1:y2, x1:x2]
-            
-            # 识别棋子类型
-            piece_type, confidence = recognize_piece_type(piece_img)
-            if piece_type and confidence > 0.9:
-                # 统计covered数量
-                if piece_type == 'covered':
-                    covered_count += 1
-                # 在上下两个九宫格内寻找黑将
-                if piece_type == 'k':  # 黑将
-                    # 判断是否在九宫格内
-                    if (3 <= j <= 5 and 0 <= i <= 2) or (3 <= j <= 5 and 7 <= i <= 9):
-                        # 根据黑将位置判断红黑方
-                        is_red = (i <= 2)  # 如果黑将在上半部分，则为红方
-                        # print(f"位置({j}, {i}) 检测到黑将")
-                pieceArray[i][j] = piece_type
-            else:
-                return None, is_red
+    for index, (piece_type, confidence) in enumerate(zip(class_names, confidences)):
+        i, j = divmod(index, cols)
+        if piece_type and confidence > 0.9:
+            # 统计covered数量
+            if piece_type == 'covered':
+                covered_count += 1
+            # 在上下两个九宫格内寻找黑将
+            if piece_type == 'k':  # 黑将
+                # 判断是否在九宫格内
+                if (3 <= j <= 5 and 0 <= i <= 2) or (3 <= j <= 5 and 7 <= i <= 9):
+                    # 根据黑将位置判断红黑方
+                    is_red = (i <= 2)  # 如果黑将在上半部分，则为红方
+                    # print(f"位置({j}, {i}) 检测到黑将")
+            pieceArray[i][j] = piece_type
+        else:
+            return None, is_red
     
     # 检查covered数量是否超过阈值
     if covered_count > 0:
@@ -272,6 +386,77 @@ def recognize_piece_from_grid(img, x_array, y_array, callback=None):
     
     return pieceArray, is_red
 
+def scale_board_coords(x_array, y_array, img_width):
+    """
+    把 board_coords 中的坐标(以 BOARD_REFERENCE_WIDTH 宽的图像为准)换算到截图的原始分辨率
+    Args:
+        x_array: 棋盘竖线x坐标
+        y_array: 棋盘横线y坐标
+        img_width: 截图原始宽度
+    Returns:
+        (x坐标元组, y坐标元组)
+    """
+    scale = img_width / BOARD_REFERENCE_WIDTH
+    return tuple(round(x * scale) for x in x_array), tuple(round(y * scale) for y in y_array)
+
+@lru_cache(maxsize=8)
+def build_crop_plan(x_array, y_array, img_width, img_height):
+    """
+    计算所有格点的切割范围, 只在棋盘坐标或图像尺寸变化时重新计算
+    Args:
+        x_array: 棋盘竖线x坐标(元组)
+        y_array: 棋盘横线y坐标(元组)
+        img_width: 图像宽度
+        img_height: 图像高度
+    Returns:
+        (行数*列数, 4) 的只读int数组, 每行为 [y1, y2, x1, x2]
+    """
+    x = np.array(x_array)
+    y = np.array(y_array)
+    
+    # 每条线到左右(上下)相邻线的半间距, 两端只有一侧
+    x_gaps = np.diff(x) // 2
+    y_gaps = np.diff(y) // 2
+    x_radius = np.minimum(np.append(x_gaps, x_gaps[-1]), np.insert(x_gaps, 0, x_gaps[0]))
+    y_radius = np.minimum(np.append(y_gaps, y_gaps[-1]), np.insert(y_gaps, 0, y_gaps[0]))
+    
+    # 每个格点的切割半径和竖直偏移
+    cut_radius = (np.minimum(x_radius[None, :], y_radius[:, None]) * 0.9).astype(int)
+    vertical_offset = (cut_radius * 0.06).astype(int)
+    center_x = np.broadcast_to(x[None, :], cut_radius.shape)
+    center_y = np.broadcast_to(y[:, None], cut_radius.shape)
+    
+    plan = np.stack([
+        np.maximum(0, center_y - cut_radius - vertical_offset),
+        np.minimum(img_height - 1, center_y + cut_radius - vertical_offset),
+        np.maximum(0, center_x - cut_radius),
+        np.minimum(img_width - 1, center_x + cut_radius),
+    ], axis=-1).reshape(-1, 4)
+    plan.flags.writeable = False
+    return plan
+
+def extract_crops(img, plan, size=INPUT_SIZE):
+    """
+    按切割方案取出所有格点图片, 缩放到模型输入尺寸后写入预分配的缓冲区
+    Args:
+        img: BGR/BGRA格式的图像
+        plan: build_crop_plan 返回的切割方案
+        size: 输出边长
+    Returns:
+        (格点数, size, size, 通道数) 的uint8数组, 下一帧会被覆盖
+    """
+    global _crop_buffer
+    shape = (len(plan), size, size, img.shape[2])
+    if _crop_buffer is None or _crop_buffer.shape != shape:
+        _crop_buffer = np.empty(shape, dtype=np.uint8)
+    
+    for k, (y1, y2, x1, x2) in enumerate(plan):
+        crop = img[y1:y2, x1:x2]
+        # 与 crops_to_batch 相同的插值规则
+        interpolation = cv2.INTER_AREA if crop.shape[0] > size else cv2.INTER_LINEAR
+        cv2.resize(crop, (size, size), dst=_crop_buffer[k], interpolation=interpolation)
+    return _crop_buffer
+
 # 计算棋子坐标
 def get_piece_position(point, x_array, y_array):
     """
@@ -336,7 +521,7 @@ def recognize_black_king(circles, img, x_array, y_array, callback=None):
             # 使用recognize_piece_type识别棋子类型
             piece_type = recognize_piece_type(piece_img)
             if piece_type is None:
-                print(f"无法识别棋子: {piece_img}")
+                logger.warning("无法识别棋子: 位置(%d, %d)", j, i)
                 continue
             
             if piece_type == 'k':  # 如果是黑将
@@ -356,7 +541,7 @@ def recognize_black_king(circles, img, x_array, y_array, callback=None):
             # 使用recognize_piece_type识别棋子类型
             piece_type = recognize_piece_type(piece_img)
             if piece_type is None:
-                print(f"无法识别棋子: {piece_img}")
+                logger.warning("无法识别棋子: 位置(%d, %d)", j, i)
                 continue
             
             if piece_type == 'k':  # 如果是黑将
@@ -389,23 +574,16 @@ def recognize_piece_type(piece_img):
     :param piece_img: 棋子图片
     :return: 棋子类型, 置信度或None
     """
-    # 保存临时图片
-    temp_path = "temp_piece.jpg"
-    cv2.imwrite(temp_path, piece_img)
-    
-    # 使用模型识别
-    result = context.piece_recognizer.recognize(temp_path)
+    # 直接在内存中识别, 不再写临时图片
+    result = context.piece_recognizer.recognize_array(piece_img)
     if result is None:
-        print(f"无法识别棋子: {temp_path}")
+        logger.warning("无法识别棋子")
         return None
     
     # 使用识别结果
     piece_type = result['class_name']
     confidence = result['confidence']
-    print(f"识别结果: {piece_type}, 置信度: {confidence:.2%}")
-    
-    # 删除临时文件
-    os.remove(temp_path)
+    logger.debug("识别结果: %s, 置信度: %.2f%%", piece_type, confidence * 100)
     
     return piece_type, confidence
 
@@ -2,10 +2,17 @@ import mss
 import time
 import cv2
 import numpy as np
-from chess import process, engine
+from chess import process, engine, recognizer
 from chess.message import Message, MessageType, MessageContent
 from chess.context import context
+from chess.change_detector import FrameChangeDetector
+from chess.frame_source import MssFrameSource
+from chess.startup import wait_for_warm_up
+from chess.timing import tracer
 from tools.utils import resource_path
+from tools.log import get_logger
+
+logger = get_logger("capture")
 
 manual_trigger = False  # 添加手动触发标志
 
@@ -78,7 +85,7 @@ def check_turn_order(avatar_region):
     global manual_trigger
     if manual_trigger:
         manual_trigger = False  # 使用后立即重置
-        print("手动触发识别")
+        logger.info("手动触发识别")
         return True
     
     # 截取头像区域
@@ -87,87 +94,131 @@ def check_turn_order(avatar_region):
         avatar_img = np.frombuffer(avatar_screenshot.bgra, np.uint8).reshape(avatar_screenshot.height, avatar_screenshot.width, 4)
         avatar_img = avatar_img[:, :, :3]  # 去掉 alpha 通道
         
-        # 保存临时图片用于预测
-        temp_path = "app/images/board/temp_avatar.png"
-        cv2.imwrite(temp_path, avatar_img)
-        
-        # 其他平台使用模型预测
+        # 其他平台使用模型预测(直接使用内存中的图像, 不写临时文件)
         try:
-            result = context.timer_recognizer.predict(temp_path)
-            print(f"预测结果: {result['class_name']}, 置信度: {result['confidence']:.2f}")
+            result = context.timer_recognizer.predict_array(avatar_img)
+            logger.debug("倒计时预测结果: %s, 置信度: %.2f", result['class_name'], result['confidence'])
             return result['class_name'] == 'countdown' and result['confidence'] > 0.9
         except Exception as e:
-            print(f"预测出错: {e}, 使用颜色检测")
+            logger.warning("倒计时预测出错: %s, 使用颜色检测", e)
             return detect_avatar_border(avatar_img, context.platform)
 
 
-def capture_region(result_queue, stop_event): 
-    """截图和分析函数"""
+def capture_region(result_queue, stop_event, frame_source=None): 
+    """
+    截图和分析函数
+    Args:
+        result_queue: 结果消息队列
+        stop_event: 停止事件
+        frame_source: 棋盘画面的帧来源(chess.frame_source), 默认截取屏幕上的棋盘区域
+    """
+    # 等待启动预热结束, 避免和预热线程同时启动引擎
+    wait_for_warm_up()
+    
     # 重新加载配置，确保工作线程读取到最新配置
     context.load_config()
-    print(f"Debug - 工作线程加载配置后的分析模式: {context.analysis_mode}")
+    logger.info("工作线程加载配置后的分析模式: %s", context.analysis_mode)
+    
+    # 按配置打开阶段计时
+    tracer.configure(**context.timing)
+    tracer.reset()
     
     # 启动象棋引擎
     engine.init_engine()    
+    
+    # 新的识别会话, 清空格点识别缓存
+    recognizer.square_cache.reset()
 
     # 从上下文获取区域配置
     platform = context.get_platform(context.platform)
     board_region = platform.regions["board"]
     avatar_region = platform.regions["avatar"]
 
+    # mss实例在本线程中创建一次, 每帧复用
+    if frame_source is None:
+        frame_source = MssFrameSource(board_region)
+
     got_move = False
+    
+    # 整帧变化检测, 连续模式下画面静止时不识别
+    frame_gate = FrameChangeDetector()
 
-    while not stop_event.is_set():
-        if context.analysis_mode == "continuous":  # 使用字符串值进行比较
-            print("Debug - 连续模式")
-            # 连续模式：直接截图识别
-            with mss.mss() as sct:
-                screenshot = sct.grab(board_region)
-                result_queue.put(Message(MessageType.STATUS, MessageContent.RECOGNIZING))
-                
-                def callback(msg):
-                    result_queue.put(msg)
+    def callback(msg):
+        with tracer.span("dispatch", type=msg.type.name):
+            result_queue.put(msg)
+
+    try:
+        while not stop_event.is_set():
+            if context.analysis_mode == "continuous":  # 使用字符串值进行比较
+                # 连续模式：画面有变化才识别
+                with tracer.span("capture"):
+                    screenshot = frame_source.grab()
+                if screenshot is None:
+                    if not frame_source.live:
+                        logger.info("帧来源已结束")
+                        break
+                    time.sleep(0.1)
+                    continue
+                with tracer.span("frame_gate"):
+                    changed = frame_gate.has_changed(recognizer.screenshot_to_array(screenshot))
+                if not changed:
+                    tracer.maybe_flush()
+                    time.sleep(0.1)  # 画面静止, 只做廉价的截图对比
+                    continue
+                logger.debug("连续模式: 画面变化, 开始识别")
+                callback(Message(MessageType.STATUS, MessageContent.RECOGNIZING))
                 
-                move_text_msg, move_code_msg = process.main_process(screenshot, callback)
+                with tracer.span("process"):
+                    move_text_msg, move_code_msg = process.main_process(screenshot, callback)
+                # 识别失败时下一帧必须重新识别
+                if move_text_msg is None:
+                    frame_gate.invalidate()
                 # 如果识别成功，发送着法消息
                 if move_code_msg.content:
-                    result_queue.put(move_code_msg)
-                    result_queue.put(move_text_msg)
-                
-        elif context.analysis_mode == "timer":
-            print("Debug - 倒计时模式")
-            # 倒计时模式：根据计时器轮流截图识别
-            if check_turn_order(avatar_region): # 我方进入计时状态
-                # 还没有获得着法
-                if not got_move:
-                    # 等待动画结束
-                    time.sleep(context.animation_delay)  # 倒计时出现时,吃子,将军等动画还未完全结束,所以等片刻
-                    with mss.mss() as sct:  
+                    callback(move_code_msg)
+                    callback(move_text_msg)
+                    
+            elif context.analysis_mode == "timer":
+                logger.debug("倒计时模式")
+                # 倒计时模式：根据计时器轮流截图识别
+                if check_turn_order(avatar_region): # 我方进入计时状态
+                    # 还没有获得着法
+                    if not got_move:
+                        # 等待动画结束
+                        time.sleep(context.animation_delay)  # 倒计时出现时,吃子,将军等动画还未完全结束,所以等片刻
                         # 截屏
-                        screenshot = sct.grab(board_region) 
-                        result_queue.put(Message(MessageType.STATUS, MessageContent.MY_TURN))
+                        with tracer.span("capture"):
+                            screenshot = frame_source.grab()
+                        if screenshot is None:
+                            if not frame_source.live:
+                                break
+                            continue
+                        callback(Message(MessageType.STATUS, MessageContent.MY_TURN))
                         
-                        # 定义显示回调函数
-                        def callback(msg):
-                            result_queue.put(msg)
-                            
-                        move_text_msg, move_code_msg = process.main_process(screenshot, callback)
+                        with tracer.span("process"):
+                            move_text_msg, move_code_msg = process.main_process(screenshot, callback)
                         if move_code_msg.content:  # 如果有着法代码
-                            result_queue.put(move_code_msg)  # 先发送着法代码用于显示箭头
-                            result_queue.put(move_text_msg)  # 再发送中文着法用于显示文本
-                            print(f"Debug - Move : {move_code_msg}, Text : {move_text_msg}") 
+                            callback(move_code_msg)  # 先发送着法代码用于显示箭头
+                            callback(move_text_msg)  # 再发送中文着法用于显示文本
+                            logger.debug("着法: %s, 中文: %s", move_code_msg.content, move_text_msg.content)
                         else:  # 如果发生错误
-                            result_queue.put(move_text_msg)  # 发送错误消息
-                            result_queue.put(move_code_msg)  # 发送空的棋盘显示消息
+                            # 发送错误消息和空的棋盘显示消息(识别失败时没有错误消息)
+                            for msg in (move_text_msg, move_code_msg):
+                                if msg is not None:
+                                    callback(msg)
 
-                    got_move = True
+                        got_move = True
+                else:
+                    got_move = False
             else:
-                got_move = False
-        else:
-            print(f"Debug - 未知的分析模式: {context.analysis_mode}")
-            time.sleep(0.5)  
-        # 控制识别频率
-        time.sleep(0.2 if context.analysis_mode == "continuous" else 0.3)
+                logger.warning("未知的分析模式: %s", context.analysis_mode)
+                time.sleep(0.5)  
+            tracer.maybe_flush()
+            # 控制识别频率
+            time.sleep(0.2 if context.analysis_mode == "continuous" else 0.3)
+    finally:
+        frame_source.close()
+        tracer.close()
 
 def get_position(x, y):  
     # 确定截图区域  
@@ -0,0 +1,96 @@
+import cv2
+import numpy as np
+
+class SquareCache:
+    """
+    格点识别缓存
+    每个格点保存一张缩小的灰度指纹, 与上一帧的指纹比较,
+    像素没有变化的格点直接复用上一帧的识别结果, 只有变化的格点才送入模型
+    """
+    def __init__(self, thumb_size=16, threshold=8.0):
+        """
+        :param thumb_size: 指纹边长(像素)
+        :param threshold: 指纹最大灰度差超过该值即认为格点发生了变化
+        """
+        self.thumb_size = thumb_size
+        self.threshold = threshold
+        self.hits = 0    # 复用上一帧结果的格点数
+        self.misses = 0  # 需要重新识别的格点数
+        self.reset()
+
+    def reset(self):
+        """清空缓存(不清空计数)"""
+        self.key = None          # 缓存对应的平台和格点坐标
+        self.thumbs = None       # 每个格点的指纹 (N, size, size)
+        self.class_names = []    # 每个格点上一次的识别结果
+        self.confidences = None  # 每个格点上一次的置信度
+
+    def fingerprint(self, crops):
+        """
+        计算所有格点的指纹
+        :param crops: BGR/BGRA格式的格点图片列表, 或尺寸一致的 (N, H, W, C) 数组
+        :return: (N, size, size) 的float32数组
+        """
+        size = self.thumb_size
+        if isinstance(crops, np.ndarray) and crops.shape[1] % size == 0 and crops.shape[2] % size == 0:
+            # 尺寸一致时整批转灰度, 再按块求均值缩小
+            count, height, width = crops.shape[:3]
+            gray = crops[..., :3] @ np.array([0.114, 0.587, 0.299], dtype=np.float32)
+            return gray.reshape(count, size, height // size, size, width // size).mean(axis=(2, 4))
+        thumbs = np.empty((len(crops), size, size), dtype=np.float32)
+        for k, crop in enumerate(crops):
+            gray = cv2.cvtColor(crop, cv2.COLOR_BGRA2GRAY if crop.shape[2] == 4 else cv2.COLOR_BGR2GRAY)
+            thumbs[k] = cv2.resize(gray, (size, size), interpolation=cv2.INTER_AREA)
+        return thumbs
+
+    def lookup(self, key, crops):
+        """
+        找出需要重新识别的格点
+        :param key: 缓存键, 平台或格点坐标变化时缓存失效
+        :param crops: 当前帧的格点图片列表
+        :return: (指纹数组, 需要重新识别的格点索引数组)
+        """
+        thumbs = self.fingerprint(crops)
+        if self.key != key or self.thumbs is None or len(self.thumbs) != len(thumbs):
+            self.reset()
+            self.key = key
+            dirty = np.arange(len(thumbs))
+        else:
+            diff = np.abs(thumbs - self.thumbs).reshape(len(thumbs), -1).max(axis=1)
+            dirty = np.flatnonzero(diff > self.threshold)
+
+        self.misses += len(dirty)
+        self.hits += len(thumbs) - len(dirty)
+        return thumbs, dirty
+
+    def update(self, thumbs, dirty, class_names, confidences):
+        """
+        用新识别的结果更新缓存, 返回所有格点合并后的结果
+        :param thumbs: lookup返回的指纹数组
+        :param dirty: lookup返回的格点索引数组
+        :param class_names: 变化格点的识别结果, 顺序与dirty一致
+        :param confidences: 变化格点的置信度, 顺序与dirty一致
+        :return: (所有格点的识别结果列表, 所有格点的置信度数组)
+        """
+        if self.confidences is None or len(self.class_names) != len(thumbs):
+            self.class_names = [None] * len(thumbs)
+            self.confidences = np.zeros(len(thumbs), dtype=np.float32)
+
+        for index, class_name, confidence in zip(dirty, class_names, confidences):
+            self.class_names[index] = class_name
+            self.confidences[index] = confidence
+        # 只更新重新识别过的格点的指纹, 命中的格点始终与识别时的指纹比较, 缓慢变化累积超过阈值后仍会重新识别
+        if self.thumbs is None or len(self.thumbs) != len(thumbs):
+            self.thumbs = thumbs.copy()
+        else:
+            self.thumbs[dirty] = thumbs[dirty]
+        return list(self.class_names), self.confidences.copy()
+
+    def stats(self):
+        """返回命中统计"""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0
+        }
@@ -0,0 +1,100 @@
+import threading
+import time
+from contextlib import contextmanager
+from chess.message import Message, MessageType, MessageContent
+from tools.log import get_logger
+
+logger = get_logger("recognition")
+engine_log = get_logger("engine")
+
+class StartupProfiler:
+    """启动耗时统计: 记录每个阶段(导入、构建窗口、加载模型、启动引擎)的开始时间和耗时"""
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.phases = []  # (阶段名, 开始时间, 耗时, 线程名), 时间单位为秒
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name):
+        """统计一个阶段, 可以在任意线程中使用"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            with self._lock:
+                self.phases.append((name, start - self.origin, end - start, threading.current_thread().name))
+
+    def report(self):
+        """返回按开始时间排序的耗时表"""
+        with self._lock:
+            phases = sorted(self.phases, key=lambda phase: phase[1])
+        lines = [f"{'阶段':<20}{'开始(ms)':>10}{'耗时(ms)':>10}  线程"]
+        for name, start, duration, thread in phases:
+            lines.append(f"{name:<20}{start * 1000:>10.0f}{duration * 1000:>10.0f}  {thread}")
+        return "\n".join(lines)
+
+# 全局启动耗时统计, 在 main.py 中最先导入
+startup_profiler = StartupProfiler()
+
+_warm_up_thread = None
+
+def warm_up(result_queue=None):
+    """
+    后台预热: 导入识别相关模块、加载当前平台的模型、启动引擎,
+    然后在后台继续预加载其他平台的模型
+    Args:
+        result_queue: 进度消息队列, 消息类型为 MessageType.STATUS
+    """
+    def notify(message_type, content):
+        if result_queue is not None:
+            result_queue.put(Message(message_type, content))
+
+    notify(MessageType.STATUS, MessageContent.WARMING_UP)
+    with startup_profiler.phase("导入识别模块"):
+        from chess import screenshot, engine
+        from chess.context import context
+        from chess.model_registry import model_registry
+
+    platforms = context.get_platforms()
+    current = platforms[0]
+    try:
+        with startup_profiler.phase(f"加载{current.name}棋子模型"):
+            _ = current.piece_recognizer
+        with startup_profiler.phase(f"加载{current.name}倒计时模型"):
+            _ = current.timer_recognizer
+        if context.recognition_mode == "board":
+            with startup_profiler.phase(f"加载{current.name}整盘模型"):
+                _ = current.board_recognizer
+    except Exception as e:
+        logger.error("预热模型出错: %s", e)
+        notify(MessageType.ERROR, MessageContent.RECOGNITION_FAILED)
+
+    notify(MessageType.STATUS, MessageContent.STARTING_ENGINE)
+    try:
+        with startup_profiler.phase("启动引擎"):
+            engine.init_engine()
+    except Exception as e:
+        engine_log.error("预热引擎出错: %s", e)
+        notify(MessageType.ERROR, MessageContent.ENGINE_ERROR)
+
+    # 其他平台的模型不阻塞启动
+    model_registry.preload(platforms[1:])
+    notify(MessageType.STATUS, MessageContent.WARM_UP_COMPLETE)
+    logger.info("启动耗时:\n%s", startup_profiler.report())
+
+def start_warm_up(result_queue=None):
+    """在后台线程中预热, 返回预热线程"""
+    global _warm_up_thread
+    _warm_up_thread = threading.Thread(target=warm_up, args=(result_queue,), name="warm-up", daemon=True)
+    _warm_up_thread.start()
+    return _warm_up_thread
+
+def wait_for_warm_up():
+    """等待预热结束(没有预热或已结束时立即返回)"""
+    if _warm_up_thread is not None and _warm_up_thread is not threading.current_thread():
+        _warm_up_thread.join()
+
+def is_warming_up():
+    """预热是否还在进行"""
+    return _warm_up_thread is not None and _warm_up_thread.is_alive()
@@ -0,0 +1,180 @@
+import os
+import cv2
+import numpy as np
+from tools.utils import resource_path
+from tools.log import get_logger
+
+logger = get_logger("recognition")
+
+# 棋子类别与 images/media 中贴图的对应关系
+PIECE_SPRITES = {
+    'K': 'red_K.png', 'k': 'black_k.png',  # 将/帅
+    'A': 'red_A.png', 'a': 'black_a.png',  # 士/仕
+    'B': 'red_B.png', 'b': 'black_b.png',  # 象/相
+    'N': 'red_N.png', 'n': 'black_n.png',  # 马
+    'R': 'red_R.png', 'r': 'black_r.png',  # 车
+    'C': 'red_C.png', 'c': 'black_c.png',  # 炮
+    'P': 'red_P.png', 'p': 'black_p.png'   # 兵/卒
+}
+
+def normalize_rows(vectors):
+    """每行减去均值再除以模长, 两行的点积即为归一化互相关系数"""
+    vectors = vectors - vectors.mean(axis=-1, keepdims=True)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=-1, keepdims=True), 1e-6)
+
+class TemplateMatcher:
+    """
+    用棋子贴图做归一化互相关(NCC)匹配
+    只取贴图中心的内接正方形(棋子上的字), 避免透明边角和棋盘背景的干扰;
+    格点图片缩小后在中心附近取几个平移窗口, 所有窗口与所有模板的相关系数由一次矩阵乘法得到
+    """
+    def __init__(self, crop_size=40, piece_scale=0.95, inner_ratio=0.65, max_shift=2):
+        """
+        :param crop_size: 匹配前格点图片统一缩放到的边长(格点图片为80像素时是整数倍缩小, 最快)
+        :param piece_scale: 棋子直径占格点图片边长的比例
+        :param inner_ratio: 模板取棋子直径的比例(中心正方形)
+        :param max_shift: 窗口相对中心的最大平移(像素), 容忍格点坐标的少许偏差
+        """
+        self.crop_size = crop_size
+        self.template_side = int(crop_size * piece_scale * inner_ratio)
+        origin = (crop_size - self.template_side) // 2
+        shifts = sorted({-max_shift, 0, max_shift})
+        self.offsets = [(origin + dy, origin + dx) for dy in shifts for dx in shifts]
+
+        self.class_names = []
+        templates = []
+        for class_name, filename in PIECE_SPRITES.items():
+            sprite = cv2.imread(resource_path(os.path.join("images/media", filename)), cv2.IMREAD_COLOR)
+            if sprite is None:
+                logger.warning("找不到棋子贴图: %s", filename)
+                continue
+            height, width = sprite.shape[:2]
+            inner = int(min(height, width) * inner_ratio)
+            top, left = (height - inner) // 2, (width - inner) // 2
+            template = cv2.resize(sprite[top:top + inner, left:left + inner],
+                                  (self.template_side, self.template_side), interpolation=cv2.INTER_AREA)
+            templates.append(template.reshape(-1))
+            self.class_names.append(class_name)
+        # (模板数, 特征维数), 已归一化
+        self.templates = normalize_rows(np.array(templates, dtype=np.float32))
+
+    def match_batch(self, crops):
+        """
+        计算每个格点图片与每个模板的最佳匹配分数(各平移窗口中的最大值)
+        :param crops: BGR/BGRA格式的格点图片列表, 或尺寸一致的 (N, H, W, C) 数组
+        :return: (N, 模板数) 的分数数组(-1到1), 列顺序与 class_names 一致
+        """
+        size, side, count = self.crop_size, self.template_side, len(crops)
+        if isinstance(crops, np.ndarray):
+            # 尺寸一致时把所有格点竖着拼成一张图, 一次缩放(只取中心窗口, 拼接处的混合不影响结果)
+            height, width = crops.shape[1:3]
+            stacked = np.ascontiguousarray(crops[..., :3]).reshape(count * height, width, 3)
+            resized = cv2.resize(stacked, (size, count * size), interpolation=cv2.INTER_AREA)
+        else:
+            resized = np.empty((count * size, size, 3), dtype=np.uint8)
+            for k, crop in enumerate(crops):
+                resized[k * size:(k + 1) * size] = cv2.resize(crop[:, :, :3], (size, size), interpolation=cv2.INTER_AREA)
+        resized = resized.reshape(count, size, size, 3).astype(np.float32)
+
+        # 模板已减去均值, 窗口与模板的点积不受窗口均值影响, 只需除以窗口去均值后的模长
+        dimension = self.templates.shape[1]
+        scores = np.full((count, len(self.class_names)), -1.0, dtype=np.float32)
+        for top, left in self.offsets:
+            windows = resized[:, top:top + side, left:left + side].reshape(count, -1)
+            total = windows.sum(axis=1)
+            norms = np.sqrt(np.maximum(np.einsum('ij,ij->i', windows, windows) - total * total / dimension, 1e-6))
+            np.maximum(scores, (windows @ self.templates.T) / norms[:, None], out=scores)
+        return scores
+
+    def match(self, crop):
+        """
+        计算单个格点图片与每个模板的最佳匹配分数
+        :param crop: BGR/BGRA格式的格点图片
+        :return: 与 class_names 顺序一致的分数数组(-1到1)
+        """
+        return self.match_batch([crop])[0]
+
+class TieredPieceRecognizer:
+    """
+    分级棋子识别器, 接口与 ChessPieceRecognizer 相同
+    第一级用模板匹配, 分数高且领先第二名足够多时直接采用;
+    其余不确定的格点(包括空位和遮挡)交给第二级的CNN识别
+    """
+    def __init__(self, recognizer, min_score=0.8, min_margin=0.2):
+        """
+        :param recognizer: 第二级使用的 ChessPieceRecognizer
+        :param min_score: 模板匹配最低分数
+        :param min_margin: 最佳分数领先第二名的最小差值
+        """
+        self.recognizer = recognizer
+        self.class_map = recognizer.class_map
+        self.class_index = {name: int(index) for index, name in self.class_map.items()}
+        self.matcher = TemplateMatcher()
+        self.min_score = min_score
+        self.min_margin = min_margin
+        self.template_decided = 0  # 由模板匹配决定的格点数
+        self.cnn_decided = 0       # 由CNN决定的格点数
+
+    def recognize(self, image_path):
+        """识别单个棋子图片文件, 返回值与 ChessPieceRecognizer.recognize 相同"""
+        image = cv2.imread(image_path)
+        if image is None:
+            logger.error("无法读取图片: %s", image_path)
+            return None
+        return self.recognize_array(image)
+
+    def recognize_array(self, image):
+        """识别内存中的单个棋子图片"""
+        result = self.recognize_batch([image])
+        if result is None:
+            return None
+        return {
+            'class_name': result['class_names'][0],
+            'confidence': float(result['confidences'][0]),
+            'class_index': int(result['class_indices'][0])
+        }
+
+    def recognize_batch(self, crops):
+        """
+        批量识别, 返回值与 ChessPieceRecognizer.recognize_batch 相同
+        模板决定的格点已通过分数和差值两道阈值, 置信度记为1
+        """
+        class_names = [None] * len(crops)
+        confidences = np.zeros(len(crops), dtype=np.float32)
+        class_indices = np.zeros(len(crops), dtype=np.int64)
+
+        ambiguous = []
+        if len(crops):
+            scores = self.matcher.match_batch(crops)
+            ranked = np.argsort(scores, axis=1)[:, ::-1]
+            for k, (best, second) in enumerate(ranked[:, :2]):
+                if scores[k, best] >= self.min_score and scores[k, best] - scores[k, second] >= self.min_margin:
+                    class_names[k] = self.matcher.class_names[best]
+                    confidences[k] = 1.0
+                    class_indices[k] = self.class_index.get(class_names[k], -1)
+                else:
+                    ambiguous.append(k)
+
+        self.template_decided += len(crops) - len(ambiguous)
+        self.cnn_decided += len(ambiguous)
+        if not ambiguous:
+            return {'class_names': class_names, 'confidences': confidences, 'class_indices': class_indices}
+
+        result = self.recognizer.recognize_batch([crops[k] for k in ambiguous])
+        if result is None:
+            return None
+        for k, class_name, confidence, class_index in zip(
+                ambiguous, result['class_names'], result['confidences'], result['class_indices']):
+            class_names[k] = class_name
+            confidences[k] = confidence
+            class_indices[k] = class_index
+        return {'class_names': class_names, 'confidences': confidences, 'class_indices': class_indices}
+
+    def stats(self):
+        """返回两级各自决定的格点数"""
+        total = self.template_decided + self.cnn_decided
+        return {
+            'template': self.template_decided,
+            'cnn': self.cnn_decided,
+            'template_rate': self.template_decided / total if total else 0.0
+        }
@@ -1,24 +1,24 @@
-import torch
-import torchvision.transforms as transforms
-from torchvision import models
-from torchvision.models import MobileNet_V2_Weights
-import torch.nn as nn
-from PIL import Image
+import cv2
 import os
 import glob
 from tools.utils import resource_path
+from tools.log import get_logger
+from chess.inference import create_backend, build_mobilenet_v2, softmax, crops_to_batch
+
+logger = get_logger("recognition")
+
+# 模型输入尺寸
+INPUT_SIZE = 96
 
 class CountdownPredictor:
-    def __init__(self, platform="TT"):
+    def __init__(self, platform="TT", backend="torch", precision="fp32"):
         """初始化预测器
         
         Args:
             platform: 平台名称 ('TT' 或 'JJ')
+            backend: 推理后端 ('torch'、'onnxruntime' 或 'opencv')
+            precision: 模型精度 ('fp32' 或 'int8')
         """
-        # 设置设备
-        self.device = torch.device("mps" if torch.backends.mps.is_available() else "cuda" if torch.cuda.is_available() else "cpu")
-        print(f"使用设备: {self.device}")
-        
         # 设置类别名称
         self.class_names = ['countdown', 'normal']  # 根据实际数据集修改
         
@@ -29,34 +29,23 @@ class CountdownPredictor:
             model_path = resource_path("models/jj_countdown_model.pth")
         
         # 加载模型
-        self.model = self._load_model(model_path)
-        self.model = self.model.to(self.device)
-        
-        # 设置图像预处理
-        self.transform = transforms.Compose([
-            self.CropBottomSquare(),
-            transforms.Resize((96, 96)),
-            transforms.ToTensor()
-        ])
+        self.model_path = model_path
+        self.backend = create_backend(backend, model_path, lambda: self._load_model(model_path), precision)
     
-    class CropBottomSquare:
-        def __call__(self, img):
-            width, height = img.size
-            side = min(width, height)
-            top = height - side  # 从顶部裁去
-            return transforms.functional.crop(img, top, 0, side, side)
+    @staticmethod
+    def crop_bottom_square(img):
+        """从图片底部截取正方形区域(numpy数组视图)"""
+        height, width = img.shape[:2]
+        side = min(width, height)
+        top = height - side  # 从顶部裁去
+        return img[top:top + side, :side]
     
     def _load_model(self, model_path):
-        """加载模型"""
+        """加载torch模型(仅torch后端和导出ONNX时使用), 不加载ImageNet预训练权重"""
         if not os.path.exists(model_path):
             raise FileNotFoundError(f"找不到模型文件: {model_path}")
         
-        weights = MobileNet_V2_Weights.DEFAULT
-        model = models.mobilenet_v2(weights=weights)
-        model.classifier[1] = nn.Linear(model.last_channel, len(self.class_names))
-        model.load_state_dict(torch.load(model_path))
-        model.eval()
-        return model
+        return build_mobilenet_v2(model_path, len(self.class_names))
     
     def predict(self, image_path):
         """预测单张图片
@@ -69,20 +58,33 @@ class CountdownPredictor:
                 - class_name: 预测的类别名称 ('countdown' 或 'normal')
                 - confidence: 预测的置信度
                 - class_index: 预测的类别索引 (0: countdown, 1: normal)
+            无法读取图片时返回None
         """
         if not os.path.exists(image_path):
             raise FileNotFoundError(f"找不到图片: {image_path}")
         
-        # 加载并转换图像
-        image = Image.open(image_path).convert('RGB')
-        image_tensor = self.transform(image).unsqueeze(0).to(self.device)
+        image = cv2.imread(image_path)
+        if image is None:
+            logger.error("无法读取图片: %s", image_path)
+            return None
+        return self.predict_array(image)
+    
+    def predict_array(self, image):
+        """预测内存中的单张图片
+        
+        Args:
+            image: BGR或BGRA格式的numpy数组, 可以直接是截图缓冲区上的视图
+            
+        Returns:
+            dict: 与predict相同的结果字典
+        """
+        # 在内存中转换图像
+        batch = crops_to_batch([self.crop_bottom_square(image)], INPUT_SIZE)
         
         # 预测
-        with torch.no_grad():
-            outputs = self.model(image_tensor)
-            probabilities = torch.nn.functional.softmax(outputs, dim=1)
-            predicted_class = outputs.argmax(1).item()
-            confidence = probabilities[0][predicted_class].item()
+        probabilities = softmax(self.backend.run(batch))
+        predicted_class = int(probabilities[0].argmax())
+        confidence = float(probabilities[0][predicted_class])
         
         return {
             'class_name': self.class_names[predicted_class],
@@ -113,6 +115,8 @@ if __name__ == '__main__':
         for img_path in image_files:
             try:
                 result = predictor.predict(img_path)
+                if result is None:
+                    continue
                 print(f"图片: {os.path.basename(img_path)}")
                 print(f"预测状态: {result['class_name']}")
                 print(f"置信度: {result['confidence']:.2%}")
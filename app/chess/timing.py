@@ -0,0 +1,215 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from tools.log import get_logger
+
+logger = get_logger("capture")
+
+class _NullSpan:
+    """关闭计时时 span() 返回的空上下文, 全局只有一个实例, 不分配也不计时"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+class _Span:
+    """一段计时, 退出时交给 Tracer 记录"""
+    __slots__ = ('tracer', 'name', 'args', 'start')
+
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.record(self.name, self.start, time.perf_counter_ns(), self.args)
+        return False
+
+def _percentile(sorted_values, q):
+    """已排序数据的百分位数(线性插值, 与 numpy.percentile 默认方式相同)"""
+    position = (len(sorted_values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+class RollingHistogram:
+    """最近 window 次耗时(毫秒)的分布"""
+    def __init__(self, window=500):
+        self.samples = deque(maxlen=window)
+        self.total_count = 0
+
+    def add(self, value_ms):
+        self.samples.append(value_ms)
+        self.total_count += 1
+
+    def summary(self):
+        """最近窗口内的 p50/p95/p99/max/mean, 以及累计次数"""
+        values = sorted(self.samples)
+        if not values:
+            return {'count': self.total_count}
+        return {
+            'count': self.total_count,
+            'window': len(values),
+            'p50': _percentile(values, 50),
+            'p95': _percentile(values, 95),
+            'p99': _percentile(values, 99),
+            'max': values[-1],
+            'mean': sum(values) / len(values)
+        }
+
+class Tracer:
+    """
+    识别流程的阶段计时
+    用法:
+        with tracer.span("inference"):
+            ...
+    关闭时 span() 只做一次属性判断并返回共享的空上下文;
+    打开时每段耗时进入对应阶段的滚动直方图(供界面或 summary_path 文件读取),
+    同时保留最近 max_events 个事件, 可导出为 Chrome trace-event JSON(chrome://tracing 或 Perfetto 打开)
+    """
+    def __init__(self, enabled=False, window=500, max_events=20000):
+        self.enabled = enabled
+        self.window = window
+        self.summary_path = ""
+        self.trace_path = ""
+        self.flush_interval = 5.0
+        self._histograms = {}
+        self._events = deque(maxlen=max_events)
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._origin_ns = time.perf_counter_ns()
+
+    def configure(self, enabled=False, window=500, max_events=20000, summary_path="", trace_path="",
+                  flush_interval=5.0):
+        """
+        按配置文件中的 timing 项设置计时器
+        Args:
+            enabled: 是否计时
+            window: 每个阶段滚动直方图保留的次数
+            max_events: 导出trace时保留的最近事件数
+            summary_path: 定期写入阶段统计的json文件, 空字符串表示不写
+            trace_path: 识别线程结束时导出的Chrome trace文件, 空字符串表示不导出
+            flush_interval: 写入 summary_path 的间隔(秒)
+        """
+        with self._lock:
+            if window != self.window:
+                self._histograms = {}
+            if max_events != self._events.maxlen:
+                self._events = deque(self._events, maxlen=max_events)
+            self.window = window
+            self.summary_path = summary_path
+            self.trace_path = trace_path
+            self.flush_interval = flush_interval
+        self.enabled = enabled
+
+    def span(self, name, **args):
+        """
+        计时一段代码
+        :param name: 阶段名称
+        :param args: 附加信息, 导出trace时放在事件的args中
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, args)
+
+    def record(self, name, start_ns, end_ns, args=None):
+        """记录一段已经结束的计时(perf_counter_ns)"""
+        if not self.enabled:
+            return
+        duration_ms = (end_ns - start_ns) / 1e6
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(name, RollingHistogram(self.window))
+        histogram.add(duration_ms)
+        self._events.append((name, start_ns, end_ns, threading.get_ident(), args))
+
+    def summary(self):
+        """各阶段的耗时分布(毫秒)"""
+        with self._lock:
+            histograms = list(self._histograms.items())
+        return {name: histogram.summary() for name, histogram in histograms}
+
+    def format_summary(self):
+        """各阶段耗时的文本表格, 供界面显示"""
+        lines = [f"{'阶段':10}{'次数':>6}{'p50':>9}{'p95':>9}{'p99':>9}"]
+        for name, stats in self.summary().items():
+            if 'p50' in stats:
+                lines.append(f"{name:12}{stats['count']:>6}{stats['p50']:>9.1f}{stats['p95']:>9.1f}{stats['p99']:>9.1f}")
+        return "\n".join(lines)
+
+    def reset(self):
+        """清空统计和事件"""
+        with self._lock:
+            self._histograms = {}
+            self._events.clear()
+            self._origin_ns = time.perf_counter_ns()
+
+    def maybe_flush(self):
+        """距上次写入超过 flush_interval 时把阶段统计写入 summary_path"""
+        if not self.enabled or not self.summary_path:
+            return
+        now = time.monotonic()
+        if now - self._last_flush >= self.flush_interval:
+            self._last_flush = now
+            self.write_summary(self.summary_path)
+
+    def write_summary(self, path):
+        """把阶段统计写入json文件(先写临时文件再替换, 读取方不会读到半个文件)"""
+        temp_path = path + ".tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump({'time': time.time(), 'stages': self.summary()}, f, indent=4, ensure_ascii=False)
+            os.replace(temp_path, path)
+        except OSError as e:
+            logger.error("写入耗时统计失败: %s", e)
+
+    def trace_events(self):
+        """最近的事件, Chrome trace-event 格式(完整事件 ph='X', 时间单位为微秒)"""
+        pid = os.getpid()
+        events = []
+        for name, start_ns, end_ns, thread_id, args in list(self._events):
+            event = {
+                'name': name,
+                'ph': 'X',
+                'ts': (start_ns - self._origin_ns) / 1000,
+                'dur': (end_ns - start_ns) / 1000,
+                'pid': pid,
+                'tid': thread_id
+            }
+            if args:
+                event['args'] = {key: str(value) for key, value in args.items()}
+            events.append(event)
+        return events
+
+    def export_chrome_trace(self, path):
+        """导出 Chrome trace-event JSON"""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({'traceEvents': self.trace_events(), 'displayTimeUnit': 'ms'}, f)
+        logger.info("已导出trace: %s (%d 个事件)", path, len(self._events))
+
+    def close(self):
+        """识别线程结束时写出统计和trace"""
+        if not self.enabled:
+            return
+        if self.summary_path:
+            self.write_summary(self.summary_path)
+        if self.trace_path:
+            try:
+                self.export_chrome_trace(self.trace_path)
+            except OSError as e:
+                logger.error("导出trace失败: %s", e)
+
+# 全局计时器, 由 capture_region 按配置打开
+tracer = Tracer()
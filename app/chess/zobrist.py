@@ -0,0 +1,89 @@
+import numpy as np
+from chess.board import Board, ROWS, COLS, piece_code
+
+# 每个格点、每种棋子(编码 + 7, 共15种, 空位为0)一个64位随机数, 固定种子保证跨会话一致
+_rng = np.random.default_rng(0x5A0B21)
+_KEY_MAX = np.iinfo(np.uint64).max
+PIECE_KEYS = _rng.integers(0, _KEY_MAX, size=(ROWS * COLS, 15), dtype=np.uint64, endpoint=True)
+PIECE_KEYS[:, 7] = 0
+# 轮到黑方走时异或的随机数
+BLACK_TO_MOVE_KEY = int(_rng.integers(0, _KEY_MAX, dtype=np.uint64, endpoint=True))
+_SQUARES = np.arange(ROWS * COLS)
+# 转为Python整数的表, 增量更新(包括 movegen 中的走子)时不经过numpy标量
+PIECE_KEY_TABLE = PIECE_KEYS.tolist()
+
+def board_hash(board, black_to_move=False):
+    """
+    整盘计算Zobrist哈希(按棋盘在屏幕上的方向, 同一会话中方向不变)
+    :param board: Board 或二维字符数组
+    :param black_to_move: 是否轮到黑方走
+    """
+    cells = Board.from_array(board).cells.ravel()
+    value = int(np.bitwise_xor.reduce(PIECE_KEYS[_SQUARES, cells + 7]))
+    return value ^ BLACK_TO_MOVE_KEY if black_to_move else value
+
+def update_hash(value, changes):
+    """
+    按格点变化增量更新哈希, 与重新整盘计算的结果相同
+    :param value: 变化前的哈希
+    :param changes: 格点变化 [(row, col, 原棋子, 新棋子), ...], 与 PositionChecker 返回的变化列表格式相同
+    """
+    for row, col, old_piece, new_piece in changes:
+        keys = PIECE_KEY_TABLE[row * COLS + col]
+        value ^= keys[piece_code(old_piece) + 7] ^ keys[piece_code(new_piece) + 7]
+    return value
+
+def toggle_side(value):
+    """交换走棋方"""
+    return value ^ BLACK_TO_MOVE_KEY
+
+class PositionHistory:
+    """
+    一次识别会话中出现过的局面: 按出现顺序保存哈希, 并统计每个局面出现的次数
+    用于重复局面判断、以局面为键的缓存和跳过已处理过的局面
+    """
+    def __init__(self):
+        self.hashes = []   # 按顺序出现的局面哈希
+        self.counts = {}   # 哈希 -> 出现次数
+
+    def push(self, value):
+        """
+        记录一个新局面
+        :return: 该局面(含本次)出现的次数
+        """
+        self.hashes.append(value)
+        count = self.counts.get(value, 0) + 1
+        self.counts[value] = count
+        return count
+
+    def pop(self):
+        """撤销最近记录的局面"""
+        value = self.hashes.pop()
+        self.counts[value] -= 1
+        if not self.counts[value]:
+            del self.counts[value]
+        return value
+
+    @property
+    def current(self):
+        """当前局面的哈希, 还没有局面时为None"""
+        return self.hashes[-1] if self.hashes else None
+
+    def count(self, value):
+        """局面出现的次数"""
+        return self.counts.get(value, 0)
+
+    def seen(self, value):
+        """局面是否出现过"""
+        return value in self.counts
+
+    def repetitions(self, min_count=2):
+        """出现次数不少于 min_count 的局面 {哈希: 次数}"""
+        return {value: count for value, count in self.counts.items() if count >= min_count}
+
+    def reset(self):
+        self.hashes.clear()
+        self.counts.clear()
+
+    def __len__(self):
+        return len(self.hashes)
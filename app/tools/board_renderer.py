@@ -0,0 +1,367 @@
+# 合成棋盘渲染: 把任意FEN局面渲染为类似截图的BGRA图像, 不需要打开游戏窗口
+# 可以控制缩放、噪声、JPEG压缩和动画遮挡, 同样的参数和随机种子总是得到同样的图像,
+# 用于基准测试、回归测试和训练数据. 在项目根目录运行:
+#   PYTHONPATH=app python -m tools.board_renderer --platform TT --count 1000 --out data/synth --noise 3 --jpeg 80
+# 输出目录下是图像文件和 labels.jsonl (每行一帧: 文件名、FEN、本方颜色、动画参数、棋子数组)
+import argparse
+import json
+import os
+import time
+from multiprocessing import Pool
+import cv2
+import numpy as np
+from chess.template_matcher import PIECE_SPRITES
+from tools.utils import resource_path, convert_fen_to_array
+
+# 开局局面
+START_FEN = "rnbakabnr/9/1c5c1/p1p1p1p1p/9/9/P1P1P1P1P/1C5C1/9/RNBAKABNR"
+
+# board_coords 的参考宽度(与 chess.recognizer.BOARD_REFERENCE_WIDTH 相同)
+REFERENCE_WIDTH = 800
+
+def _flatten(image, background):
+    """把带透明通道的图片合成到纯色背景上"""
+    alpha = image[:, :, 3:] / 255
+    return (image[:, :, :3] * alpha + np.array(background) * (1 - alpha)).astype(np.uint8)
+
+def prepare_sprite(sprite):
+    """
+    预乘透明度, 每种贴图尺寸只计算一次
+    :param sprite: BGRA贴图
+    :return: (预乘透明度后的BGR, 1 - 透明度), 均为float32
+    """
+    alpha = sprite[:, :, 3:].astype(np.float32) / 255
+    return sprite[:, :, :3] * alpha, 1 - alpha
+
+def paste(image, prepared, left, top):
+    """
+    按透明通道把贴图合成到图像上(超出图像的部分裁掉)
+    :param image: BGR或BGRA图像, 原地修改(只写BGR通道)
+    :param prepared: prepare_sprite 的返回值
+    """
+    premultiplied, inverse_alpha = prepared
+    height, width = premultiplied.shape[:2]
+    x1, y1 = max(left, 0), max(top, 0)
+    x2, y2 = min(left + width, image.shape[1]), min(top + height, image.shape[0])
+    if x1 >= x2 or y1 >= y2:
+        return
+    sprite_rows, sprite_cols = slice(y1 - top, y2 - top), slice(x1 - left, x2 - left)
+    region = image[y1:y2, x1:x2, :3]
+    region[:] = premultiplied[sprite_rows, sprite_cols] + region * inverse_alpha[sprite_rows, sprite_cols]
+
+def uci_to_screen(square, is_red):
+    """
+    UCI坐标(如 'h2')转为屏幕上的 (行, 列)
+    列 a-i 从红方左手开始, 行 0-9 从红方底线开始
+    """
+    col, rank = ord(square[0]) - ord('a'), int(square[1])
+    return (9 - rank, col) if is_red else (rank, 8 - col)
+
+class BoardRenderer:
+    """
+    把棋盘图片 images/media/chessboard.png 和棋子贴图合成为截图
+    默认使用界面(ui/board_display.py)的棋盘几何; 给定 board_coords 时,
+    把棋盘图片拉伸到这些格线上, 渲染结果可以直接交给 process.main_process 识别
+    """
+    def __init__(self, x_array=None, y_array=None, width=None, height=None, background=(222, 235, 245)):
+        """
+        :param x_array: 棋盘竖线x坐标(渲染宽度为 width 时), 默认使用棋盘图片自身的格线
+        :param y_array: 棋盘横线y坐标
+        :param width: 渲染宽度, 默认为棋盘图片宽度
+        :param height: 渲染高度, 默认为棋盘图片高度
+        :param background: 棋盘图片透明区域的背景色(BGR)
+        """
+        board = _flatten(cv2.imread(resource_path("images/media/chessboard.png"), cv2.IMREAD_UNCHANGED), background)
+        board_height, board_width = board.shape[:2]
+        # 界面上的棋盘几何: 列宽 = 宽度 / 8.875, 从中心列向两侧排列; 行高 = 高度 // 10
+        cell_width = board_width / 8.875
+        cell_height = board_height // 10
+        board_x = [board_width / 2 + (col - 4) * cell_width for col in range(9)]
+        board_y = [row * cell_height + cell_height / 2 for row in range(10)]
+
+        if x_array is None:
+            self.board = board
+            self.x_array, self.y_array = board_x, board_y
+        else:
+            # 按两个方向各自缩放平移, 使棋盘图片的格线落在给定坐标上
+            sx = (x_array[-1] - x_array[0]) / (board_x[-1] - board_x[0])
+            sy = (y_array[-1] - y_array[0]) / (board_y[-1] - board_y[0])
+            matrix = np.float32([[sx, 0, x_array[0] - board_x[0] * sx], [0, sy, y_array[0] - board_y[0] * sy]])
+            width = width or REFERENCE_WIDTH
+            height = height or int(round(board_height * sy + matrix[1, 2] * 2))
+            self.board = cv2.warpAffine(board, matrix, (width, height), flags=cv2.INTER_AREA,
+                                        borderMode=cv2.BORDER_REPLICATE)
+            self.x_array, self.y_array = list(x_array), list(y_array)
+        self.cell = min(np.diff(self.x_array).mean(), np.diff(self.y_array).mean())
+
+        def load(filename):
+            return cv2.imread(resource_path(os.path.join("images/media", filename)), cv2.IMREAD_UNCHANGED)
+        self.sprites = {piece: load(filename) for piece, filename in PIECE_SPRITES.items()}
+        self.bullseye = load("bullseye.png")
+        self.border = load("green_border.png")
+        self._backgrounds = {}  # 缩放比例 -> 缩放后的棋盘
+        self._resized = {}      # (贴图名, 边长) -> 缩放并预乘透明度后的贴图
+        self._noise = {}        # (图像尺寸, 标准差) -> 预先生成的噪声场
+
+    @classmethod
+    def for_platform(cls, platform_name):
+        """按平台配置的 board_coords 和棋盘区域宽高比渲染, 渲染宽度为 board_coords 的参考宽度"""
+        from chess.context import context
+        platform = context.get_platform(platform_name)
+        region = platform.regions['board']
+        height = int(round(REFERENCE_WIDTH * region['height'] / region['width']))
+        return cls(platform.board_coords['x'], platform.board_coords['y'], REFERENCE_WIDTH, height)
+
+    def coords(self, scale=1.0):
+        """
+        缩放后的格线坐标
+        :return: (x坐标列表, y坐标列表)
+        """
+        return [x * scale for x in self.x_array], [y * scale for y in self.y_array]
+
+    def _background(self, scale):
+        if scale not in self._backgrounds:
+            if scale == 1.0:
+                background = self.board
+            else:
+                interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR
+                background = cv2.resize(self.board, None, fx=scale, fy=scale, interpolation=interpolation)
+            self._backgrounds[scale] = cv2.cvtColor(background, cv2.COLOR_BGR2BGRA)
+        return self._backgrounds[scale]
+
+    def _noise_field(self, shape, noise, rng, margin=64):
+        """
+        高斯噪声, 每帧从预先生成的大一圈的噪声场中按随机偏移取一块
+        逐帧生成整幅高斯噪声比渲染本身慢得多
+        :param shape: BGRA图像尺寸
+        :param noise: 标准差
+        :return: 与图像同尺寸的int16噪声, 透明通道为0
+        """
+        key = (shape, noise)
+        if key not in self._noise:
+            field_rng = np.random.default_rng(0)
+            field = np.zeros((shape[0] + margin, shape[1] + margin, 4), dtype=np.int16)
+            field[:, :, :3] = np.round(field_rng.standard_normal(field[:, :, :3].shape) * noise)
+            self._noise[key] = field
+        top, left = rng.integers(margin + 1, size=2)
+        return self._noise[key][top:top + shape[0], left:left + shape[1]]
+
+    def _sprite(self, name, image, size):
+        key = (name, size)
+        if key not in self._resized:
+            self._resized[key] = prepare_sprite(cv2.resize(image, (size, size), interpolation=cv2.INTER_AREA))
+        return self._resized[key]
+
+    def _paste_centered(self, image, name, sprite, size, x, y):
+        paste(image, self._sprite(name, sprite, size), int(round(x - size / 2)), int(round(y - size / 2)))
+
+    def render(self, fen, is_red=True, **options):
+        """
+        渲染FEN局面
+        :param fen: FEN字符串(红方在下)
+        :param is_red: 本方是红方(红方在屏幕下方)
+        :param options: 见 render_array
+        :return: BGRA格式的uint8图像
+        """
+        return self.render_array(convert_fen_to_array(fen, is_red), is_red=is_red, **options)
+
+    def render_array(self, board_array, is_red=True, scale=1.0, noise=0.0, jpeg_quality=None,
+                     highlight=None, move=None, progress=1.0, banner=False, jitter=0.0, seed=0):
+        """
+        渲染屏幕方向的棋子数组
+        :param board_array: 10x9的棋子数组, 空位为'-', 无法渲染的类别(如 covered)按空位处理
+        :param is_red: 本方是红方, 用于换算 highlight 和 move 的UCI坐标
+        :param scale: 相对渲染宽度的缩放比例, 模拟不同分辨率的截图
+        :param noise: 高斯噪声的标准差(像素值)
+        :param jpeg_quality: JPEG压缩质量(1-100), None表示不压缩
+        :param highlight: 上一步着法(UCI, 如 'h2e2'), 在起点画落子标记, 在终点画选中框
+        :param move: 正在进行的走子动画(UCI), 起点的棋子画在起点和终点之间
+        :param progress: 走子动画的进度(0-1), 1表示已到达终点
+        :param banner: 是否画出遮挡棋盘中部的半透明横幅(如"将军"动画)
+        :param jitter: 棋子位置随机偏移(占格点边长的比例)
+        :param seed: 随机种子, 决定噪声和偏移
+        :return: BGRA格式的uint8图像
+        """
+        rng = np.random.default_rng(seed)
+        image = self._background(scale).copy()
+        x_array, y_array = self.coords(scale)
+        cell = self.cell * scale
+        size = int(cell * 0.98)
+
+        moving = None
+        if move:
+            start, end = uci_to_screen(move[:2], is_red), uci_to_screen(move[2:4], is_red)
+            moving = board_array[start[0]][start[1]]
+
+        if highlight:
+            row, col = uci_to_screen(highlight[:2], is_red)
+            self._paste_centered(image, "bullseye", self.bullseye, int(cell * 0.5), x_array[col], y_array[row])
+
+        for (row, col), piece in np.ndenumerate(np.array(board_array)):
+            if piece not in self.sprites or (moving and (row, col) == start):
+                continue
+            dx, dy = rng.uniform(-jitter, jitter, 2) * cell if jitter else (0, 0)
+            self._paste_centered(image, piece, self.sprites[piece], size, x_array[col] + dx, y_array[row] + dy)
+
+        if highlight:
+            row, col = uci_to_screen(highlight[2:4], is_red)
+            self._paste_centered(image, "border", self.border, int(cell * 1.1), x_array[col], y_array[row])
+
+        if moving in self.sprites:
+            # 走子中的棋子略微放大, 位置按进度插值
+            x = x_array[start[1]] + (x_array[end[1]] - x_array[start[1]]) * progress
+            y = y_array[start[0]] + (y_array[end[0]] - y_array[start[0]]) * progress
+            lift = int(size * (1 + 0.1 * np.sin(np.pi * progress)))
+            self._paste_centered(image, moving, self.sprites[moving], lift, x, y)
+
+        if banner:
+            top, bottom = int(y_array[3]), int(y_array[6])
+            band = image[top:bottom, :, :3]
+            band[:] = (band * 0.35 + np.array([20, 20, 120]) * 0.65).astype(np.uint8)
+
+        if noise:
+            image = cv2.add(image, self._noise_field(image.shape, noise, rng), dtype=cv2.CV_8U)
+
+        if jpeg_quality:
+            _, encoded = cv2.imencode(".jpg", cv2.cvtColor(image, cv2.COLOR_BGRA2BGR),
+                                      [cv2.IMWRITE_JPEG_QUALITY, int(jpeg_quality)])
+            image = cv2.cvtColor(cv2.imdecode(encoded, cv2.IMREAD_COLOR), cv2.COLOR_BGR2BGRA)
+        return image
+
+def random_fen(rng, min_pieces=6):
+    """
+    随机局面: 从开局局面随机去掉一些棋子, 再把车马炮兵移到随机的空位
+    士象将帅保持在开局位置, 保证九宫和黑将位置合理
+    """
+    board = convert_fen_to_array(START_FEN, True)
+    pieces = [(row, col) for row in range(10) for col in range(9) if board[row][col] not in '-kK']
+    remove = rng.integers(0, len(pieces) - min_pieces + 1)
+    for index in rng.choice(len(pieces), size=remove, replace=False):
+        row, col = pieces[index]
+        board[row][col] = '-'
+    for row, col in pieces:
+        piece = board[row][col]
+        if piece.lower() in 'rncp' and rng.random() < 0.5:
+            empty = [(r, c) for r in range(10) for c in range(9) if board[r][c] == '-']
+            r, c = empty[rng.integers(len(empty))]
+            board[row][col], board[r][c] = '-', piece
+    rows = []
+    for row in board:
+        text, empty = "", 0
+        for cell in row:
+            if cell == '-':
+                empty += 1
+            else:
+                text += (str(empty) if empty else "") + cell
+                empty = 0
+        rows.append(text + (str(empty) if empty else ""))
+    return "/".join(rows)
+
+def random_jobs(count, seed=0, scale=(1.0, 1.0), noise=0.0, jpeg_quality=None, animation_rate=0.0):
+    """
+    生成随机渲染任务, 同样的参数总是得到同样的任务
+    :param scale: 缩放比例范围 (最小, 最大)
+    :param animation_rate: 带走子动画或横幅遮挡的帧的比例
+    :return: 任务列表, 每个任务是 BoardRenderer.render 的参数字典
+    """
+    rng = np.random.default_rng(seed)
+    jobs = []
+    for index in range(count):
+        fen = random_fen(rng)
+        is_red = bool(rng.random() < 0.5)
+        job = {
+            'fen': fen, 'is_red': is_red, 'seed': seed * 1000003 + index,
+            'scale': round(float(rng.uniform(*scale)), 3), 'noise': noise, 'jpeg_quality': jpeg_quality
+        }
+        if rng.random() < animation_rate:
+            board = convert_fen_to_array(fen, True)
+            if rng.random() < 0.2:
+                job['banner'] = True
+            else:
+                # 随机选一个棋子, 朝随机方向走
+                occupied = [(r, c) for r in range(10) for c in range(9) if board[r][c] != '-']
+                r, c = occupied[rng.integers(len(occupied))]
+                r2, c2 = rng.integers(10), rng.integers(9)
+                job['move'] = f"{chr(ord('a') + c)}{9 - r}{chr(ord('a') + c2)}{9 - r2}"
+                job['progress'] = round(float(rng.uniform(0.1, 0.9)), 3)
+        jobs.append(job)
+    return jobs
+
+# 工作进程中的渲染器, 每个进程只初始化一次
+_worker_renderer = None
+
+def _init_worker(renderer_args):
+    global _worker_renderer
+    _worker_renderer = BoardRenderer(**renderer_args)
+
+def _render_job(job):
+    return _worker_renderer.render(**job)
+
+def _write_job(args):
+    job, path = args
+    image = _worker_renderer.render(**job)
+    # PNG用最低压缩级别, 写盘速度比默认级别快数倍
+    cv2.imwrite(path, image[:, :, :3], [cv2.IMWRITE_PNG_COMPRESSION, 1])
+    return path
+
+def renderer_args_for_platform(platform_name):
+    """按平台配置渲染时传给 BoardRenderer 的参数(可在进程间传递)"""
+    renderer = BoardRenderer.for_platform(platform_name)
+    height, width = renderer.board.shape[:2]
+    return {'x_array': renderer.x_array, 'y_array': renderer.y_array, 'width': width, 'height': height}
+
+def render_many(jobs, renderer_args=None, processes=None, chunksize=8):
+    """
+    在多个进程中并行渲染
+    :param jobs: BoardRenderer.render 的参数字典列表
+    :param renderer_args: BoardRenderer 的构造参数, 默认使用界面的棋盘几何
+    :param processes: 进程数, 默认为CPU核数; 1表示在当前进程中渲染
+    :return: 与 jobs 顺序一致的BGRA图像生成器, 迭代结束(或生成器关闭)时进程池随之关闭
+    """
+    if processes == 1:
+        _init_worker(renderer_args or {})
+        yield from map(_render_job, jobs)
+        return
+    with Pool(processes, initializer=_init_worker, initargs=(renderer_args or {},)) as pool:
+        yield from pool.imap(_render_job, jobs, chunksize=chunksize)
+
+def write_dataset(out_dir, jobs, renderer_args=None, processes=None, image_format="png"):
+    """
+    并行渲染并写入目录, 同时写出 labels.jsonl
+    :return: 写入的帧数
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    paths = [os.path.join(out_dir, f"{index:06d}.{image_format}") for index in range(len(jobs))]
+    with Pool(processes, initializer=_init_worker, initargs=(renderer_args or {},)) as pool:
+        for _ in pool.imap_unordered(_write_job, zip(jobs, paths), chunksize=8):
+            pass
+    with open(os.path.join(out_dir, "labels.jsonl"), "w", encoding="utf-8") as f:
+        for job, path in zip(jobs, paths):
+            label = dict(job, file=os.path.basename(path),
+                         board=["".join(row) for row in convert_fen_to_array(job['fen'], job['is_red'])])
+            f.write(json.dumps(label, ensure_ascii=False) + "\n")
+    return len(jobs)
+
+def main():
+    parser = argparse.ArgumentParser(description="渲染合成棋盘截图")
+    parser.add_argument("--platform", choices=["TT", "JJ"], help="按平台的 board_coords 渲染, 默认使用界面的棋盘几何")
+    parser.add_argument("--count", type=int, default=1000)
+    parser.add_argument("--out", required=True, help="输出目录")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--scale", type=float, nargs=2, default=[1.0, 1.0], help="缩放比例范围")
+    parser.add_argument("--noise", type=float, default=0.0, help="高斯噪声标准差")
+    parser.add_argument("--jpeg", type=int, help="JPEG压缩质量")
+    parser.add_argument("--animation-rate", type=float, default=0.0, help="带动画遮挡的帧的比例")
+    parser.add_argument("--processes", type=int, help="进程数, 默认为CPU核数")
+    parser.add_argument("--format", default="png", choices=["png", "bmp"])
+    args = parser.parse_args()
+
+    renderer_args = renderer_args_for_platform(args.platform) if args.platform else {}
+    jobs = random_jobs(args.count, args.seed, tuple(args.scale), args.noise, args.jpeg, args.animation_rate)
+    start = time.perf_counter()
+    count = write_dataset(args.out, jobs, renderer_args, args.processes, args.format)
+    elapsed = time.perf_counter() - start
+    print(f"已渲染 {count} 帧到 {args.out}, 用时 {elapsed:.1f}s ({count / elapsed:.0f} 帧/秒)")
+
+if __name__ == "__main__":
+    main()
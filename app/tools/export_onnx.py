@@ -0,0 +1,89 @@
+# 把 .pth 模型导出为 ONNX, 供 onnxruntime / opencv 推理后端使用
+# 需要安装 requirements-train.txt 中的依赖, 在项目根目录运行:
+#   PYTHONPATH=app python -m tools.export_onnx --platforms TT JJ
+# 加上 --safetensors 同时导出可内存映射的 .safetensors 权重, torch 后端会优先读取
+import argparse
+import os
+import numpy as np
+from chess.inference import onnx_model_path, softmax, OpenCVBackend
+from chess.board_recognizer import BoardRecognizer, BOARD_ROWS, BOARD_COLS, CELL_SIZE
+from chess.piece_recognizer import ChessPieceRecognizer, INPUT_SIZE as PIECE_INPUT_SIZE
+from chess.timer_recognizer import CountdownPredictor, INPUT_SIZE as TIMER_INPUT_SIZE
+from tools.log import setup_logging
+
+def export_model(model, onnx_path, input_size):
+    """
+    导出单个torch模型, 批次维度是动态的
+    Args:
+        model: torch模型
+        onnx_path: 输出路径
+        input_size: 模型输入边长, 或 (高, 宽)
+    """
+    import torch
+
+    model = model.cpu().eval()
+    dummy = torch.zeros(1, 3, *input_shape(input_size))
+    torch.onnx.export(
+        model, dummy, onnx_path,
+        input_names=['input'], output_names=['logits'],
+        dynamic_axes={'input': {0: 'batch'}, 'logits': {0: 'batch'}},
+        opset_version=13
+    )
+    print(f"已导出: {onnx_path}")
+
+def input_shape(input_size):
+    """模型输入的 (高, 宽)"""
+    return tuple(input_size) if isinstance(input_size, (tuple, list)) else (input_size, input_size)
+
+def export_safetensors(model, model_path):
+    """导出 .safetensors 权重"""
+    from safetensors.torch import save_file
+
+    safetensors_path = os.path.splitext(model_path)[0] + ".safetensors"
+    state_dict = {name: tensor.detach().cpu().contiguous() for name, tensor in model.state_dict().items()}
+    save_file(state_dict, safetensors_path)
+    print(f"已导出: {safetensors_path}")
+
+def verify_model(model, onnx_path, input_size, batch_size=8):
+    """
+    用随机输入比较torch和opencv后端的输出
+    Returns:
+        float: 两者概率的最大差值
+    """
+    import torch
+
+    batch = np.random.rand(batch_size, 3, *input_shape(input_size)).astype(np.float32)
+    with torch.no_grad():
+        expected = softmax(model.cpu().eval()(torch.from_numpy(batch)).numpy())
+    actual = softmax(OpenCVBackend(onnx_path).run(batch))
+    return float(np.abs(expected - actual).max())
+
+def main():
+    parser = argparse.ArgumentParser(description="导出棋子和倒计时模型为ONNX")
+    parser.add_argument("--platforms", nargs="+", default=["TT", "JJ"])
+    parser.add_argument("--no-verify", action="store_true", help="不做导出后的一致性检查")
+    parser.add_argument("--safetensors", action="store_true", help="同时导出 .safetensors 权重")
+    args = parser.parse_args()
+    setup_logging()
+
+    for platform in args.platforms:
+        piece = ChessPieceRecognizer(platform=platform, backend="torch")
+        timer = CountdownPredictor(platform=platform, backend="torch")
+        exports = [
+            (piece.backend.model, piece.model_path, PIECE_INPUT_SIZE),
+            (timer.backend.model, timer.model_path, TIMER_INPUT_SIZE),
+        ]
+        # 训练过整盘模型(tools/train_board_model.py)时一并导出
+        if os.path.exists(BoardRecognizer.model_path_for(platform)):
+            board = BoardRecognizer(platform=platform, backend="torch")
+            exports.append((board.backend.model, board.model_path, (BOARD_ROWS * CELL_SIZE, BOARD_COLS * CELL_SIZE)))
+        for model, model_path, input_size in exports:
+            onnx_path = onnx_model_path(model_path)
+            export_model(model, onnx_path, input_size)
+            if args.safetensors:
+                export_safetensors(model, model_path)
+            if not args.no_verify:
+                print(f"  与torch输出的最大概率差: {verify_model(model, onnx_path, input_size):.6f}")
+
+if __name__ == "__main__":
+    main()
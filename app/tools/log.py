@@ -0,0 +1,117 @@
+import atexit
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+
+# 所有日志记录器的根名称, 各模块按类别取子记录器
+ROOT_LOGGER = "chess"
+
+# 日志类别: 识别流程、引擎、局面检查、截图循环、配置
+CATEGORIES = ("recognition", "engine", "checker", "capture", "config")
+
+# 后台写日志的监听器, setup_logging 之后才有
+_listener = None
+
+def get_logger(category):
+    """
+    获取某个类别的日志记录器
+    热路径上的 logger.debug("...%s", arg) 在该级别关闭时只做一次级别判断, 不格式化消息;
+    需要额外计算的内容(如整盘数组)先用 logger.isEnabledFor(logging.DEBUG) 判断
+    :param category: CATEGORIES 中的类别
+    """
+    return logging.getLogger(f"{ROOT_LOGGER}.{category}")
+
+class RateLimitFilter(logging.Filter):
+    """
+    DEBUG 日志限速: 每个(记录器, 消息模板)一个令牌桶, 超出速率的日志直接丢弃,
+    丢弃的条数附在下一条放行的同类日志上. INFO 及以上不限速
+    """
+    def __init__(self, rate=5.0, burst=10):
+        """
+        :param rate: 每秒放行的条数, 0表示不限速
+        :param burst: 允许的突发条数
+        """
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self._buckets = {}  # (记录器, 消息模板) -> [令牌数, 上次时间, 丢弃条数]
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG or self.rate <= 0:
+            return True
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [self.burst, now, 0]
+            tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if tokens < 1:
+                bucket[0] = tokens
+                bucket[2] += 1
+                return False
+            bucket[0] = tokens - 1
+            suppressed, bucket[2] = bucket[2], 0
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+class _Formatter(logging.Formatter):
+    """在消息后注明限速丢弃的条数"""
+    def format(self, record):
+        text = super().format(record)
+        suppressed = getattr(record, 'suppressed', 0)
+        if suppressed:
+            text += f" (已省略 {suppressed} 条)"
+        return text
+
+def setup_logging(level="INFO", categories=None, file="", debug_rate=5.0, debug_burst=10):
+    """
+    按配置文件中的 logging 项初始化日志: 调用线程只把日志放入队列, 由后台线程写到控制台和文件
+    Args:
+        level: 默认级别
+        categories: 各类别的级别, 如 {"recognition": "DEBUG"}
+        file: 日志文件路径, 空字符串表示只输出到控制台
+        debug_rate: 每类DEBUG日志每秒最多输出的条数, 0表示不限速
+        debug_burst: DEBUG日志允许的突发条数
+    """
+    global _listener
+    shutdown_logging()
+
+    formatter = _Formatter("%(asctime)s %(levelname)s [%(name)s] %(message)s", "%H:%M:%S")
+    handlers = [logging.StreamHandler(sys.stdout)]
+    if file:
+        handlers.append(logging.handlers.RotatingFileHandler(
+            file, maxBytes=5 * 1024 * 1024, backupCount=3, encoding="utf-8"))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(RateLimitFilter(debug_rate, debug_burst))
+
+    root = logging.getLogger(ROOT_LOGGER)
+    root.setLevel(level.upper())
+    root.propagate = False
+    root.handlers = [queue_handler]
+    for category in CATEGORIES:
+        get_logger(category).setLevel((categories or {}).get(category, "NOTSET").upper())
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers)
+    _listener.start()
+
+def shutdown_logging():
+    """停止后台线程, 写出队列中剩余的日志"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+atexit.register(shutdown_logging)
@@ -0,0 +1,101 @@
+# 在录制的格点图片上对比空位预判和CNN的结果, 报告误判为空位的比例
+# 在项目根目录运行:
+#   PYTHONPATH=app python -m tools.occupancy_report --platform TT --crops data/tt_crops
+import argparse
+import glob
+import json
+import os
+import cv2
+import numpy as np
+from chess.occupancy import OccupancyDetector
+from chess.piece_recognizer import ChessPieceRecognizer, INPUT_SIZE
+from tools.log import setup_logging
+
+def load_crops(paths):
+    """
+    读取格点图片, 缩放到模型输入尺寸
+    :return: (成功读取的路径列表, (N, INPUT_SIZE, INPUT_SIZE, 3) 数组)
+    """
+    loaded, crops = [], []
+    for path in paths:
+        image = cv2.imread(path)
+        if image is None:
+            continue
+        interpolation = cv2.INTER_AREA if image.shape[0] > INPUT_SIZE else cv2.INTER_LINEAR
+        crops.append(cv2.resize(image, (INPUT_SIZE, INPUT_SIZE), interpolation=interpolation))
+        loaded.append(path)
+    return loaded, np.stack(crops) if crops else np.empty((0, INPUT_SIZE, INPUT_SIZE, 3), np.uint8)
+
+def compare(empty, cnn_names, cnn_confidences, min_confidence=0.9):
+    """
+    以CNN的高置信度结果为准, 统计空位预判的误差
+    Returns:
+        dict: false_empty_rate 为CNN判为有子却被预判为空位的比例
+    """
+    cnn_names = np.array(cnn_names, dtype=object)
+    trusted = cnn_confidences > min_confidence
+    cnn_empty = trusted & (cnn_names == '-')
+    cnn_occupied = trusted & (cnn_names != '-')
+    false_empty = empty & cnn_occupied
+    missed_empty = ~empty & cnn_empty
+    return {
+        'crops': int(len(empty)),
+        'trusted': int(trusted.sum()),
+        'cnn_empty': int(cnn_empty.sum()),
+        'cnn_occupied': int(cnn_occupied.sum()),
+        'filtered_rate': float(empty.mean()) if len(empty) else 0.0,
+        'false_empty': int(false_empty.sum()),
+        'false_empty_rate': float(false_empty.sum() / max(cnn_occupied.sum(), 1)),
+        'missed_empty_rate': float(missed_empty.sum() / max(cnn_empty.sum(), 1)),
+        'false_empty_indices': np.flatnonzero(false_empty).tolist()
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="空位预判与CNN的对比报告")
+    parser.add_argument("--platform", default="TT", choices=["TT", "JJ"])
+    parser.add_argument("--backend", default="opencv", help="CNN使用的推理后端")
+    parser.add_argument("--crops", required=True, help="录制的格点图片目录(递归读取)")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.01, 0.02, 0.03, 0.05],
+                        help="要比较的 edge_threshold 取值")
+    parser.add_argument("--report", help="报告输出路径(json)")
+    parser.add_argument("--batch-size", type=int, default=256, help="每批送入CNN的格点数, 限制内存占用")
+    args = parser.parse_args()
+    setup_logging()
+
+    files = sorted(glob.glob(os.path.join(args.crops, "**", "*.*"), recursive=True))
+
+    # 分批读取和识别, 只保留每个格点的识别结果和边缘比例, 内存占用与语料大小无关
+    recognizer = ChessPieceRecognizer(platform=args.platform, backend=args.backend)
+    detector = OccupancyDetector()
+    paths, class_names, confidences, density = [], [], [], []
+    for start in range(0, len(files), args.batch_size):
+        chunk_paths, chunk = load_crops(files[start:start + args.batch_size])
+        if not chunk_paths:
+            continue
+        result = recognizer.recognize_batch(chunk)
+        paths.extend(chunk_paths)
+        class_names.extend(result['class_names'])
+        confidences.append(np.asarray(result['confidences']))
+        density.append(detector.edge_density(chunk))
+    if not paths:
+        raise SystemExit(f"没有找到格点图片: {args.crops}")
+    confidences = np.concatenate(confidences)
+    density = np.concatenate(density)
+
+    report = {}
+    print(f"{'threshold':>10}{'filtered':>10}{'false_empty':>13}{'missed_empty':>14}")
+    for threshold in args.thresholds:
+        stats = compare(density < threshold, class_names, confidences)
+        print(f"{threshold:>10.3f}{stats['filtered_rate']:>10.2%}"
+              f"{stats['false_empty_rate']:>13.4%}{stats['missed_empty_rate']:>14.2%}")
+        stats['false_empty_files'] = [paths[k] for k in stats.pop('false_empty_indices')]
+        for path in stats['false_empty_files']:
+            print(f"  误判为空位: {path}")
+        report[str(threshold)] = stats
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=4, ensure_ascii=False)
+
+if __name__ == "__main__":
+    main()
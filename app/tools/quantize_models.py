@@ -0,0 +1,186 @@
+# 把 ONNX 模型量化为 int8 (QDQ 静态量化), 并和 fp32 模型对比延迟与各类别准确率
+# 先运行 tools/export_onnx.py, 再在项目根目录运行:
+#   PYTHONPATH=app python -m tools.quantize_models --platform TT --kind piece --crops data/tt_crops
+#
+# 裁剪图片目录按类别分子目录:
+#   棋子模型: 子目录名为 *_piece_map.json 中的类别索引(如 0, 1, ... 15), 避免大小写不敏感的文件系统混淆 a/A
+#   倒计时模型: 子目录名为类别名(countdown, normal)
+import argparse
+import glob
+import json
+import os
+import time
+import cv2
+import numpy as np
+from chess.inference import onnx_model_path, softmax, crops_to_batch, OnnxRuntimeBackend
+from chess.piece_recognizer import INPUT_SIZE as PIECE_INPUT_SIZE
+from chess.timer_recognizer import CountdownPredictor, INPUT_SIZE as TIMER_INPUT_SIZE
+from tools.utils import resource_path
+from tools.log import setup_logging
+
+def load_crop_set(crops_dir, class_names, kind):
+    """
+    读取按类别分目录的裁剪图片
+    Returns:
+        (图片列表, 标签数组)
+    """
+    images, labels = [], []
+    for index, class_name in enumerate(class_names):
+        sub_dir = os.path.join(crops_dir, str(index) if kind == "piece" else class_name)
+        for path in sorted(glob.glob(os.path.join(sub_dir, "*.jpg")) + glob.glob(os.path.join(sub_dir, "*.png"))):
+            image = cv2.imread(path)
+            if image is None:
+                continue
+            if kind == "timer":
+                image = CountdownPredictor.crop_bottom_square(image)
+            images.append(image)
+            labels.append(index)
+    return images, np.array(labels, dtype=np.int64)
+
+def split_calibration(labels, fraction, seed=0):
+    """
+    按类别分层随机划分校准集和评估集, 每个类别至少留一张图片用于评估, 避免在校准数据上评估int8模型
+    Returns:
+        (校准集索引, 评估集索引)
+    """
+    rng = np.random.default_rng(seed)
+    calibration, evaluation = [], []
+    for index in np.unique(labels):
+        members = rng.permutation(np.flatnonzero(labels == index))
+        count = min(max(1, int(round(len(members) * fraction))), len(members) - 1)
+        calibration.extend(members[:count])
+        evaluation.extend(members[count:])
+    return np.sort(np.array(calibration, dtype=np.int64)), np.sort(np.array(evaluation, dtype=np.int64))
+
+class CropCalibrationReader:
+    """静态量化用的校准数据"""
+    def __init__(self, batch, input_name, batch_size=16):
+        self.batches = iter([batch[i:i + batch_size] for i in range(0, len(batch), batch_size)])
+        self.input_name = input_name
+
+    def get_next(self):
+        batch = next(self.batches, None)
+        return None if batch is None else {self.input_name: batch}
+
+def quantize(fp32_path, int8_path, calibration_batch):
+    """QDQ静态量化, 权重按通道量化"""
+    import onnx
+    from onnxruntime.quantization import quantize_static, QuantFormat, QuantType
+
+    input_name = onnx.load(fp32_path).graph.input[0].name
+    quantize_static(
+        fp32_path, int8_path,
+        CropCalibrationReader(calibration_batch, input_name),
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=True
+    )
+    print(f"已导出: {int8_path}")
+
+def evaluate(backend, batch, labels, num_classes, batch_size=90, repeat=20):
+    """
+    评估单个模型
+    Returns:
+        dict: 延迟(毫秒/批)、总体准确率、各类别准确率、预测结果
+    """
+    predictions = np.concatenate([
+        softmax(backend.run(batch[i:i + batch_size])).argmax(axis=1)
+        for i in range(0, len(batch), batch_size)
+    ])
+
+    # 以游戏中一帧的批量(90个格点)测延迟
+    sample = batch[:batch_size]
+    backend.run(sample)  # 预热
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        backend.run(sample)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    per_class = {}
+    for index in range(num_classes):
+        mask = labels == index
+        if mask.any():
+            per_class[index] = float((predictions[mask] == index).mean())
+    return {
+        'latency_ms_p50': float(np.percentile(timings, 50)),
+        'latency_ms_p95': float(np.percentile(timings, 95)),
+        'accuracy': float((predictions == labels).mean()),
+        'per_class': per_class,
+        'predictions': predictions
+    }
+
+def print_report(report, class_names):
+    """打印fp32和int8的对比表"""
+    fp32, int8 = report['fp32'], report['int8']
+    print(f"\n{'':12}{'fp32':>10}{'int8':>10}")
+    print(f"{'p50(ms)':12}{fp32['latency_ms_p50']:>10.2f}{int8['latency_ms_p50']:>10.2f}")
+    print(f"{'p95(ms)':12}{fp32['latency_ms_p95']:>10.2f}{int8['latency_ms_p95']:>10.2f}")
+    print(f"{'accuracy':12}{fp32['accuracy']:>10.2%}{int8['accuracy']:>10.2%}")
+    for index, class_name in enumerate(class_names):
+        if index in fp32['per_class']:
+            print(f"{class_name:12}{fp32['per_class'][index]:>10.2%}{int8['per_class'][index]:>10.2%}")
+    print(f"{'agreement':12}{report['agreement']:>20.2%}")
+
+def main():
+    parser = argparse.ArgumentParser(description="int8量化并生成精度/延迟对比报告")
+    parser.add_argument("--platform", default="TT", choices=["TT", "JJ"])
+    parser.add_argument("--kind", default="piece", choices=["piece", "timer"])
+    parser.add_argument("--crops", required=True, help="按类别分目录的裁剪图片")
+    parser.add_argument("--report", help="对比报告输出路径(json)")
+    parser.add_argument("--skip-quantize", action="store_true", help="只生成报告, 使用已有的int8模型")
+    parser.add_argument("--calib-fraction", type=float, default=0.3, help="用于校准的图片比例, 其余只用于评估")
+    parser.add_argument("--seed", type=int, default=0, help="划分校准集和评估集的随机种子")
+    args = parser.parse_args()
+    setup_logging()
+
+    model_type = args.platform.lower()
+    if args.kind == "piece":
+        model_path = resource_path(f"models/{model_type}_piece_model.pth")
+        with open(resource_path(f"models/{model_type}_piece_map.json"), "r", encoding="utf-8") as f:
+            class_map = json.load(f)
+        class_names = [class_map[str(i)] for i in range(len(class_map))]
+        input_size = PIECE_INPUT_SIZE
+    else:
+        model_path = resource_path(f"models/{model_type}_countdown_model.pth")
+        class_names = ['countdown', 'normal']
+        input_size = TIMER_INPUT_SIZE
+
+    images, labels = load_crop_set(args.crops, class_names, args.kind)
+    if not images:
+        raise SystemExit(f"没有找到裁剪图片: {args.crops}")
+    batch = crops_to_batch(images, input_size)
+    calibration, evaluation = split_calibration(labels, args.calib_fraction, args.seed)
+    if not len(calibration) or not len(evaluation):
+        raise SystemExit("每个类别至少需要两张图片, 才能划分校准集和评估集")
+    print(f"共 {len(images)} 张图片, {len(set(labels.tolist()))} 个类别, "
+          f"校准 {len(calibration)} 张, 评估 {len(evaluation)} 张")
+
+    fp32_path = onnx_model_path(model_path)
+    int8_path = onnx_model_path(model_path, "int8")
+    if not args.skip_quantize:
+        quantize(fp32_path, int8_path, batch[calibration])
+
+    # 准确率只在未参与校准的图片上统计
+    eval_batch, eval_labels = batch[evaluation], labels[evaluation]
+    report = {
+        'fp32': evaluate(OnnxRuntimeBackend(fp32_path), eval_batch, eval_labels, len(class_names)),
+        'int8': evaluate(OnnxRuntimeBackend(int8_path), eval_batch, eval_labels, len(class_names)),
+        'calibration_images': int(len(calibration)),
+        'evaluation_images': int(len(evaluation)),
+    }
+    report['agreement'] = float((report['fp32']['predictions'] == report['int8']['predictions']).mean())
+    print_report(report, class_names)
+
+    if args.report:
+        for precision in ('fp32', 'int8'):
+            report[precision].pop('predictions')
+            report[precision]['per_class'] = {
+                class_names[index]: accuracy for index, accuracy in report[precision]['per_class'].items()
+            }
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=4, ensure_ascii=False)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+# 离线回放: 不截屏, 把录制的帧(图片目录、录屏视频)或合成棋盘依次送入
+# 变化检测、识别、局面检查和引擎, 尽快跑完并报告每帧延迟和吞吐量. 在项目根目录运行:
+#   PYTHONPATH=app python -m tools.replay data/synth --platform TT
+#   PYTHONPATH=app python -m tools.replay game.mp4 --region 1039 215 375 415 --step 5
+#   PYTHONPATH=app python -m tools.replay --render 200 --platform TT --no-engine --report replay.json
+#   PYTHONPATH=app python -m tools.replay data/synth --trace replay_trace.json  (chrome://tracing 打开)
+# 图片目录带有 labels.jsonl (tools/board_renderer.py 的输出)时, 同时统计识别出的局面是否与标注一致
+import argparse
+import json
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+import numpy as np
+from chess import process, engine, recognizer
+from chess.context import context
+from chess.change_detector import FrameChangeDetector
+from chess.frame_source import MemoryFrameSource, open_frame_source
+from chess.message import MessageType
+from chess.timing import tracer
+from tools.log import setup_logging
+
+def percentiles(values):
+    """延迟分布(毫秒)"""
+    if not values:
+        return {}
+    return {
+        'p50': float(np.percentile(values, 50)),
+        'p95': float(np.percentile(values, 95)),
+        'p99': float(np.percentile(values, 99)),
+        'max': float(np.max(values)),
+        'mean': float(np.mean(values))
+    }
+
+def replay(frame_source, use_engine=True, use_gate=True, verbose=False):
+    """
+    回放帧来源中的所有帧
+    Args:
+        frame_source: chess.frame_source 中的帧来源
+        use_engine: 是否请求引擎计算着法
+        use_gate: 是否先做整帧变化检测(与连续模式相同)
+        verbose: 是否输出识别流程的调试信息
+    Returns:
+        (统计字典, 每帧记录列表)
+    """
+    context.init_position_checker()
+    recognizer.square_cache.reset()
+    frame_gate = FrameChangeDetector() if use_gate else None
+    records = []
+    output = sys.stdout if verbose else open(os.devnull, "w")
+
+    start = time.perf_counter()
+    with redirect_stdout(output):
+        for frame in frame_source:
+            frame_start = time.perf_counter()
+            record = {'index': frame_source.info.get('index', len(records)), 'status': 'skipped'}
+            if frame_gate is None or frame_gate.has_changed(recognizer.screenshot_to_array(frame)):
+                messages = []
+                move_text_msg, move_code_msg = process.main_process(
+                    frame, messages.append, use_engine=use_engine, retry_delay=0)
+                if move_text_msg is None:
+                    record['status'] = 'failed'
+                    if frame_gate is not None:
+                        frame_gate.invalidate()
+                elif move_code_msg.content:
+                    record['status'] = 'move'
+                    record['move'] = move_code_msg.content
+                else:
+                    record['status'] = 'recognized'
+
+                # 有标注时检查识别出的局面
+                label = frame_source.info.get('label')
+                change = next((msg for msg in messages if msg.type == MessageType.CHANGE), None)
+                if label and change is not None:
+                    record['correct'] = ["".join(row) for row in change.kwargs['position']] == label['board']
+            record['latency_ms'] = (time.perf_counter() - frame_start) * 1000
+            records.append(record)
+    elapsed = time.perf_counter() - start
+    if output is not sys.stdout:
+        output.close()
+
+    processed = [r['latency_ms'] for r in records if r['status'] != 'skipped']
+    checked = [r['correct'] for r in records if 'correct' in r]
+    stats = {
+        'frames': len(records),
+        'elapsed_s': elapsed,
+        'throughput_fps': len(records) / elapsed if elapsed else 0.0,
+        'status': {status: sum(r['status'] == status for r in records)
+                   for status in ('skipped', 'recognized', 'move', 'failed')},
+        'latency_ms': percentiles([r['latency_ms'] for r in records]),
+        'processed_latency_ms': percentiles(processed),
+        'square_cache': recognizer.square_cache.stats()
+    }
+    if context.legal_move_recognition:
+        stats['legal_move'] = dict(recognizer.legal_move_stats)
+    if checked:
+        stats['position_accuracy'] = sum(checked) / len(checked)
+        stats['checked_positions'] = len(checked)
+    return stats, records
+
+def render_source(platform, count, seed=0, noise=0.0, jpeg_quality=None, animation_rate=0.0):
+    """渲染合成棋盘作为帧来源"""
+    from tools.board_renderer import random_jobs, render_many, renderer_args_for_platform
+    from tools.utils import convert_fen_to_array
+
+    jobs = random_jobs(count, seed, noise=noise, jpeg_quality=jpeg_quality, animation_rate=animation_rate)
+    frames = list(render_many(jobs, renderer_args_for_platform(platform)))
+    # 带动画遮挡的帧没有确定的局面, 不做标注
+    labels = [None if job.get('move') or job.get('banner') else
+              {'board': ["".join(row) for row in convert_fen_to_array(job['fen'], job['is_red'])]}
+              for job in jobs]
+    return MemoryFrameSource(frames, labels)
+
+def print_report(stats):
+    """打印回放统计"""
+    print(f"\n帧数 {stats['frames']}, 用时 {stats['elapsed_s']:.2f}s, 吞吐量 {stats['throughput_fps']:.1f} 帧/秒")
+    print("状态: " + ", ".join(f"{status} {count}" for status, count in stats['status'].items()))
+    for name in ('latency_ms', 'processed_latency_ms'):
+        if stats[name]:
+            values = stats[name]
+            print(f"{name:22}p50 {values['p50']:8.2f}  p95 {values['p95']:8.2f}  "
+                  f"p99 {values['p99']:8.2f}  max {values['max']:8.2f}")
+    if 'position_accuracy' in stats:
+        print(f"局面正确率 {stats['position_accuracy']:.2%} ({stats['checked_positions']} 个有标注的局面)")
+    print(f"格点缓存 {stats['square_cache']}")
+    if 'legal_move' in stats:
+        print(f"合法着法校验 {stats['legal_move']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="离线回放录制的帧, 报告每帧延迟和吞吐量")
+    parser.add_argument("source", nargs="?", help="图片目录或录屏视频")
+    parser.add_argument("--render", type=int, help="不读取文件, 渲染指定数量的合成棋盘")
+    parser.add_argument("--noise", type=float, default=0.0, help="合成棋盘的噪声标准差")
+    parser.add_argument("--jpeg", type=int, help="合成棋盘的JPEG压缩质量")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--platform", default=context.platform, choices=["TT", "JJ"])
+    parser.add_argument("--region", type=float, nargs=4, metavar=("LEFT", "TOP", "WIDTH", "HEIGHT"),
+                        help="整屏录制时的棋盘区域")
+    parser.add_argument("--step", type=int, default=1, help="视频每隔几帧取一帧")
+    parser.add_argument("--no-engine", action="store_true", help="不请求引擎")
+    parser.add_argument("--no-gate", action="store_true", help="不做整帧变化检测, 每帧都识别")
+    parser.add_argument("--verbose", action="store_true", help="输出识别流程的调试信息")
+    parser.add_argument("--report", help="统计和每帧记录的输出路径(json)")
+    parser.add_argument("--trace", help="打开阶段计时, 导出Chrome trace-event JSON")
+    args = parser.parse_args()
+
+    # 按配置文件初始化日志, --verbose 时所有类别都输出DEBUG
+    verbose = {'level': 'DEBUG', 'categories': {}} if args.verbose else {}
+    setup_logging(**dict(context.logging_config, **verbose))
+
+    # 只在本进程内切换平台, 不写配置文件
+    context.platform = args.platform
+    if args.render:
+        frame_source = render_source(args.platform, args.render, args.seed, args.noise, args.jpeg)
+    elif args.source:
+        region = dict(zip(("left", "top", "width", "height"), args.region)) if args.region else None
+        options = {'step': args.step} if os.path.isfile(args.source) else {}
+        frame_source = open_frame_source(args.source, region, **options)
+    else:
+        parser.error("需要指定帧来源或 --render")
+
+    if args.trace:
+        tracer.configure(enabled=True, window=100000, max_events=1000000, trace_path=args.trace)
+        tracer.reset()
+    if not args.no_engine:
+        engine.init_engine()
+    try:
+        with frame_source:
+            stats, records = replay(frame_source, use_engine=not args.no_engine,
+                                    use_gate=not args.no_gate, verbose=args.verbose)
+    finally:
+        if not args.no_engine:
+            engine.terminate_engine()
+
+    print_report(stats)
+    if args.trace:
+        print(tracer.format_summary())
+        tracer.close()
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump({'stats': stats, 'frames': records}, f, indent=4, ensure_ascii=False)
+
+if __name__ == "__main__":
+    main()
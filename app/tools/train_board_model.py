@@ -0,0 +1,283 @@
+# 训练整盘识别模型(全卷积, 一次前向推理输出 10x9 个格点的类别), 并和逐格点识别对比速度与准确率
+# 需要安装 requirements-train.txt 中的依赖, 在项目根目录运行:
+#   PYTHONPATH=app python -m tools.train_board_model --platform TT --epochs 20
+#   PYTHONPATH=app python -m tools.train_board_model --platform TT --crops data/tt_crops   # 同时用录制的格点图片拼盘
+#   PYTHONPATH=app python -m tools.train_board_model --platform TT --benchmark-only --backend opencv
+# 训练完成后运行 tools/export_onnx.py 导出ONNX, 在 platform_config.json 中设置 "recognition_mode": "board" 启用
+#
+# 训练数据:
+#   sprites: 用 tools/board_renderer.py 渲染的合成棋盘(不含 covered 类别)
+#   crops:   按类别分目录的格点图片(目录结构与 tools/quantize_models.py 相同), 按格点拼成整盘
+import argparse
+import json
+import os
+import time
+import cv2
+import numpy as np
+from chess.board_recognizer import (BoardRecognizer, rectify_board, boards_to_batch,
+                                    BOARD_ROWS, BOARD_COLS, CELL_SIZE, FEATURE_STRIDE)
+from chess.template_matcher import PIECE_SPRITES
+from tools.board_renderer import BoardRenderer
+from tools.utils import resource_path
+from tools.log import setup_logging
+
+def load_class_names(platform):
+    """按类别索引排列的类别名"""
+    model_type = "tt" if platform == "TT" else "jj"
+    with open(resource_path(f"models/{model_type}_piece_map.json"), "r", encoding="utf-8") as f:
+        class_map = json.load(f)
+    return [class_map[str(i)] for i in range(len(class_map))]
+
+def random_labels(rng, classes, empty_index, empty_rate=0.7):
+    """
+    随机局面(不要求符合规则, 只用于训练逐格点的分类)
+    :param classes: 可以出现的非空类别索引
+    :return: (10, 9) 的类别索引数组
+    """
+    labels = rng.choice(classes, size=(BOARD_ROWS, BOARD_COLS))
+    labels[rng.random((BOARD_ROWS, BOARD_COLS)) < empty_rate] = empty_index
+    return labels
+
+class SpriteBoardComposer:
+    """用 tools/board_renderer.py 把随机局面渲染为截图"""
+    def __init__(self, class_names):
+        self.renderer = BoardRenderer()
+        self.class_names = class_names
+        # 没有贴图的类别(如 covered)不参与合成
+        self.classes = [index for index, name in enumerate(class_names) if name in PIECE_SPRITES]
+
+    def compose(self, labels, rng, scale=1.0, noise=0.0, jpeg_quality=None, jitter=0.04):
+        """
+        :param labels: (10, 9) 的类别索引数组
+        :param jitter: 棋子位置随机偏移(占格点边长的比例), 模拟落子动画结束时的位置误差
+        :return: (BGR图像, x坐标, y坐标)
+        """
+        board_array = [[self.class_names[index] for index in row] for row in labels]
+        image = self.renderer.render_array(board_array, scale=scale, noise=noise, jpeg_quality=jpeg_quality,
+                                           jitter=jitter, seed=int(rng.integers(2 ** 31)))
+        x_array, y_array = self.renderer.coords(scale)
+        return image[:, :, :3], x_array, y_array
+
+class CropMosaicComposer:
+    """用录制的格点图片按格点拼成校正后的棋盘"""
+    def __init__(self, crops_dir, class_names):
+        from tools.quantize_models import load_crop_set
+        images, labels = load_crop_set(crops_dir, class_names, "piece")
+        # 格点图片约为格点边长的0.9倍(见 recognizer.build_crop_plan), 四周用边缘像素补齐
+        inner = int(CELL_SIZE * 0.9)
+        border = (CELL_SIZE - inner) // 2
+        self.crops = {}
+        for image, label in zip(images, labels):
+            cell = cv2.resize(image, (inner, inner), interpolation=cv2.INTER_AREA)
+            cell = cv2.copyMakeBorder(cell, border, CELL_SIZE - inner - border, border, CELL_SIZE - inner - border,
+                                      cv2.BORDER_REPLICATE)
+            self.crops.setdefault(int(label), []).append(cell)
+        if class_names.index('-') not in self.crops:
+            raise SystemExit(f"格点图片中没有空位类别: {crops_dir}")
+        self.classes = sorted(self.crops)
+
+    def compose(self, labels, rng):
+        """:return: 校正后的棋盘图像"""
+        board = np.empty((BOARD_ROWS * CELL_SIZE, BOARD_COLS * CELL_SIZE, 3), dtype=np.uint8)
+        for (row, col), label in np.ndenumerate(labels):
+            cells = self.crops[int(label)]
+            board[row * CELL_SIZE:(row + 1) * CELL_SIZE, col * CELL_SIZE:(col + 1) * CELL_SIZE] = \
+                cells[rng.integers(len(cells))]
+        return board
+
+def make_batch(composers, batch_size, rng, empty_index):
+    """
+    生成一批训练数据
+    :return: ((N, 3, H, W) float32输入, (N, 10, 9) int64标签)
+    """
+    boards, targets = [], []
+    for _ in range(batch_size):
+        composer = composers[rng.integers(len(composers))]
+        classes = [index for index in composer.classes if index != empty_index]
+        labels = random_labels(rng, classes, empty_index, empty_rate=rng.uniform(0.5, 0.85))
+        if isinstance(composer, SpriteBoardComposer):
+            # 随机缩放、噪声和JPEG压缩, 模拟不同分辨率和画质的截图
+            image, x_array, y_array = composer.compose(
+                labels, rng, scale=round(rng.uniform(0.4, 1.2) * 20) / 20, noise=rng.uniform(0, 4),
+                jpeg_quality=int(rng.integers(60, 96)) if rng.random() < 0.5 else None)
+            board = rectify_board(image, x_array, y_array)
+        else:
+            board = composer.compose(labels, rng)
+        # 亮度和对比度扰动
+        board = cv2.convertScaleAbs(board, alpha=rng.uniform(0.85, 1.15), beta=rng.uniform(-20, 20))
+        boards.append(board)
+        targets.append(labels)
+    return boards_to_batch(boards), np.stack(targets).astype(np.int64)
+
+def init_from_piece_model(model, platform):
+    """
+    用逐格点识别模型的权重初始化整盘模型
+    特征层相同; 分类层的全连接权重即 1x1 卷积的权重
+    """
+    import torch
+    from chess.inference import load_state_dict
+
+    model_type = "tt" if platform == "TT" else "jj"
+    piece_path = resource_path(f"models/{model_type}_piece_model.pth")
+    if not os.path.exists(piece_path):
+        print(f"找不到逐格点模型: {piece_path}, 随机初始化")
+        return
+    state_dict = load_state_dict(piece_path)
+    features = {name: tensor for name, tensor in state_dict.items() if name.startswith("features.")}
+    model.load_state_dict(features, strict=False)
+    with torch.no_grad():
+        model.classifier.weight.copy_(state_dict["classifier.1.weight"][:, :, None, None])
+        model.classifier.bias.copy_(state_dict["classifier.1.bias"])
+    print(f"已用逐格点模型初始化: {piece_path}")
+
+def evaluate_model(model, device, batches):
+    """:return: (格点准确率, 整盘全对的比例)"""
+    import torch
+
+    model.eval()
+    correct_squares, correct_boards, total = 0, 0, 0
+    with torch.no_grad():
+        for inputs, targets in batches:
+            predictions = model(torch.from_numpy(inputs).to(device)).argmax(dim=1).cpu().numpy()
+            correct_squares += (predictions == targets).sum()
+            correct_boards += (predictions == targets).all(axis=(1, 2)).sum()
+            total += len(targets)
+    return correct_squares / (total * BOARD_ROWS * BOARD_COLS), correct_boards / total
+
+def train(args, composers, class_names):
+    """训练并保存整盘模型, 返回模型路径"""
+    import torch
+    import torch.nn as nn
+    from chess.inference import board_fcn
+
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    empty_index = class_names.index('-')
+    model = board_fcn(len(class_names), CELL_SIZE // FEATURE_STRIDE)
+    if not args.no_init:
+        init_from_piece_model(model, args.platform)
+    model.to(device)
+
+    optimizer = torch.optim.AdamW(model.parameters(), lr=args.lr, weight_decay=1e-4)
+    scheduler = torch.optim.lr_scheduler.CosineAnnealingLR(optimizer, T_max=args.epochs * args.steps)
+    criterion = nn.CrossEntropyLoss()
+
+    # 验证集固定随机种子, 各轮之间可比
+    val_rng = np.random.default_rng(args.seed + 1)
+    val_batches = [make_batch(composers, args.batch_size, val_rng, empty_index) for _ in range(args.val_steps)]
+    rng = np.random.default_rng(args.seed)
+    model_path = BoardRecognizer.model_path_for(args.platform)
+    best = -1.0
+    for epoch in range(args.epochs):
+        model.train()
+        start, total_loss = time.perf_counter(), 0.0
+        for _ in range(args.steps):
+            inputs, targets = make_batch(composers, args.batch_size, rng, empty_index)
+            logits = model(torch.from_numpy(inputs).to(device))
+            loss = criterion(logits, torch.from_numpy(targets).to(device))
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            scheduler.step()
+            total_loss += loss.item()
+
+        square_accuracy, board_accuracy = evaluate_model(model, device, val_batches)
+        print(f"epoch {epoch + 1}/{args.epochs}  loss {total_loss / args.steps:.4f}  "
+              f"格点准确率 {square_accuracy:.4%}  整盘准确率 {board_accuracy:.2%}  "
+              f"{time.perf_counter() - start:.0f}s")
+        if square_accuracy > best:
+            best = square_accuracy
+            torch.save(model.state_dict(), model_path)
+            print(f"  已保存: {model_path}")
+    return model_path
+
+def benchmark(platform, backend, count, seed):
+    """
+    在合成棋盘上对比逐格点识别和整盘识别
+    两条路径都从原始分辨率的截图开始, 计入切割/校正和预处理的时间
+    """
+    from chess.piece_recognizer import ChessPieceRecognizer
+    from chess.recognizer import build_crop_plan, extract_crops
+
+    class_names = load_class_names(platform)
+    empty_index = class_names.index('-')
+    composer = SpriteBoardComposer(class_names)
+    rng = np.random.default_rng(seed)
+    samples = []
+    for _ in range(count):
+        labels = random_labels(rng, composer.classes, empty_index)
+        image, x_array, y_array = composer.compose(labels, rng, jitter=0)
+        samples.append((image, tuple(round(x) for x in x_array), tuple(round(y) for y in y_array), labels.ravel()))
+
+    def grid_path(recognizer, image, x_array, y_array):
+        plan = build_crop_plan(x_array, y_array, image.shape[1], image.shape[0])
+        return recognizer.recognize_batch(extract_crops(image, plan))
+
+    def board_path(recognizer, image, x_array, y_array):
+        return recognizer.recognize(image, x_array, y_array)
+
+    paths = [("grid", ChessPieceRecognizer(platform=platform, backend=backend), grid_path)]
+    if BoardRecognizer.is_available(platform):
+        paths.append(("board", BoardRecognizer(platform=platform, backend=backend), board_path))
+    else:
+        print(f"没有 {platform} 的整盘模型, 只测逐格点识别")
+
+    report = {}
+    for name, recognizer, run in paths:
+        run(recognizer, *samples[0][:3])  # 预热
+        timings, square_hits, board_hits = [], 0, 0
+        for image, x_array, y_array, labels in samples:
+            start = time.perf_counter()
+            result = run(recognizer, image, x_array, y_array)
+            timings.append((time.perf_counter() - start) * 1000)
+            hits = np.asarray(result['class_indices']) == labels
+            square_hits += hits.sum()
+            board_hits += hits.all()
+        report[name] = {
+            'latency_ms_p50': float(np.percentile(timings, 50)),
+            'latency_ms_p95': float(np.percentile(timings, 95)),
+            'square_accuracy': float(square_hits / (count * BOARD_ROWS * BOARD_COLS)),
+            'board_accuracy': float(board_hits / count)
+        }
+
+    print(f"\n{platform} / {backend}, {count} 个合成棋盘")
+    print(f"{'':8}{'p50(ms)':>10}{'p95(ms)':>10}{'格点准确率':>12}{'整盘准确率':>12}")
+    for name, stats in report.items():
+        print(f"{name:8}{stats['latency_ms_p50']:>10.2f}{stats['latency_ms_p95']:>10.2f}"
+              f"{stats['square_accuracy']:>15.2%}{stats['board_accuracy']:>15.2%}")
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="训练整盘识别模型并和逐格点识别对比")
+    parser.add_argument("--platform", default="TT", choices=["TT", "JJ"])
+    parser.add_argument("--crops", help="按类别分目录的格点图片, 与贴图合成的棋盘混合训练")
+    parser.add_argument("--no-sprites", action="store_true", help="只用 --crops 的格点图片训练")
+    parser.add_argument("--epochs", type=int, default=20)
+    parser.add_argument("--steps", type=int, default=200, help="每轮的批次数")
+    parser.add_argument("--val-steps", type=int, default=10, help="验证集的批次数")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--lr", type=float, default=1e-3)
+    parser.add_argument("--no-init", action="store_true", help="不用逐格点模型的权重初始化")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--benchmark-only", action="store_true", help="不训练, 只做对比测试")
+    parser.add_argument("--benchmark-boards", type=int, default=100)
+    parser.add_argument("--backend", default="torch", help="对比测试使用的推理后端")
+    parser.add_argument("--report", help="对比报告输出路径(json)")
+    args = parser.parse_args()
+    setup_logging()
+
+    if not args.benchmark_only:
+        class_names = load_class_names(args.platform)
+        composers = [] if args.no_sprites else [SpriteBoardComposer(class_names)]
+        if args.crops:
+            composers.append(CropMosaicComposer(args.crops, class_names))
+        if not composers:
+            raise SystemExit("没有训练数据: 去掉 --no-sprites 或指定 --crops")
+        train(args, composers, class_names)
+
+    report = benchmark(args.platform, args.backend, args.benchmark_boards, args.seed + 2)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=4, ensure_ascii=False)
+
+if __name__ == "__main__":
+    main()
@@ -113,6 +113,10 @@ def check_repeat_position(array1, array2, is_red):
 
 # 棋子数组转为FEN棋局字符串(不含轮哪方走棋信息)
 def convert_array_to_fen(array, is_red):
+    # chess.board.Board: 返回FEN和红方在下的 Board
+    if hasattr(array, 'to_fen'):
+        return array.to_fen(is_red), (array if is_red else array.flipped())
+
     # 本方是黑方就反向遍历
     if not is_red:
         array = [row[::-1] for row in array[::-1]] 
@@ -146,6 +150,29 @@ def convert_array_to_fen(array, is_red):
     fen_string = "/".join(rows)
     return fen_string, array
 
+# FEN棋局字符串转为棋子数组(convert_array_to_fen 的逆操作)
+def convert_fen_to_array(fen, is_red):
+    """
+    Args:
+        fen: FEN字符串, 只使用第一段棋子位置(红方在下)
+        is_red: 本方是红方(红方在屏幕下方)
+    Returns:
+        10x9的棋子数组, 与识别结果的屏幕方向一致, 空位为'-'
+    """
+    array = []
+    for row in fen.split()[0].split('/'):
+        cells = []
+        for char in row:
+            if char.isdigit():
+                cells.extend(['-'] * int(char))
+            else:
+                cells.append(char)
+        array.append(cells)
+    # 本方是黑方就反向排列
+    if not is_red:
+        array = [row[::-1] for row in array[::-1]]
+    return array
+
 # 着法move转文字描述
 def convert_move_to_chinese(move, board_array, is_red): 
     # 棋子代码与中文名称的对应关系  
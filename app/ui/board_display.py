@@ -349,11 +349,16 @@ class BoardDisplay(QLabel):
     def update_pieces(self, piecesArray):
         """更新棋子位置
         Args:
-            piecesArray: 与显示坐标完全相同的二维数组
+            piecesArray: 与显示坐标完全相同的 chess.board.Board 或二维数组
         """
         # 清除箭头
         self.move_arrow = None
         
+        # Board 直接给出所有棋子, 不逐格遍历
+        if hasattr(piecesArray, 'pieces'):
+            self.pieces = piecesArray.pieces()
+            return
+        
         self.pieces.clear()
         for y in range(10):
             for x in range(9):
@@ -1,16 +1,17 @@
 from PySide6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-                             QLabel, QPushButton, QApplication, QMenu)
+                             QLabel, QPushButton, QApplication, QMenu, QMessageBox)
 from PySide6.QtCore import Qt, QSize, QPoint, QTimer, QEvent
 from PySide6.QtGui import QFont, QKeyEvent, QCursor, QPixmap, QIcon
 import os
 import queue
 import threading
 import sys
-from chess.screenshot import capture_region, get_position, trigger_manual_recognition
 from chess import engine
 from ui.board_display import BoardDisplay
 from chess.message import Message, MessageType
 from chess.context import context
+from chess.startup import start_warm_up, is_warming_up
+from chess.timing import tracer
 from ui.board_display import BoardDisplay
 from pynput import mouse
 
@@ -345,6 +346,7 @@ class MainWindow(QMainWindow):
         self.show_dot_action = self.settings_menu.addAction("显示原点")
         self.continuous_action = self.settings_menu.addAction("连续识别")
         self.timer_action = self.settings_menu.addAction("计时识别")
+        self.timing_action = self.settings_menu.addAction("耗时统计")
         # 设置菜单项可选中
         self.show_dot_action.setCheckable(True)
         self.continuous_action.setCheckable(True)
@@ -356,6 +358,7 @@ class MainWindow(QMainWindow):
         self.show_dot_action.triggered.connect(self.toggle_show_dot)
         self.continuous_action.triggered.connect(self.toggle_continuous)
         self.timer_action.triggered.connect(self.toggle_timer)
+        self.timing_action.triggered.connect(self.show_timing_summary)
         
         # 创建参数选择按钮
         self.param_btn = QPushButton("参数")
@@ -511,6 +514,13 @@ class MainWindow(QMainWindow):
         # 初始化状态
         self.is_running = False
         self.lines = ["", "", ""]
+
+        # 后台预热识别模型和引擎, 窗口先显示出来
+        self.warmup_queue = queue.Queue()
+        start_warm_up(self.warmup_queue)
+        self.warmup_timer = QTimer()
+        self.warmup_timer.timeout.connect(self.check_warmup_queue)
+        self.warmup_timer.start(100)
     
     def on_engine_param_changed(self, param):
         """处理引擎参数改变"""
@@ -604,30 +614,43 @@ class MainWindow(QMainWindow):
     
     def capture_func(self):
         """截图和分析函数"""
+        # 截图和识别模块较重, 用到时才导入
+        from chess.screenshot import capture_region
         capture_region(self.result_queue, self.stop_event)
     
+    def check_warmup_queue(self):
+        """显示预热进度, 预热结束后停止定时器"""
+        while not self.warmup_queue.empty():
+            result = self.warmup_queue.get()
+            # 分析已经开始时不再覆盖分析线程的消息
+            if isinstance(result, Message) and not self.is_running:
+                self.update_text(result.content)
+        if not is_warming_up() and self.warmup_queue.empty():
+            self.warmup_timer.stop()
+    
     def check_queue(self):
         """检查结果队列"""
         if not self.result_queue.empty():
             result = self.result_queue.get()
             if isinstance(result, Message):
-                if result.type == MessageType.CHANGE:
-                    # 显示棋局
-                    self.board_display.update_board_with_array(
-                        result.kwargs['position'], 
-                        red_changes=result.kwargs.get('red_changes', []),
-                        black_changes=result.kwargs.get('black_changes', [])
-                    )
-                    self.update_text(result.content)
-                elif result.type == MessageType.MOVE_CODE:
-                    # 显示着法箭头
-                    self.board_display.update_move_arrow(result.content, result.kwargs['is_red'])
-                elif result.type == MessageType.MOVE_TEXT:
-                    # 显示着法文本
-                    self.update_text(result.content)
-                elif result.type == MessageType.STATUS:
-                    # 显示状态消息
-                    self.update_text(result.content)
+                with tracer.span("ui", type=result.type.name):
+                    if result.type == MessageType.CHANGE:
+                        # 显示棋局
+                        self.board_display.update_board_with_array(
+                            result.kwargs['position'], 
+                            red_changes=result.kwargs.get('red_changes', []),
+                            black_changes=result.kwargs.get('black_changes', [])
+                        )
+                        self.update_text(result.content)
+                    elif result.type == MessageType.MOVE_CODE:
+                        # 显示着法箭头
+                        self.board_display.update_move_arrow(result.content, result.kwargs['is_red'])
+                    elif result.type == MessageType.MOVE_TEXT:
+                        # 显示着法文本
+                        self.update_text(result.content)
+                    elif result.type == MessageType.STATUS:
+                        # 显示状态消息
+                        self.update_text(result.content)
     
     def update_text(self, text):
         """更新显示文本"""
@@ -813,6 +836,13 @@ class MainWindow(QMainWindow):
         context.analysis_mode = "timer"
         context.save_config()
 
+    def show_timing_summary(self):
+        """显示识别流程各阶段的耗时统计"""
+        if not tracer.enabled:
+            QMessageBox.information(self, "耗时统计", "阶段计时未开启, 请在配置文件的 timing 项中设置 enabled")
+            return
+        QMessageBox.information(self, "耗时统计(毫秒)", tracer.format_summary())
+
     def on_reposition(self):
         """处理重新定位选项"""
         self.move_display.setText('<span style="color: red;">将光标移到棋盘左上角，<br>点击鼠标左键或按S键确认</span>')
@@ -872,6 +902,7 @@ class MainWindow(QMainWindow):
         y = cursor_pos.y()
         
         # 使用get_position保存坐标
+        from chess.screenshot import get_position
         get_position(x, y)
         
         # 重置定位状态
@@ -939,6 +970,7 @@ class MainWindow(QMainWindow):
 
     def on_manual_analyze(self):
         """手动触发识别"""
+        from chess.screenshot import trigger_manual_recognition
         trigger_manual_recognition()
 
     def show_param_menu(self):